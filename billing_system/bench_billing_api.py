@@ -0,0 +1,119 @@
+"""
+Load generator for billing_api.py.
+
+Starts the API in a child process against a throw-away database, then hammers it from
+concurrent client threads (keep-alive connections) with a mix of invoice
+creates, idempotent retries and report queries. Prints p50/p99 latency per
+operation and overall throughput.
+
+Run:
+    python bench_billing_api.py --requests 2000 --concurrency 16
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import socket
+import multiprocessing
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import billing_api
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def sample_invoice(rnd):
+    return {
+        'date': f"2025-10-{rnd.randint(1, 28):02d}",
+        'customer_name': f"Customer {rnd.randint(1, 500)}",
+        'items': [{'description': f"Item {rnd.randint(1, 200)}", 'qty': rnd.randint(1, 5),
+                   'rate': round(rnd.uniform(10, 500), 2), 'gst_percent': rnd.choice([5, 12, 18])}
+                  for _ in range(rnd.randint(1, 8))],
+    }
+
+
+def client(worker_id, port, n, batch_size, latencies, lock):
+    rnd = random.Random(worker_id)
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.connect()
+    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    local = {}
+    for i in range(n):
+        roll = rnd.random()
+        if roll < 0.15:
+            op, method, path = "report", "GET", "/reports/sales?from=2025-10-01&to=2025-10-31"
+            body, headers = None, {}
+        elif batch_size > 1 and roll < 0.35:
+            op, method, path = "batch", "POST", "/invoices/batch"
+            body = json.dumps({'invoices': [sample_invoice(rnd) for _ in range(batch_size)]})
+            headers = {'Content-Type': 'application/json'}
+        else:
+            # every tenth create is a retry of the previous key
+            key = f"w{worker_id}-{i - 1 if i % 10 == 0 and i else i}"
+            op, method, path = "create", "POST", "/invoices"
+            body = json.dumps(sample_invoice(rnd))
+            headers = {'Content-Type': 'application/json', 'Idempotency-Key': key}
+        t0 = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        elapsed = time.perf_counter() - t0
+        if resp.status >= 400:
+            raise RuntimeError(f"{op} failed with HTTP {resp.status}")
+        local.setdefault(op, []).append(elapsed)
+    conn.close()
+    with lock:
+        for op, vals in local.items():
+            latencies.setdefault(op, []).extend(vals)
+
+
+def serve(db_file, port_queue):
+    server = billing_api.make_server("127.0.0.1", 0, db_file=db_file)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Billing API load generator")
+    ap.add_argument("--requests", type=int, default=2000, help="total requests")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--batch", type=int, default=10, help="invoices per batch request (0 disables)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="billing_bench_")
+    port_queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=serve, args=(os.path.join(tmp, "billing.db"), port_queue), daemon=True)
+    proc.start()
+    port = port_queue.get(timeout=30)
+
+    latencies, lock = {}, threading.Lock()
+    per_worker = max(1, args.requests // args.concurrency)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        futures = [pool.submit(client, w, port, per_worker, args.batch, latencies, lock)
+                   for w in range(args.concurrency)]
+        for f in futures:
+            f.result()
+    wall = time.perf_counter() - t0
+    proc.terminate()
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests, {args.concurrency} clients, {wall:.2f}s wall, {total / wall:.0f} req/s")
+    print(f"{'op':<8}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for op, vals in sorted(latencies.items()):
+        print(f"{op:<8}{len(vals):>8}{percentile(vals, 50) * 1000:>10.2f}{percentile(vals, 99) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Headless Billing API (stdlib only) - exposes the billing ledger over HTTP/JSON
+so the web shop and POS counters can write to the same billing.db as the Tk app.
+
+Endpoints:
+    POST /invoices                 create one invoice (Idempotency-Key header supported)
+    POST /invoices/batch           create many invoices in one write transaction
+    GET  /invoices                 list invoices (?limit=&offset=)
+    GET  /invoices/<id>            invoice header + items
+    GET  /invoices/<id>/pdf        PDF bytes (rendered on first request)
+    POST /invoices/<id>/void       journal a void ({"reason": "..."})
+    GET  /reports/sales            ?from=YYYY-MM-DD&to=YYYY-MM-DD
+
+Invoice payload:
+    {"invoice_no": "INV0042" (optional, auto-numbered if missing),
+     "date": "2025-10-25", "customer_name": "...", "customer_phone": "...",
+     "customer_address": "...", "idempotency_key": "..." (batch only),
+     "items": [{"description": "...", "qty": 2, "rate": 10.5, "gst_percent": 18}]}
+
+Writes from all client threads go through a single InvoiceWriter thread that
+drains whatever is queued and commits it as one transaction (group commit),
+so N concurrent invoices cost one fsync instead of N.
+
+Run:
+    python billing_api.py --port 8765
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import argparse
+import datetime
+import threading
+from decimal import Decimal, InvalidOperation
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import billing_app
+from billing_app import (money, compute_item, compute_totals, init_db, next_invoice_number,
+                         _insert_invoice_rows, fetch_sales_by_date, fetch_all_invoices,
+                         fetch_invoice, fetch_invoice_items, record_invoice_pdf, void_invoice,
+                         generate_pdf)
+
+PDF_DIR = "invoices"
+MAX_BATCH = 500
+MAX_NUMBER = Decimal(10) ** 12  # qty/rate ceiling: line amounts stay well inside Decimal precision
+
+
+# ---------------------------
+# Payload validation
+# ---------------------------
+def _number(value, name, allow_zero=False, limit=MAX_NUMBER):
+    """A finite Decimal above zero (or zero, if allowed) and at most `limit`; ValueError otherwise."""
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be numeric")
+    try:
+        d = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"{name} must be numeric")
+    if not d.is_finite() or d < 0 or (d == 0 and not allow_zero):
+        raise ValueError(f"{name} must be a finite number {'>= 0' if allow_zero else '> 0'}")
+    if d > limit:
+        raise ValueError(f"{name} must be at most {limit}")
+    return d
+
+
+def build_invoice(payload):
+    """
+    Validate a JSON invoice payload and compute line/total amounts server-side.
+    Raises ValueError with a client-facing message.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("invoice must be a JSON object")
+    items_in = payload.get('items') or []
+    if not isinstance(items_in, list) or not items_in:
+        raise ValueError("invoice needs a list of at least one item")
+    text = {}
+    for field in ('invoice_no', 'customer_name', 'customer_phone', 'customer_address', 'idempotency_key'):
+        value = payload.get(field) or ''
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+        text[field] = value
+    date_str = payload.get('date') or datetime.date.today().isoformat()
+    try:
+        date_iso = datetime.date.fromisoformat(date_str).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError("date must be YYYY-MM-DD")
+    items = []
+    for it in items_in:
+        if not isinstance(it, dict):
+            raise ValueError("each item must be a JSON object")
+        desc = str(it.get('description', '')).strip()
+        if not desc:
+            raise ValueError("item description required")
+        if 'rate' not in it:
+            raise ValueError("item rate required")
+        qty = _number(it.get('qty', 1), 'qty')
+        rate = _number(it['rate'], 'rate')
+        gst = _number(it.get('gst_percent', 18), 'gst_percent', allow_zero=True, limit=Decimal(100))
+        items.append(compute_item(desc, qty, rate, gst))
+    try:
+        totals = compute_totals(items)
+    except ArithmeticError:  # decimal.InvalidOperation: a sum past Decimal precision
+        raise ValueError("invoice total too large")
+    return {
+        'invoice_no': text['invoice_no'].strip() or None,
+        'date': date_iso,
+        'customer_name': text['customer_name'],
+        'customer_phone': text['customer_phone'],
+        'customer_address': text['customer_address'],
+        'items': items,
+        'totals': totals,
+        'idempotency_key': text['idempotency_key'] or None,
+    }
+
+
+# ---------------------------
+# Batched writer
+# ---------------------------
+class _WriteJob:
+    def __init__(self, invoices):
+        self.invoices = invoices
+        self.results = None
+        self.done = threading.Event()
+
+
+class InvoiceWriter(threading.Thread):
+    """
+    Owns the only write connection. Jobs queued while a transaction is being
+    committed are picked up together by the next one.
+    """
+
+    def __init__(self, db_file, max_batch=MAX_BATCH):
+        super().__init__(daemon=True)
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.jobs = queue.Queue()
+
+    def submit(self, invoices):
+        job = _WriteJob(invoices)
+        self.jobs.put(job)
+        job.done.wait()
+        return job.results
+
+    def run(self):
+        con = sqlite3.connect(self.db_file, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=FULL")
+        cur = con.cursor()
+        while True:
+            batch = [self.jobs.get()]
+            count = len(batch[0].invoices)
+            while count < self.max_batch:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(job)
+                count += len(job.invoices)
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                for job in batch:
+                    job.results = [self._write_one(cur, inv) for inv in job.invoices]
+                cur.execute("COMMIT")
+            except Exception as e:
+                if con.in_transaction:
+                    cur.execute("ROLLBACK")
+                for job in batch:
+                    job.results = [{'status': 'error', 'error': f"write failed: {e}"}
+                                   for _ in job.invoices]
+            for job in batch:
+                job.done.set()
+
+    def _write_one(self, cur, inv):
+        key = inv.get('idempotency_key')
+        if key:
+            cur.execute("""
+                SELECT i.id, i.invoice_no FROM idempotency_keys k JOIN invoices i ON i.id = k.invoice_id
+                WHERE k.key = ?
+            """, (key,))
+            r = cur.fetchone()
+            if r:
+                return {'status': 'existing', 'id': r[0], 'invoice_no': r[1]}
+        invoice_no = inv['invoice_no'] or next_invoice_number(cur)
+        totals = inv['totals']
+        cur.execute("SAVEPOINT inv")
+        try:
+            invoice_id = _insert_invoice_rows(cur, invoice_no, inv['date'], inv['customer_name'],
+                                              inv['customer_phone'], inv['customer_address'],
+                                              totals['total_taxable'], totals['total_gst'],
+                                              totals['total_amount'], inv['items'])
+            if key:
+                cur.execute("INSERT INTO idempotency_keys(key, invoice_id, created_at) VALUES (?, ?, ?)",
+                            (key, invoice_id, datetime.datetime.now().isoformat()))
+        except sqlite3.IntegrityError as e:
+            cur.execute("ROLLBACK TO inv")
+            cur.execute("RELEASE inv")
+            return {'status': 'error', 'error': f"invoice no {invoice_no} exists ({e})"}
+        cur.execute("RELEASE inv")
+        return {'status': 'created', 'id': invoice_id, 'invoice_no': invoice_no,
+                'total_amount': str(totals['total_amount'])}
+
+
+# ---------------------------
+# PDF retrieval
+# ---------------------------
+_pdf_lock = threading.Lock()
+
+def invoice_pdf_path(invoice_id):
+    """Return the PDF path for an invoice, rendering it on first request."""
+    row = fetch_invoice(invoice_id)
+    if not row:
+        return None
+    with _pdf_lock:
+        pdf_path = row[9]
+        if pdf_path and os.path.exists(pdf_path):
+            return pdf_path
+        os.makedirs(PDF_DIR, exist_ok=True)
+        pdf_path = os.path.join(PDF_DIR, f"invoice_{row[1]}.pdf")
+        items = [{'description': it[0], 'qty': it[1], 'rate': it[2], 'gst_percent': it[3],
+                  'taxable_value': it[4], 'gst_amount': it[5], 'total': it[6]}
+                 for it in fetch_invoice_items(invoice_id)]
+        totals = {'total_taxable': row[6], 'total_gst': row[7], 'total_amount': row[8]}
+        generate_pdf(row[1], row[2], row[3], row[4], row[5], items, totals, pdf_path)
+        record_invoice_pdf(invoice_id, pdf_path)
+        return pdf_path
+
+
+# ---------------------------
+# HTTP layer
+# ---------------------------
+class BillingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for POS/web clients
+    disable_nagle_algorithm = True   # headers and body go out as separate writes
+    writer = None
+    verbose = False
+
+    def log_message(self, fmt, *args):
+        if self.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"null")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if parts == ['invoices']:
+                limit = int(qs.get('limit', ['100'])[0])
+                offset = int(qs.get('offset', ['0'])[0])
+                if limit < 0 or offset < 0:
+                    raise ValueError("limit and offset must be >= 0")
+                rows = fetch_all_invoices(limit, offset)
+                return self._send(200, [
+                    {'id': r[0], 'invoice_no': r[1], 'date': r[2], 'customer_name': r[3],
+                     'total_amount': str(money(r[4])), 'pdf_path': r[5]} for r in rows])
+            if len(parts) == 2 and parts[0] == 'invoices':
+                row = fetch_invoice(int(parts[1]))
+                if not row:
+                    return self._send(404, {'error': 'invoice not found'})
+                items = fetch_invoice_items(row[0])
+                return self._send(200, {
+                    'id': row[0], 'invoice_no': row[1], 'date': row[2], 'customer_name': row[3],
+                    'customer_phone': row[4], 'customer_address': row[5],
+                    'total_taxable': str(money(row[6])), 'total_gst': str(money(row[7])),
+                    'total_amount': str(money(row[8])), 'pdf_path': row[9],
+                    'items': [{'description': it[0], 'qty': it[1], 'rate': str(money(it[2])),
+                               'gst_percent': it[3], 'taxable_value': str(money(it[4])),
+                               'gst_amount': str(money(it[5])), 'total': str(money(it[6]))}
+                              for it in items]})
+            if len(parts) == 3 and parts[0] == 'invoices' and parts[2] == 'pdf':
+                path = invoice_pdf_path(int(parts[1]))
+                if not path:
+                    return self._send(404, {'error': 'invoice not found'})
+                with open(path, 'rb') as fh:
+                    data = fh.read()
+                return self._send(200, data, content_type="application/pdf",
+                                  headers={'Content-Disposition': f'attachment; filename="{os.path.basename(path)}"'})
+            if parts == ['reports', 'sales']:
+                today = datetime.date.today()
+                date_from = datetime.date.fromisoformat(qs.get('from', [today.replace(day=1).isoformat()])[0])
+                date_to = datetime.date.fromisoformat(qs.get('to', [today.isoformat()])[0])
+                rows = fetch_sales_by_date(date_from.isoformat(), date_to.isoformat())
+                sums = [Decimal('0.00')] * 3
+                for r in rows:
+                    sums = [sums[0] + money(r[3]), sums[1] + money(r[4]), sums[2] + money(r[5])]
+                return self._send(200, {
+                    'from': date_from.isoformat(), 'to': date_to.isoformat(),
+                    'invoices': [{'invoice_no': r[0], 'date': r[1], 'customer_name': r[2],
+                                  'total_taxable': str(money(r[3])), 'total_gst': str(money(r[4])),
+                                  'total_amount': str(money(r[5]))} for r in rows],
+                    'total_taxable': str(sums[0]), 'total_gst': str(sums[1]), 'total_amount': str(sums[2])})
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        try:
+            payload = self._read_json()
+            if parts == ['invoices']:
+                inv = build_invoice(payload)
+                inv['idempotency_key'] = self.headers.get('Idempotency-Key') or inv['idempotency_key']
+                res = self.writer.submit([inv])[0]
+                status = {'created': 201, 'existing': 200}.get(res['status'], 409)
+                return self._send(status, res)
+            if parts == ['invoices', 'batch']:
+                invoices = payload.get('invoices') if isinstance(payload, dict) else payload
+                if not isinstance(invoices, list) or not invoices or len(invoices) > MAX_BATCH:
+                    raise ValueError(f"batch must hold 1..{MAX_BATCH} invoices")
+                return self._send(200, {'results': self.writer.submit([build_invoice(p) for p in invoices])})
+            if len(parts) == 3 and parts[0] == 'invoices' and parts[2] == 'void':
+                reason = payload.get('reason', '') if isinstance(payload, dict) else ''
+                try:
+                    changed = void_invoice(int(parts[1]), reason)
+                except RuntimeError as e:
+                    return self._send(404, {'error': str(e)})
+                return self._send(200, {'id': int(parts[1]), 'status': 'voided' if changed else 'already_voided'})
+        except ValueError as e:  # includes json.JSONDecodeError
+            return self._send(400, {'error': str(e)})
+        self._send(404, {'error': 'not found'})
+
+
+class BillingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # many counters connect at once
+
+
+def make_server(host, port, db_file=None, verbose=False):
+    """Initialise the DB, start the writer thread and return an (unstarted) HTTP server."""
+    if db_file:
+        billing_app.DB_FILE = db_file
+    init_db()
+    writer = InvoiceWriter(billing_app.DB_FILE)
+    writer.start()
+    handler = type("Handler", (BillingHandler,), {'writer': writer, 'verbose': verbose})
+    return BillingServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless billing API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--db", default=None, help="SQLite file (default: billing.db)")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    server = make_server(args.host, args.port, args.db, args.verbose)
+    print(f"Billing API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
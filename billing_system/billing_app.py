@@ -1,12 +1,14 @@
 
 import os
 import sys
+import json
+import hashlib
 import sqlite3
 import datetime
 import csv
 from decimal import Decimal, ROUND_HALF_UP
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -18,6 +20,38 @@ DB_FILE = "billing.db"
 def money(x):
     return Decimal(x).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
+def compute_item(description, qty, rate, gst_percent):
+    """
+    Build an invoice line dict (the shape insert_invoice/generate_pdf expect)
+    from raw qty/rate/GST%. Shared by the Tk form and the HTTP API.
+    """
+    qty = Decimal(str(qty))
+    rate = Decimal(str(rate))
+    gst_percent = Decimal(str(gst_percent))
+    taxable = money(qty * rate)
+    gst_amount = money(taxable * gst_percent / Decimal('100'))
+    total = money(taxable + gst_amount)
+    return {
+        'description': description,
+        'qty': float(qty),
+        'rate': float(rate),
+        'gst_percent': float(gst_percent),
+        'taxable_value': float(taxable),
+        'gst_amount': float(gst_amount),
+        'total': float(total)
+    }
+
+def compute_totals(items):
+    total_taxable = Decimal('0.00')
+    total_gst = Decimal('0.00')
+    total_amount = Decimal('0.00')
+    for it in items:
+        total_taxable += money(it['taxable_value'])
+        total_gst += money(it['gst_amount'])
+        total_amount += money(it['total'])
+    return {'total_taxable': money(total_taxable), 'total_gst': money(total_gst),
+            'total_amount': money(total_amount)}
+
 def init_db():
     """
     Initialise DB. Create tables if missing.
@@ -70,14 +104,106 @@ def init_db():
             # If ALTER TABLE fails for some reason, print/log but continue
             print("Warning: failed to add pdf_path column:", e)
 
+    # Idempotency keys used by the headless API (billing_api.py): a retried
+    # POST with the same key returns the invoice created the first time.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        invoice_id INTEGER,
+        created_at TEXT,
+        FOREIGN KEY(invoice_id) REFERENCES invoices(id)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id)")
+
+    # Append-only journal of invoice events (created, pdf_rendered, voided).
+    # Rows are written in the same transaction as the change they describe;
+    # triggers refuse UPDATE/DELETE so history cannot be rewritten.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS invoice_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        invoice_id INTEGER NOT NULL,
+        event TEXT NOT NULL CHECK (event IN ('created', 'pdf_rendered', 'voided')),
+        at TEXT NOT NULL,
+        payload TEXT,
+        FOREIGN KEY(invoice_id) REFERENCES invoices(id)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_invoice_events_invoice ON invoice_events(invoice_id, event)")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS invoice_events_no_update BEFORE UPDATE ON invoice_events
+    BEGIN SELECT RAISE(ABORT, 'invoice_events is append-only'); END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS invoice_events_no_delete BEFORE DELETE ON invoice_events
+    BEGIN SELECT RAISE(ABORT, 'invoice_events is append-only'); END
+    """)
+
+    # Per-day sales rollup kept in step with the journal; invoice_journal.py
+    # can rebuild it from scratch.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS daily_sales (
+        date TEXT PRIMARY KEY,
+        invoice_count INTEGER,
+        total_taxable REAL,
+        total_gst REAL,
+        total_amount REAL
+    )
+    """)
+
+    # Backfill journal entries for invoices saved before the journal existed
+    cur.execute("""
+        INSERT INTO invoice_events(invoice_id, event, at, payload)
+        SELECT i.id, 'created', i.date,
+               json_object('invoice_no', i.invoice_no, 'date', i.date,
+                           'total_taxable', i.total_taxable, 'total_gst', i.total_gst,
+                           'total_amount', i.total_amount, 'backfilled', 1)
+        FROM invoices i
+        WHERE NOT EXISTS (SELECT 1 FROM invoice_events e WHERE e.invoice_id = i.id AND e.event = 'created')
+        ORDER BY i.id
+    """)
+    if cur.rowcount:
+        cur.execute("""
+            INSERT INTO invoice_events(invoice_id, event, at, payload)
+            SELECT i.id, 'pdf_rendered', i.date, json_object('path', i.pdf_path, 'backfilled', 1)
+            FROM invoices i
+            WHERE i.pdf_path IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM invoice_events e WHERE e.invoice_id = i.id AND e.event = 'pdf_rendered')
+        """)
+        cur.execute("DELETE FROM daily_sales")
+        cur.execute("""
+            INSERT INTO daily_sales(date, invoice_count, total_taxable, total_gst, total_amount)
+            SELECT date, COUNT(*), SUM(total_taxable), SUM(total_gst), SUM(total_amount)
+            FROM invoices
+            WHERE id NOT IN (SELECT invoice_id FROM invoice_events WHERE event = 'voided')
+            GROUP BY date
+        """)
+
     con.commit()
+    # WAL lets the Tk app and the API server read while the other writes
+    cur.execute("PRAGMA journal_mode=WAL")
     con.close()
 
 
-def insert_invoice(invoice_no, date_iso, customer_name, customer_phone, customer_address,
-                   total_taxable, total_gst, total_amount, items, pdf_path=None):
-    con = sqlite3.connect(DB_FILE)
-    cur = con.cursor()
+def _append_event(cur, invoice_id, event, payload):
+    cur.execute("INSERT INTO invoice_events(invoice_id, event, at, payload) VALUES (?, ?, ?, ?)",
+                (invoice_id, event, datetime.datetime.now().isoformat(), json.dumps(payload, default=str)))
+
+def _bump_daily_sales(cur, date_iso, sign, total_taxable, total_gst, total_amount):
+    cur.execute("""
+        INSERT INTO daily_sales(date, invoice_count, total_taxable, total_gst, total_amount)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(date) DO UPDATE SET
+            invoice_count = invoice_count + excluded.invoice_count,
+            total_taxable = total_taxable + excluded.total_taxable,
+            total_gst = total_gst + excluded.total_gst,
+            total_amount = total_amount + excluded.total_amount
+    """, (date_iso, sign, sign * float(total_taxable), sign * float(total_gst), sign * float(total_amount)))
+
+def _insert_invoice_rows(cur, invoice_no, date_iso, customer_name, customer_phone, customer_address,
+                         total_taxable, total_gst, total_amount, items, pdf_path=None):
+    """Insert header + items on an open cursor; the caller owns the transaction."""
     cur.execute("""
         INSERT INTO invoices(invoice_no, date, customer_name, customer_phone, customer_address,
                              total_taxable, total_gst, total_amount, pdf_path)
@@ -85,17 +211,53 @@ def insert_invoice(invoice_no, date_iso, customer_name, customer_phone, customer
     """, (invoice_no, date_iso, customer_name, customer_phone, customer_address,
           float(total_taxable), float(total_gst), float(total_amount), pdf_path))
     invoice_id = cur.lastrowid
-    for it in items:
-        cur.execute("""
-            INSERT INTO invoice_items(invoice_id, description, qty, rate, gst_percent, taxable_value, gst_amount, total)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (invoice_id, it['description'], float(it['qty']), float(it['rate']),
-              float(it['gst_percent']), float(it['taxable_value']),
-              float(it['gst_amount']), float(it['total'])))
-    con.commit()
-    con.close()
+    cur.executemany("""
+        INSERT INTO invoice_items(invoice_id, description, qty, rate, gst_percent, taxable_value, gst_amount, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(invoice_id, it['description'], float(it['qty']), float(it['rate']),
+           float(it['gst_percent']), float(it['taxable_value']),
+           float(it['gst_amount']), float(it['total'])) for it in items])
+    _append_event(cur, invoice_id, 'created', {
+        'invoice_no': invoice_no, 'date': date_iso,
+        'total_taxable': float(total_taxable), 'total_gst': float(total_gst),
+        'total_amount': float(total_amount), 'item_count': len(items)})
+    _bump_daily_sales(cur, date_iso, 1, total_taxable, total_gst, total_amount)
+    return invoice_id
+
+def insert_invoice(invoice_no, date_iso, customer_name, customer_phone, customer_address,
+                   total_taxable, total_gst, total_amount, items, pdf_path=None):
+    con = sqlite3.connect(DB_FILE)
+    cur = con.cursor()
+    try:
+        invoice_id = _insert_invoice_rows(cur, invoice_no, date_iso, customer_name, customer_phone,
+                                          customer_address, total_taxable, total_gst, total_amount,
+                                          items, pdf_path)
+        con.commit()
+    finally:
+        con.close()
     return invoice_id
 
+def next_invoice_number(cur=None):
+    """Next INVnnnn number after the most recent invoice."""
+    import re
+    con = None
+    if cur is None:
+        con = sqlite3.connect(DB_FILE)
+        cur = con.cursor()
+    cur.execute("SELECT invoice_no FROM invoices ORDER BY id DESC LIMIT 1")
+    r = cur.fetchone()
+    if con is not None:
+        con.close()
+    if not r:
+        return "INV0001"
+    last = r[0]
+    m = re.search(r'(\d+)$', last)
+    if m:
+        n = int(m.group(1)) + 1
+        return f"INV{n:04d}"
+    else:
+        return last + "_1"
+
 def fetch_sales_by_date(date_from, date_to):
     con = sqlite3.connect(DB_FILE)
     cur = con.cursor()
@@ -103,20 +265,23 @@ def fetch_sales_by_date(date_from, date_to):
         SELECT invoice_no, date, customer_name, total_taxable, total_gst, total_amount
         FROM invoices
         WHERE date BETWEEN ? AND ?
+          AND id NOT IN (SELECT invoice_id FROM invoice_events WHERE event = 'voided')
         ORDER BY date ASC
     """, (date_from, date_to))
     rows = cur.fetchall()
     con.close()
     return rows
 
-def fetch_all_invoices():
+def fetch_all_invoices(limit=None, offset=0):
+    """Invoices newest first; `limit`/`offset` page them in SQL (the date index serves the order)."""
     con = sqlite3.connect(DB_FILE)
     cur = con.cursor()
     cur.execute("""
         SELECT id, invoice_no, date, customer_name, total_amount, pdf_path
         FROM invoices
         ORDER BY date DESC, id DESC
-    """)
+        LIMIT ? OFFSET ?
+    """, (-1 if limit is None else limit, offset))
     rows = cur.fetchall()
     con.close()
     return rows
@@ -133,6 +298,73 @@ def fetch_invoice_items(invoice_id):
     con.close()
     return rows
 
+def fetch_invoice(invoice_id):
+    con = sqlite3.connect(DB_FILE)
+    cur = con.cursor()
+    cur.execute("""
+        SELECT id, invoice_no, date, customer_name, customer_phone, customer_address,
+               total_taxable, total_gst, total_amount, pdf_path
+        FROM invoices
+        WHERE id = ?
+    """, (invoice_id,))
+    row = cur.fetchone()
+    con.close()
+    return row
+
+def file_digest(path):
+    """(size, sha256 hex) of a file, read in chunks."""
+    h = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            h.update(chunk)
+            size += len(chunk)
+    return size, h.hexdigest()
+
+def record_invoice_pdf(invoice_id, pdf_path):
+    """
+    Point the invoice at a fully written PDF and journal it (size + sha256),
+    so the verifier can later detect missing or truncated files.
+    """
+    size, sha = file_digest(pdf_path)
+    con = sqlite3.connect(DB_FILE)
+    cur = con.cursor()
+    try:
+        cur.execute("UPDATE invoices SET pdf_path = ? WHERE id = ?", (pdf_path, invoice_id))
+        _append_event(cur, invoice_id, 'pdf_rendered', {'path': pdf_path, 'size': size, 'sha256': sha})
+        con.commit()
+    finally:
+        con.close()
+
+def void_invoice(invoice_id, reason=""):
+    """Journal a void and take the invoice out of the daily rollup. Returns False if already voided."""
+    con = sqlite3.connect(DB_FILE)
+    cur = con.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT date, total_taxable, total_gst, total_amount FROM invoices WHERE id = ?", (invoice_id,))
+        r = cur.fetchone()
+        if not r:
+            raise RuntimeError("Invoice not found")
+        cur.execute("SELECT 1 FROM invoice_events WHERE invoice_id = ? AND event = 'voided'", (invoice_id,))
+        if cur.fetchone():
+            con.rollback()
+            return False
+        _append_event(cur, invoice_id, 'voided', {'reason': reason})
+        _bump_daily_sales(cur, r[0], -1, r[1], r[2], r[3])
+        con.commit()
+        return True
+    finally:
+        con.close()
+
+def fetch_voided_ids():
+    con = sqlite3.connect(DB_FILE)
+    cur = con.cursor()
+    cur.execute("SELECT invoice_id FROM invoice_events WHERE event = 'voided'")
+    ids = {r[0] for r in cur.fetchall()}
+    con.close()
+    return ids
+
 # ---------------------------
 # PDF Generation (reportlab)
 # ---------------------------
@@ -143,8 +375,11 @@ def generate_pdf(invoice_no, date_str, customer_name, customer_phone, customer_a
     from reportlab.lib.styles import getSampleStyleSheet
     from reportlab.lib.units import mm
 
+    # Render next to the target and move into place only once complete, so a
+    # crash mid-render never leaves a half-written file at `filename`.
+    tmp_name = filename + ".part"
     doc = SimpleDocTemplate(
-        filename,
+        tmp_name,
         pagesize=A4,
         rightMargin=15 * mm,
         leftMargin=15 * mm,
@@ -211,7 +446,14 @@ def generate_pdf(invoice_no, date_str, customer_name, customer_phone, customer_a
     story.append(Spacer(1, 12))
     story.append(Paragraph("Thank you for your business!", styles['Normal']))
 
-    doc.build(story)
+    try:
+        doc.build(story)
+        with open(tmp_name, 'rb') as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, filename)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
 
 
 # ---------------------------
@@ -232,21 +474,7 @@ class BillingApp(tk.Tk):
         self.create_widgets()
 
     def _get_next_invoice_number(self):
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
-        cur.execute("SELECT invoice_no FROM invoices ORDER BY id DESC LIMIT 1")
-        r = cur.fetchone()
-        con.close()
-        if not r:
-            return "INV0001"
-        last = r[0]
-        import re
-        m = re.search(r'(\d+)$', last)
-        if m:
-            n = int(m.group(1)) + 1
-            return f"INV{n:04d}"
-        else:
-            return last + "_1"
+        return next_invoice_number()
 
     def create_widgets(self):
         frm = ttk.Frame(self, padding=8)
@@ -382,19 +610,7 @@ class BillingApp(tk.Tk):
             messagebox.showerror("Invalid", "Description required")
             return
 
-        taxable = money(qty * rate)
-        gst_amount = money(taxable * gst_percent / Decimal('100'))
-        total = money(taxable + gst_amount)
-
-        item = {
-            'description': desc,
-            'qty': float(qty),
-            'rate': float(rate),
-            'gst_percent': float(gst_percent),
-            'taxable_value': float(taxable),
-            'gst_amount': float(gst_amount),
-            'total': float(total)
-        }
+        item = compute_item(desc, qty, rate, gst_percent)
         self.items.append(item)
         self.tree.insert('', 'end', values=(
             item['description'],
@@ -424,16 +640,10 @@ class BillingApp(tk.Tk):
         self._recalc_totals()
 
     def _recalc_totals(self):
-        total_taxable = Decimal('0.00')
-        total_gst = Decimal('0.00')
-        total_amount = Decimal('0.00')
-        for it in self.items:
-            total_taxable += money(it['taxable_value'])
-            total_gst += money(it['gst_amount'])
-            total_amount += money(it['total'])
-        self.total_taxable_var.set(f"{money(total_taxable)}")
-        self.total_gst_var.set(f"{money(total_gst)}")
-        self.grand_total_var.set(f"{money(total_amount)}")
+        totals = compute_totals(self.items)
+        self.total_taxable_var.set(f"{totals['total_taxable']}")
+        self.total_gst_var.set(f"{totals['total_gst']}")
+        self.grand_total_var.set(f"{totals['total_amount']}")
 
     def save_and_generate(self):
         if not self.items:
@@ -466,9 +676,10 @@ class BillingApp(tk.Tk):
         else:
             pdf_path = f
 
+        # pdf_path is recorded only after the file is fully written
         try:
             invoice_id = insert_invoice(invoice_no, dt.date().isoformat(), customer_name, customer_phone, customer_address,
-                         total_taxable, total_gst, total_amount, self.items, pdf_path)
+                         total_taxable, total_gst, total_amount, self.items)
         except sqlite3.IntegrityError as e:
             messagebox.showerror("DB Error", f"Invoice no exists. Choose a different number. ({e})")
             return
@@ -481,6 +692,7 @@ class BillingApp(tk.Tk):
             totals = {'total_taxable': total_taxable, 'total_gst': total_gst, 'total_amount': total_amount}
             try:
                 generate_pdf(invoice_no, date_str, customer_name, customer_phone, customer_address, self.items, totals, pdf_path)
+                record_invoice_pdf(invoice_id, pdf_path)
                 self.last_pdf_path = pdf_path
                 messagebox.showinfo("Saved", f"Invoice saved (ID {invoice_id}) and PDF generated at:\n{pdf_path}")
             except Exception as e:
@@ -588,7 +800,7 @@ class BillingApp(tk.Tk):
             return
         top = tk.Toplevel(self)
         top.title("Saved Invoices")
-        cols = ("id", "invoice_no", "date", "customer", "total", "pdf")
+        cols = ("id", "invoice_no", "date", "customer", "total", "pdf", "status")
         tree = ttk.Treeview(top, columns=cols, show='headings', height=12)
         for c in cols:
             tree.heading(c, text=c.title())
@@ -596,9 +808,11 @@ class BillingApp(tk.Tk):
         tree.column("customer", width=200, anchor='w')
         tree.pack(fill='both', expand=True)
 
+        voided = fetch_voided_ids()
         for r in rows:
             pid = r[0]
-            tree.insert('', 'end', values=(pid, r[1], r[2], r[3] or "", money(r[4]), r[5] or ""))
+            tree.insert('', 'end', iid=str(pid), values=(pid, r[1], r[2], r[3] or "", money(r[4]), r[5] or "",
+                                                         "VOID" if pid in voided else ""))
 
         btn_frame = ttk.Frame(top)
         btn_frame.pack(fill='x', pady=6)
@@ -640,6 +854,20 @@ class BillingApp(tk.Tk):
             for it in items:
                 tview.insert('', 'end', values=(it[0], it[1], money(it[2]), money(it[3]), money(it[4]), money(it[5]), money(it[6])))
         ttk.Button(btn_frame, text="Show Items", command=show_items).pack(side='left', padx=6)
+        def void_selected():
+            sel = tree.selection()
+            if not sel:
+                return
+            item = tree.item(sel[0])['values']
+            reason = simpledialog.askstring("Void Invoice", f"Reason for voiding {item[1]}:", parent=top)
+            if reason is None:
+                return
+            if void_invoice(item[0], reason.strip()):
+                tree.set(sel[0], "status", "VOID")
+                messagebox.showinfo("Voided", f"Invoice {item[1]} voided.", parent=top)
+            else:
+                messagebox.showinfo("Voided", f"Invoice {item[1]} was already voided.", parent=top)
+        ttk.Button(btn_frame, text="Void Selected", command=void_selected).pack(side='left', padx=6)
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,161 @@
+"""
+Invoice journal replay / verification tool.
+
+    python invoice_journal.py replay            rebuild daily_sales from invoice_events
+    python invoice_journal.py verify [--hash]   cross-check journal, invoices and PDFs
+
+Both commands work on the whole history with a handful of set-based queries
+and one sequential scan of the journal; PDF existence is checked with one
+os.scandir() per directory instead of a stat() per invoice. `verify` exits
+with status 1 when it finds problems.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from collections import defaultdict
+
+import billing_app
+from billing_app import money, file_digest
+
+
+def replay(con):
+    """
+    Rebuild the daily_sales rollup from the journal alone.
+    Returns a list of (date, old_row, new_row) for days that drifted.
+    """
+    cur = con.cursor()
+    created = {}
+    days = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    cur.execute("SELECT invoice_id, event, payload FROM invoice_events WHERE event IN ('created', 'voided') ORDER BY id")
+    for invoice_id, event, payload in cur:
+        p = json.loads(payload or "{}")
+        if event == 'created':
+            created[invoice_id] = p
+            sign = 1
+        else:
+            p = created.get(invoice_id)
+            if p is None:
+                continue
+            sign = -1
+        d = days[p['date']]
+        d[0] += sign
+        d[1] += sign * p['total_taxable']
+        d[2] += sign * p['total_gst']
+        d[3] += sign * p['total_amount']
+
+    cur.execute("SELECT date, invoice_count, total_taxable, total_gst, total_amount FROM daily_sales")
+    old = {r[0]: r[1:] for r in cur.fetchall()}
+    new = {k: tuple(v) for k, v in days.items() if v[0]}
+
+    def same(a, b):
+        return a is not None and b is not None and a[0] == b[0] and \
+            all(money(x) == money(y) for x, y in zip(a[1:], b[1:]))
+    drift = [(d, old.get(d), new.get(d)) for d in sorted(set(old) | set(new)) if not same(old.get(d), new.get(d))]
+
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("DELETE FROM daily_sales")
+    cur.executemany("INSERT INTO daily_sales(date, invoice_count, total_taxable, total_gst, total_amount) VALUES (?, ?, ?, ?, ?)",
+                    [(d,) + v for d, v in sorted(new.items())])
+    cur.execute("COMMIT")
+    return drift
+
+
+def verify(con, check_hash=False):
+    """Return a list of human-readable problems (empty when everything checks out)."""
+    cur = con.cursor()
+    problems = []
+
+    cur.execute("""
+        SELECT i.id, i.invoice_no FROM invoices i
+        LEFT JOIN invoice_events e ON e.invoice_id = i.id AND e.event = 'created'
+        WHERE e.id IS NULL
+    """)
+    problems += [f"invoice {no} (id {iid}) has no 'created' journal entry" for iid, no in cur.fetchall()]
+
+    cur.execute("""
+        SELECT DISTINCT e.invoice_id FROM invoice_events e
+        LEFT JOIN invoices i ON i.id = e.invoice_id
+        WHERE i.id IS NULL
+    """)
+    problems += [f"journal references missing invoice id {r[0]}" for r in cur.fetchall()]
+
+    cur.execute("""
+        SELECT i.invoice_no, i.total_amount, json_extract(e.payload, '$.total_amount')
+        FROM invoices i JOIN invoice_events e ON e.invoice_id = i.id AND e.event = 'created'
+        WHERE ROUND(i.total_amount, 2) != ROUND(json_extract(e.payload, '$.total_amount'), 2)
+    """)
+    problems += [f"invoice {no}: header total {money(a)} != journal total {money(b)}" for no, a, b in cur.fetchall()]
+
+    cur.execute("""
+        SELECT i.invoice_no, i.total_amount, s.items_total
+        FROM invoices i
+        JOIN (SELECT invoice_id, SUM(total) AS items_total FROM invoice_items GROUP BY invoice_id) s
+          ON s.invoice_id = i.id
+        WHERE ROUND(i.total_amount, 2) != ROUND(s.items_total, 2)
+    """)
+    problems += [f"invoice {no}: header total {money(a)} != sum of items {money(b)}" for no, a, b in cur.fetchall()]
+
+    # Latest rendered PDF per invoice, as journaled
+    cur.execute("""
+        SELECT i.id, i.invoice_no, i.pdf_path, e.payload
+        FROM invoices i
+        LEFT JOIN invoice_events e ON e.id = (
+            SELECT MAX(id) FROM invoice_events WHERE invoice_id = i.id AND event = 'pdf_rendered')
+        WHERE i.pdf_path IS NOT NULL
+    """)
+    by_dir = defaultdict(list)
+    for iid, no, path, payload in cur.fetchall():
+        by_dir[os.path.dirname(os.path.abspath(path))].append((no, path, json.loads(payload or "{}")))
+
+    for directory, entries in by_dir.items():
+        try:
+            with os.scandir(directory) as it:
+                listing = {e.name: e for e in it if e.is_file()}
+        except FileNotFoundError:
+            listing = {}
+        for no, path, meta in entries:
+            entry = listing.get(os.path.basename(path))
+            if entry is None:
+                problems.append(f"invoice {no}: PDF missing at {path}")
+                continue
+            if meta.get('size') is not None and entry.stat().st_size != meta['size']:
+                problems.append(f"invoice {no}: PDF size {entry.stat().st_size} != journaled {meta['size']} ({path})")
+            elif check_hash and meta.get('sha256') and file_digest(path)[1] != meta['sha256']:
+                problems.append(f"invoice {no}: PDF checksum mismatch ({path})")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Invoice journal replay / verification")
+    ap.add_argument("--db", default=None, help="SQLite file (default: billing.db)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("replay", help="rebuild daily_sales from the journal")
+    v = sub.add_parser("verify", help="check journal, invoice totals and PDFs")
+    v.add_argument("--hash", action="store_true", help="also compare PDF sha256 checksums")
+    args = ap.parse_args(argv)
+
+    if args.db:
+        billing_app.DB_FILE = args.db
+    billing_app.init_db()
+    con = sqlite3.connect(billing_app.DB_FILE, isolation_level=None)
+    try:
+        if args.cmd == "replay":
+            drift = replay(con)
+            for d, old, new in drift:
+                print(f"{d}: rollup {old} -> {new}")
+            print(f"daily_sales rebuilt, {len(drift)} day(s) corrected")
+            return 0
+        problems = verify(con, check_hash=args.hash)
+        for p in problems:
+            print(p)
+        print("OK" if not problems else f"{len(problems)} problem(s) found")
+        return 1 if problems else 0
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+from http.client import HTTPConnection
+
+import billing_app
+from billing_api import build_invoice, make_server
+
+
+def invoice(**item):
+    return {'date': '2025-10-25', 'items': [{'description': 'Widget', 'qty': 2, 'rate': 10, **item}]}
+
+
+class BuildInvoiceTests(unittest.TestCase):
+    def test_valid_invoice(self):
+        inv = build_invoice(invoice(qty='1.5', gst_percent=0))
+        self.assertEqual(inv['totals']['total_amount'], Decimal('15.00'))
+        self.assertIsNone(inv['invoice_no'])
+
+    def test_non_finite_or_non_positive_numbers_rejected(self):
+        for field, value in [('qty', 'NaN'), ('qty', 'Infinity'), ('qty', -1), ('qty', 0),
+                             ('rate', 'nan'), ('rate', -5), ('rate', 0), ('gst_percent', -18),
+                             ('gst_percent', 'inf'), ('qty', 'two'), ('qty', True), ('qty', '1e400'),
+                             ('rate', 1e20), ('qty', 10 ** 12 + 1), ('gst_percent', 101)]:
+            with self.subTest(field=field, value=value), self.assertRaises(ValueError):
+                build_invoice(invoice(**{field: value}))
+
+    def test_malformed_payloads_rejected(self):
+        bad = [
+            [],
+            {'items': 'widget'},
+            {'items': ['widget']},
+            {'items': [{'description': 'Widget', 'qty': 1}]},
+            {'invoice_no': 42, 'items': [{'description': 'Widget', 'rate': 1}]},
+            {'customer_name': {'x': 1}, 'items': [{'description': 'Widget', 'rate': 1}]},
+            {'idempotency_key': ['k'], 'items': [{'description': 'Widget', 'rate': 1}]},
+        ]
+        for payload in bad:
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                build_invoice(payload)
+
+
+class BillingServerTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        db_file = billing_app.DB_FILE
+        self.addCleanup(setattr, billing_app, 'DB_FILE', db_file)
+        self.server = make_server('127.0.0.1', 0, os.path.join(tmp.name, 'billing.db'))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def request(self, method, path, body=None):
+        con = HTTPConnection(*self.server.server_address, timeout=5)
+        self.addCleanup(con.close)
+        con.request(method, path, body=None if body is None else json.dumps(body),
+                    headers={'Content-Type': 'application/json'})
+        resp = con.getresponse()
+        return resp.status, json.loads(resp.read())
+
+    def test_huge_quantity_is_a_client_error(self):
+        status, body = self.request('POST', '/invoices', invoice(qty='1e400'))
+        self.assertEqual(status, 400)
+        self.assertIn('qty', body['error'])
+
+    def test_invoice_pages(self):
+        for day in (1, 2, 3):
+            self.request('POST', '/invoices', {'date': f'2025-10-0{day}', 'invoice_no': f'INV{day}',
+                                               'items': [{'description': 'Widget', 'rate': day}]})
+        status, rows = self.request('GET', '/invoices?limit=2')
+        self.assertEqual((status, [r['invoice_no'] for r in rows]), (200, ['INV3', 'INV2']))
+        status, rows = self.request('GET', '/invoices?limit=2&offset=2')
+        self.assertEqual([r['invoice_no'] for r in rows], ['INV1'])
+        status, body = self.request('GET', '/invoices?offset=-1')
+        self.assertEqual(status, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
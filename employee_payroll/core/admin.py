@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Employee, Attendance, Leave, PayrollPeriod, PayrollRecord
+from .models import Employee, Attendance, Leave, LeaveBalance, PayrollPeriod, PayrollRecord, PayrollJob, PayrollRun, PayrollRecordVersion
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
@@ -18,6 +18,12 @@ class LeaveAdmin(admin.ModelAdmin):
     list_display = ('employee','type','start_date','end_date','approved')
     list_filter = ('type','approved')
 
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    list_display = ('employee','year','type','days')
+    list_filter = ('year','type')
+    search_fields = ('employee__code','employee__first_name','employee__last_name')
+
 @admin.register(PayrollPeriod)
 class PayrollPeriodAdmin(admin.ModelAdmin):
     list_display = ('month','year','locked')
@@ -28,3 +34,28 @@ class PayrollRecordAdmin(admin.ModelAdmin):
     list_display = ('employee','period','gross','net')
     list_filter = ('period__year','period__month')
     search_fields = ('employee__code','employee__first_name','employee__last_name')
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = ('period','number','kind','added','changed','removed','unchanged','created_at')
+    list_filter = ('kind','period__year')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(PayrollRecordVersion)
+class PayrollRecordVersionAdmin(admin.ModelAdmin):
+    list_display = ('employee_code','period','run','op','gross','net')
+    list_filter = ('op','period__year','period__month')
+    search_fields = ('employee_code',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(PayrollJob)
+class PayrollJobAdmin(admin.ModelAdmin):
+    list_display = ('period','status','processed','total','owner','heartbeat_at','created_at','finished_at')
+    list_filter = ('status',)
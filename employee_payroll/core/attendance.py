@@ -0,0 +1,105 @@
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, time
+
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .changes import mark_changed
+from .metrics import invalidate_attendance
+from .models import PRESENT_STATUSES, Attendance, AttendanceMonthly, derive_attendance
+
+UPSERT_FIELDS = ['check_in', 'check_out', 'status', 'work_hours', 'overtime_hours']
+
+def parse_time(value):
+    """'HH:MM[:SS]' -> time, '' / None -> None. Raises ValueError on anything else."""
+    if not value:
+        return None
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(value)
+
+def build_attendance(rows):
+    """
+    Unsaved Attendance objects from (employee_id, date, status, check_in, check_out)
+    rows, with status/work_hours/overtime_hours derived exactly as Attendance.save() does.
+    """
+    out = []
+    for employee_id, day, status, check_in, check_out in rows:
+        status, work_hours, overtime_hours = derive_attendance(day, check_in, check_out, status)
+        out.append(Attendance(employee_id=employee_id, date=day, status=status, check_in=check_in,
+                              check_out=check_out, work_hours=work_hours, overtime_hours=overtime_hours))
+    return out
+
+def bulk_upsert_attendance(rows, batch_size=1000):
+    """
+    Insert or update attendance for many (employee, date) pairs with
+    INSERT ... ON CONFLICT(employee_id, date) DO UPDATE, one statement per
+    `batch_size` rows. Returns the number of rows written.
+    """
+    objs = build_attendance(rows)
+    Attendance.objects.bulk_create(objs, batch_size=batch_size, update_conflicts=True,
+                                   unique_fields=['employee', 'date'], update_fields=UPSERT_FIELDS)
+    months = {month_key(a) for a in objs}
+    refresh_monthly(months)
+    mark_changed(months)
+    invalidate_attendance({a.date for a in objs})
+    return len(objs)
+
+def month_key(attendance):
+    return (attendance.employee_id, attendance.date.year, attendance.date.month)
+
+def attendance_totals(qs):
+    """qs grouped per employee: present, absents, half_days, late, work_hours, ot_hours."""
+    return qs.values('employee_id').annotate(
+        present=Count('id', filter=Q(status__in=PRESENT_STATUSES)),
+        absents=Count('id', filter=Q(status='ABSENT')),
+        half_days=Count('id', filter=Q(status='HALF_DAY')),
+        late=Count('id', filter=Q(status='LATE')),
+        work_hours=Sum('work_hours'),
+        ot_hours=Sum('overtime_hours'),
+    ).order_by()
+
+def refresh_monthly(keys, chunk_size=500):
+    """
+    Recompute AttendanceMonthly for (employee_id, year, month) keys from the
+    attendance rows. Per month and chunk of employees this is one
+    INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE (the database does
+    the counting and the upsert; going through model instances costs more
+    than the bulk attendance write itself) plus one DELETE for summaries whose
+    month has no attendance left.
+    """
+    months = defaultdict(set)
+    for employee_id, year, month in keys:
+        months[(year, month)].add(employee_id)
+    now = AttendanceMonthly._meta.get_field('updated_at').get_db_prep_value(timezone.now(), connection)
+    with connection.cursor() as cur:
+        for (year, month), employee_ids in months.items():
+            start_dt, end_dt = date(year, month, 1), date(year, month, monthrange(year, month)[1])
+            employee_ids = sorted(employee_ids)
+            for i in range(0, len(employee_ids), chunk_size):
+                ids = employee_ids[i:i + chunk_size]
+                cur.execute(_REFRESH_SQL.format(ids=', '.join(['%s'] * len(ids))),
+                            [year, month, *PRESENT_STATUSES, now, start_dt, end_dt, *ids])
+                AttendanceMonthly.objects.filter(year=year, month=month, employee_id__in=ids).exclude(
+                    Exists(Attendance.objects.filter(employee_id=OuterRef('employee_id'),
+                                                     date__range=(start_dt, end_dt)))).delete()
+
+_REFRESH_SQL = f"""
+    INSERT INTO {AttendanceMonthly._meta.db_table}
+        (employee_id, year, month, present_days, absent_days, half_days, late_days, work_hours, ot_hours, updated_at)
+    SELECT employee_id, %s, %s,
+           SUM(CASE WHEN status IN (%s, %s, %s) THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'ABSENT' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'HALF_DAY' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'LATE' THEN 1 ELSE 0 END),
+           SUM(work_hours), SUM(overtime_hours), %s
+    FROM {Attendance._meta.db_table}
+    WHERE date BETWEEN %s AND %s AND employee_id IN ({{ids}})
+    GROUP BY employee_id
+    ON CONFLICT (employee_id, year, month) DO UPDATE SET
+        present_days = excluded.present_days, absent_days = excluded.absent_days,
+        half_days = excluded.half_days, late_days = excluded.late_days,
+        work_hours = excluded.work_hours, ot_hours = excluded.ot_hours, updated_at = excluded.updated_at
+"""
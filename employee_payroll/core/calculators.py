@@ -1,5 +1,10 @@
 from decimal import Decimal
 
+try:
+    import numpy as np
+except Exception:
+    np = None
+
 def compute_payroll_for_employee(emp, month_summary):
     # month_summary: dict with keys 'present_days','absent_days','half_days','ot_hours','lop_days'
     base = Decimal(emp.base_salary or 0)
@@ -28,3 +33,74 @@ def compute_payroll_for_employee(emp, month_summary):
         'pf': pf, 'esi': esi, 'tax': tax, 'lop': lop,
         'gross': gross, 'net': net,
     }
+
+# ---- batch (whole company) calculator ----
+# Same rules as compute_payroll_for_employee, on int64 arrays of paise.
+# Every step is an exact integer product followed by one division rounded
+# half-to-even, which is what Decimal.quantize() does by default, so the
+# results are identical to the scalar function.
+
+def _div_half_even(num, den):
+    q, r = np.divmod(num, den)
+    twice = 2 * r
+    return q + ((twice > den) | ((twice == den) & (q % 2 == 1)))
+
+def _scaled(values, scale, what):
+    """Exact int64 array of values * scale (e.g. rupees -> paise); raises ValueError if not integral."""
+    out = []
+    for v in values:
+        d = Decimal(v if isinstance(v, (Decimal, int, str)) else str(v)) * scale
+        if d != d.to_integral_value():
+            raise ValueError(f"{what} {v} is not a multiple of {1 / Decimal(scale)}")
+        out.append(int(d))
+    return np.array(out, dtype=np.int64)
+
+def to_paise(values):
+    return _scaled(values, 100, 'amount')
+
+def from_paise(arr):
+    """int paise array -> list of Decimal with two places (as quantize('0.01') gives)."""
+    return [Decimal(int(v)).scaleb(-2) for v in arr]
+
+def compute_payroll_batch(base_salary, hourly_rate, ot_hours, lop_days):
+    """
+    Vectorised compute_payroll_for_employee for many employees at once.
+
+    base_salary, hourly_rate: rupee amounts with at most 2 decimals
+    ot_hours: hours with at most 2 decimals
+    lop_days: multiples of half a day
+    Returns a dict of int64 paise arrays with the scalar function's keys.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for compute_payroll_batch")
+    base = to_paise(base_salary)
+    hourly = to_paise(hourly_rate)
+    ot_centi = _scaled(ot_hours, 100, 'OT hours')
+    lop_half = _scaled(lop_days, 2, 'LOP days')
+    paid = base > 0
+    zero = np.zeros_like(base)
+
+    basic = _div_half_even(base, 2)                      # base * 0.50
+    hra = _div_half_even(basic * 4, 10)                  # basic * 0.40
+    allowances = np.where(paid, base - basic - hra, zero)
+    ot_pay = _div_half_even(ot_centi * hourly * 3, 200)  # ot * hourly * 1.5
+    pf = _div_half_even(basic * 12, 100)
+    esi = zero.copy()
+    tax = np.where(paid, _div_half_even((base + ot_pay) * 5, 100), zero)
+    lop = np.where(paid, _div_half_even(base * lop_half, 52), zero)   # base / 26 * lop_days
+
+    # Decimal computes base / 26 to 28 significant digits before multiplying,
+    # so where the exact LOP lands on half a paisa and base/26 does not
+    # terminate it may round the other way; redo those few rows in Decimal.
+    ties = np.nonzero(paid & ((base * lop_half) % 52 == 26) & (base % 13 != 0))[0]
+    for i in ties:
+        lop_decimal = ((Decimal(int(base[i])).scaleb(-2) / Decimal('26')) * (Decimal(int(lop_half[i])) / 2)).quantize(Decimal('0.01'))
+        lop[i] = int(lop_decimal.scaleb(2))
+
+    gross = basic + hra + allowances + ot_pay
+    net = gross - (pf + esi + tax + lop)
+    return {
+        'basic': basic, 'hra': hra, 'allowances': allowances, 'overtime_pay': ot_pay,
+        'pf': pf, 'esi': esi, 'tax': tax, 'lop': lop,
+        'gross': gross, 'net': net,
+    }
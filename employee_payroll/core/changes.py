@@ -0,0 +1,42 @@
+"""
+Change tracking for incremental payroll.
+
+Writers mark the (employee, month) pairs whose payroll inputs changed as
+PayrollDirty rows; payroll.recompute_changed() then recomputes only those
+employees. Only months with an unlocked PayrollPeriod are marked: a month
+without a period is computed in full when it is generated, and a locked
+one is never recomputed.
+
+    attendance      the row's month (both months when a row moves)
+    leave           its start month and every later open month of the years
+                    it spans (paid leave is charged against the yearly
+                    balance in date order, core.leave)
+    leave balance   every open month of that year
+    salary, active  every open month
+"""
+from .models import PayrollDirty, PayrollPeriod
+
+def _open_months():
+    return set(PayrollPeriod.objects.filter(locked=False).values_list('year', 'month'))
+
+def mark_changed(keys, open_months=None):
+    """Mark (employee_id, year, month) keys whose month has an open period. Returns the number marked."""
+    keys = set(keys)
+    if not keys:
+        return 0
+    open_months = _open_months() if open_months is None else open_months
+    objs = [PayrollDirty(employee_id=emp_id, year=y, month=m) for emp_id, y, m in keys if (y, m) in open_months]
+    PayrollDirty.objects.bulk_create(objs, batch_size=1000, update_conflicts=True,
+                                     unique_fields=['employee', 'year', 'month'], update_fields=['marked_at'])
+    return len(objs)
+
+def mark_open_months(employee_ids, year=None, since=None, until_year=None):
+    """
+    Mark every open month of the employees, optionally only those of `year`,
+    from the month of `since` and up to the end of `until_year`.
+    """
+    months = [(y, m) for y, m in _open_months()
+              if (year is None or y == year)
+              and (since is None or (y, m) >= (since.year, since.month))
+              and (until_year is None or y <= until_year)]
+    return mark_changed(((emp_id, y, m) for emp_id in employee_ids for y, m in months), set(months))
@@ -1,53 +1,37 @@
-from io import BytesIO
-from django.http import HttpResponse
-from django.template.loader import get_template
+from tempfile import TemporaryFile
+from django.http import FileResponse
 # from weasyprint import HTML
 import openpyxl
 
-def export_attendance_excel(rows, filename='attendance.xlsx'):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Attendance'
-    headers = ['Emp Code','Name','Date','Status','Check In','Check Out','Hours','OT Hours']
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def xlsx_response(title, headers, rows, filename):
+    """
+    Write rows (any iterable, consumed once) to a write-only workbook spooled
+    to an anonymous temp file and stream that back. Memory stays flat however
+    many rows there are; the file is removed when the response is closed.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
     ws.append(headers)
     for r in rows:
         ws.append(r)
-    stream = BytesIO()
-    wb.save(stream)
-    stream.seek(0)
-    resp = HttpResponse(stream.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return resp
+    tmp = TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+def export_attendance_excel(rows, filename='attendance.xlsx'):
+    headers = ['Emp Code','Name','Date','Status','Check In','Check Out','Hours','OT Hours']
+    return xlsx_response('Attendance', headers, rows, filename)
 
 def export_payroll_excel(rows, filename='payroll.xlsx'):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Payroll'
     headers = ['Emp Code','Name','Basic','HRA','Allowances','OT Pay','PF','ESI','Tax','LOP','Gross','Net']
-    ws.append(headers)
-    for r in rows:
-        ws.append(r)
-    stream = BytesIO()
-    wb.save(stream)
-    stream.seek(0)
-    resp = HttpResponse(stream.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return resp
-
-import pdfkit
-from django.http import HttpResponse
-from django.template.loader import get_template
+    return xlsx_response('Payroll', headers, rows, filename)
 
-def render_pdf(template_name, context, filename='payslip.pdf'):
-    html = get_template(template_name).render(context)
-    # options: tune as needed (margins, page size)
-    options = {
-        'page-size': 'A4',
-        'encoding': "UTF-8",
-        # 'margin-top': '10mm', 'margin-bottom': '10mm', ...
-    }
-    # returns bytes when output_path=False
-    pdf_bytes = pdfkit.from_string(html, False, options=options)
-    resp = HttpResponse(pdf_bytes, content_type='application/pdf')
-    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return resp
+# options: tune as needed (margins, page size)
+PDF_OPTIONS = {
+    'page-size': 'A4',
+    'encoding': "UTF-8",
+    # 'margin-top': '10mm', 'margin-bottom': '10mm', ...
+}
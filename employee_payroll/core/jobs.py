@@ -0,0 +1,134 @@
+"""
+Background payroll jobs.
+
+enqueue_payroll() records a PayrollJob and hands it to a single in-process
+worker thread, so the request returns at once and runs for different
+periods are serialized (SQLite has one writer anyway). The worker computes
+records in chunks of employees, updating the job's progress after each
+chunk, then swaps them in: deleting the period's old records and inserting
+the new ones happen in one transaction, so readers see either the old
+payroll or the new one, never a mix.
+
+With several server processes (gunicorn workers) each has its own worker
+thread, so a job row records its owner (host:pid) and a heartbeat that the
+owning process refreshes while the job is queued or running. Another
+process only takes over a period whose active job has not shown a
+heartbeat for STALE_AFTER, i.e. whose owner has died.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Employee, PayrollJob
+from .metrics import invalidate_payroll
+from .payroll import build_records, clear_changes, period_summaries
+from .runs import commit_run
+
+CHUNK_SIZE = 500
+HEARTBEAT_INTERVAL = 15                 # seconds
+STALE_AFTER = timedelta(minutes=2)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='payroll')
+_lock = threading.Lock()
+_running = {}   # job id -> Future, jobs owned by this process
+_heartbeat = None
+
+
+def job_owner():
+    # per call, not at import: forked server workers share the parent's module state
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def is_stale(job, now=None):
+    """True if the job's owner has not refreshed its heartbeat within STALE_AFTER."""
+    return job.heartbeat_at is None or job.heartbeat_at < (now or timezone.now()) - STALE_AFTER
+
+
+def enqueue_payroll(period):
+    """Start (or return the already active) payroll job for the period."""
+    with _lock:
+        job = period.jobs.filter(status__in=('QUEUED', 'RUNNING')).first()
+        if job:
+            if job.owner == job_owner():
+                alive = job.id in _running and not _running[job.id].done()
+            else:
+                alive = not is_stale(job)
+            if alive:
+                return job
+            # left behind by a process that stopped before finishing it
+            PayrollJob.objects.filter(pk=job.pk).update(status='FAILED', error='interrupted', finished_at=timezone.now())
+        job = PayrollJob.objects.create(period=period, owner=job_owner(), heartbeat_at=timezone.now())
+        _running[job.id] = _executor.submit(_run, job.id)
+        _start_heartbeat()
+        return job
+
+
+def _start_heartbeat():
+    # called with _lock held
+    global _heartbeat
+    if _heartbeat is None:
+        _heartbeat = threading.Thread(target=_beat, name='payroll-heartbeat', daemon=True)
+        _heartbeat.start()
+
+
+def _beat():
+    # refresh the heartbeat of this process's queued and running jobs until there are none
+    global _heartbeat
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _lock:
+            ids = list(_running)
+            if not ids:
+                _heartbeat = None
+                return
+        try:
+            PayrollJob.objects.filter(pk__in=ids, status__in=('QUEUED', 'RUNNING')).update(heartbeat_at=timezone.now())
+        except DatabaseError:
+            pass    # database busy; the next beat is well within STALE_AFTER
+        finally:
+            connection.close()
+
+
+def _run(job_id):
+    try:
+        run_payroll_job(PayrollJob.objects.select_related('period').get(pk=job_id))
+    finally:
+        with _lock:
+            _running.pop(job_id, None)
+        close_old_connections()
+
+
+def run_payroll_job(job, chunk_size=CHUNK_SIZE):
+    """Compute the period's payroll in chunks, then commit it atomically as a new run."""
+    period = job.period
+    try:
+        if period.locked:
+            raise ValueError('Period locked')
+        started = timezone.now()
+        employees = list(Employee.objects.filter(active=True).only('id', 'base_salary', 'hourly_rate').order_by('id'))
+        PayrollJob.objects.filter(pk=job.pk).update(status='RUNNING', total=len(employees), started_at=started,
+                                                    heartbeat_at=started)
+        records = []
+        for i in range(0, len(employees), chunk_size):
+            chunk = employees[i:i + chunk_size]
+            summaries = period_summaries(period, [e.id for e in chunk])
+            records.extend(build_records(period, chunk, summaries))
+            PayrollJob.objects.filter(pk=job.pk).update(processed=len(records), heartbeat_at=timezone.now())
+        with transaction.atomic():
+            commit_run(period, records, 'FULL')
+            # changes made while the job ran stay marked for an incremental run
+            clear_changes(period, before=started)
+            invalidate_payroll()
+            PayrollJob.objects.filter(pk=job.pk).update(status='DONE', finished_at=timezone.now())
+    except Exception as e:
+        PayrollJob.objects.filter(pk=job.pk).update(
+            status='FAILED', error=f"{e}\n\n{traceback.format_exc()}", finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,73 @@
+"""Helpers shared by the bench_* management commands (not a command itself)."""
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, time as dtime, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from core.attendance import refresh_monthly
+from core.models import Employee, Attendance
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back, so benches leave no data behind."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+@contextmanager
+def timed(stdout, label):
+    """Print wall time and number of SQL queries for the block."""
+    queries = []
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    with connection.execute_wrapper(count):
+        yield
+    stdout.write(f"{label:<28} {time.perf_counter() - start:8.2f}s  {len(queries):>7} queries")
+
+
+def seed_employees(n, prefix='BENCH'):
+    rnd = random.Random(42)
+    emps = [Employee(code=f'{prefix}{i:06d}', first_name='Bench', last_name=str(i),
+                     email=f'{prefix.lower()}{i}@example.com', department=rnd.choice(['Ops', 'Sales', 'IT', 'HR']),
+                     base_salary=Decimal(rnd.randrange(15000, 150000)), hourly_rate=Decimal(rnd.randrange(100, 900)),
+                     ifsc='SBIN0001234', account_no=f'{rnd.randrange(10**10, 10**12)}')
+            for i in range(n)]
+    Employee.objects.bulk_create(emps, batch_size=2000)
+    return list(Employee.objects.filter(code__startswith=prefix).order_by('id'))
+
+
+def seed_attendance(employees, year, month, days=26):
+    """One row per employee per working day; the mix of statuses is fixed per seed."""
+    rnd = random.Random(7)
+    rows = []
+    start = date(year, month, 1)
+    for emp in employees:
+        for d in range(days):
+            dt = start + timedelta(days=d)
+            r = rnd.random()
+            if r < 0.05:
+                rows.append(Attendance(employee=emp, date=dt, status='ABSENT'))
+            else:
+                status = 'HALF_DAY' if r < 0.08 else ('LATE' if r < 0.15 else 'PRESENT')
+                ot = Decimal(rnd.choice([0, 0, 0, 1, 2])) if status != 'HALF_DAY' else Decimal(0)
+                rows.append(Attendance(employee=emp, date=dt, status=status,
+                                       check_in=dtime(9, 0), check_out=dtime(18, 0),
+                                       work_hours=Decimal(4 if status == 'HALF_DAY' else 8) + ot,
+                                       overtime_hours=ot))
+    Attendance.objects.bulk_create(rows, batch_size=5000)
+    refresh_monthly((emp.id, year, month) for emp in employees)
+    return len(rows)
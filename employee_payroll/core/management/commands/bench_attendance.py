@@ -0,0 +1,61 @@
+from datetime import date, time
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from core.models import Attendance
+from ._bench import rolled_back, timed, seed_employees
+
+
+def legacy_bulk(rows):
+    # the per-employee update_or_create + save() loop attendance_bulk used before core.attendance
+    for employee_id, dt, status, check_in, check_out in rows:
+        Attendance.objects.update_or_create(employee_id=employee_id, date=dt,
+                                            defaults={'status': status, 'check_in': check_in,
+                                                      'check_out': check_out})
+
+
+class Command(BaseCommand):
+    help = "Benchmark the bulk attendance form (seeds employees in a transaction that is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=5000)
+        parser.add_argument('--skip-legacy', action='store_true', help="only time the bulk view")
+
+    def handle(self, *args, **options):
+        dt = date(2031, 1, 6)
+        with rolled_back():
+            emps = seed_employees(options['employees'])
+            shifts = [('PRESENT', '09:00', '18:00'), ('PRESENT', '09:45', '19:30'), ('PRESENT', '22:00', '06:30'),
+                      ('PRESENT', '09:00', '12:00'), ('ABSENT', '', ''), ('HALF_DAY', '', '')]
+            data = {'date': dt.isoformat()}
+            rows = []
+            for i, e in enumerate(emps):
+                status, ci, co = shifts[i % len(shifts)]
+                data.update({f'status_{e.id}': status, f'check_in_{e.id}': ci, f'check_out_{e.id}': co})
+                rows.append((e.id, dt, status, time.fromisoformat(ci) if ci else None,
+                             time.fromisoformat(co) if co else None))
+            self.stdout.write(f"{len(emps)} employees")
+
+            body = urlencode(data)  # what a browser sends for the form (no enctype)
+            client = Client()
+            client.force_login(User.objects.create(username='bench_attendance', is_staff=True))
+            with timed(self.stdout, "bulk view POST"):
+                resp = client.post(reverse('attendance_bulk'), body, content_type='application/x-www-form-urlencoded')
+            if resp.status_code != 302:
+                self.stdout.write(self.style.ERROR(f"bulk view answered {resp.status_code}"))
+                return
+            with timed(self.stdout, "bulk view POST (update)"):
+                client.post(reverse('attendance_bulk'), body, content_type='application/x-www-form-urlencoded')
+            fields = ('employee_id', 'status', 'work_hours', 'overtime_hours')
+            bulk = set(Attendance.objects.filter(date=dt, employee__in=emps).values_list(*fields))
+            if not options['skip_legacy']:
+                Attendance.objects.filter(date=dt, employee__in=emps).delete()
+                with timed(self.stdout, "legacy per-employee loop"):
+                    legacy_bulk(rows)
+                legacy = set(Attendance.objects.filter(date=dt, employee__in=emps).values_list(*fields))
+                same = bulk == legacy
+                self.stdout.write(self.style.SUCCESS("results match") if same else self.style.ERROR("results differ"))
@@ -0,0 +1,63 @@
+import resource
+import time
+from io import BytesIO
+
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from core.models import Attendance
+from ._bench import rolled_back, seed_employees, seed_attendance
+
+
+def legacy_export(year):
+    # the in-memory Workbook + BytesIO export attendance_export_excel used before (whole year)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(['Emp Code','Name','Date','Status','Check In','Check Out','Hours','OT Hours'])
+    for a in Attendance.objects.select_related('employee').filter(date__year=year).order_by('employee__code','date'):
+        ws.append([a.employee.code, f"{a.employee.first_name} {a.employee.last_name}".strip(), a.date.isoformat(),
+                   a.status, a.check_in.isoformat() if a.check_in else '',
+                   a.check_out.isoformat() if a.check_out else '', float(a.work_hours), float(a.overtime_hours)])
+    stream = BytesIO()
+    wb.save(stream)
+    stream.seek(0)
+    return stream.read()
+
+
+class Command(BaseCommand):
+    help = "Benchmark a year-long attendance Excel export (seeds data in a transaction that is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=22, help="attendance days per month")
+        parser.add_argument('--skip-legacy', action='store_true', help="only time the streaming export")
+
+    def measure(self, label, fn):
+        # growth of the process' peak RSS (KiB on Linux), so run the leaner export first
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - start
+        grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+        self.stdout.write(f"{label:<20} {elapsed:8.2f}s  peak RSS +{grown / 1024:7.1f} MiB  {size / 2**20:6.1f} MiB file")
+
+    def handle(self, *args, **options):
+        year = 2031
+        with rolled_back():
+            emps = seed_employees(options['employees'])
+            n = sum(seed_attendance(emps, year, month, options['days']) for month in range(1, 13))
+            self.stdout.write(f"{len(emps)} employees, {n} attendance rows")
+            client = Client()
+            client.force_login(User.objects.create(username='bench_exports', is_staff=True))
+            url = reverse('attendance_export_excel')
+
+            def streaming():
+                resp = client.get(url, {'year': year, 'month': ''})
+                # not resp.close(): its request_finished signal would close the bench's DB connection
+                return sum(len(chunk) for chunk in resp.streaming_content)
+            self.measure("streaming export", streaming)
+            if not options['skip_legacy']:
+                self.measure("legacy in-memory", lambda: len(legacy_export(year)))
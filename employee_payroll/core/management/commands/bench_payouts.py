@@ -0,0 +1,42 @@
+import os
+import resource
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import PayrollPeriod
+from core.payouts import FORMATS, validate_payouts, write_payout
+from core.payroll import generate_payroll
+from ._bench import rolled_back, seed_employees
+
+
+class Command(BaseCommand):
+    help = "Benchmark bank payout file generation (seeds employees and payroll in a transaction that is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=50000)
+
+    def measure(self, label, fn):
+        # growth of the process' peak RSS (KiB on Linux)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        result, size = fn()
+        elapsed = time.perf_counter() - start
+        grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+        self.stdout.write(f"{label:<20} {elapsed:8.2f}s  peak RSS +{grown / 1024:7.1f} MiB  {size / 2**20:6.1f} MiB file  "
+                          f"{result['count']} paid, {len(result['skipped'])} skipped")
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            emps = seed_employees(options['employees'])
+            period = PayrollPeriod.objects.create(month=1, year=2031)
+            generate_payroll(period)
+            self.stdout.write(f"{len(emps)} employees")
+            self.measure("validate only", lambda: (validate_payouts(period), 0))
+            for fmt in sorted(FORMATS):
+                def write():
+                    with tempfile.TemporaryFile() as out:
+                        result = write_payout(period, fmt, out)
+                        return result, out.seek(0, os.SEEK_END)
+                self.measure(f"{fmt} file", write)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from core.calculators import compute_payroll_for_employee
+from core.models import Employee, Attendance, PayrollPeriod, PayrollRecord
+from core.payroll import generate_payroll, period_range
+from ._bench import rolled_back, timed, seed_employees, seed_attendance
+
+
+def legacy_generate(period):
+    # the per-employee loop payroll_generate used before core.payroll (~5 queries per employee)
+    start_dt, end_dt = period_range(period.month, period.year)
+    PayrollRecord.objects.filter(period=period).delete()
+    for emp in Employee.objects.filter(active=True):
+        qs = Attendance.objects.filter(employee=emp, date__range=(start_dt, end_dt))
+        present = qs.filter(status__in=['PRESENT', 'LATE', 'HALF_DAY']).count()
+        absents = qs.filter(status='ABSENT').count()
+        half_days = qs.filter(status='HALF_DAY').count()
+        ot_hours = qs.aggregate(s=Sum('overtime_hours'))['s'] or 0
+        summary = {'present_days': present, 'absent_days': absents, 'half_days': half_days,
+                   'ot_hours': ot_hours, 'lop_days': absents + (half_days * 0.5)}
+        PayrollRecord.objects.create(period=period, employee=emp, **compute_payroll_for_employee(emp, summary))
+
+
+class Command(BaseCommand):
+    help = "Benchmark payroll generation (seeds employees/attendance in a transaction that is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=26)
+        parser.add_argument('--skip-legacy', action='store_true', help="only time the bulk engine")
+
+    def handle(self, *args, **options):
+        year, month = 2031, 1
+        with rolled_back():
+            with timed(self.stdout, "seed"):
+                emps = seed_employees(options['employees'])
+                n = seed_attendance(emps, year, month, options['days'])
+            self.stdout.write(f"{len(emps)} employees, {n} attendance rows")
+            period = PayrollPeriod.objects.create(month=month, year=year)
+            with timed(self.stdout, "bulk engine"):
+                generate_payroll(period)
+            bulk = {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)}
+            if not options['skip_legacy']:
+                with timed(self.stdout, "legacy per-employee loop"):
+                    legacy_generate(period)
+                legacy = {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)}
+                same = bulk == legacy
+                self.stdout.write(self.style.SUCCESS("results match") if same else self.style.ERROR("results differ"))
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.models import PayrollPeriod
+from core.payroll import generate_payroll
+from core.payslips import payslips_zip
+from ._bench import rolled_back, seed_employees, seed_attendance
+
+
+class Command(BaseCommand):
+    help = "Benchmark bulk payslip PDFs (needs wkhtmltopdf; data is rolled back, PDFs go to a temp dir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def run(self, label, period, workers):
+        start = time.perf_counter()
+        try:
+            tmp, n, rendered = payslips_zip(period, workers)
+        except OSError as e:
+            raise CommandError(f"wkhtmltopdf failed: {e}")
+        elapsed = time.perf_counter() - start
+        size = tmp.seek(0, os.SEEK_END)
+        tmp.close()
+        self.stdout.write(f"{label:<24} {elapsed:8.2f}s  {n / elapsed:8.1f} payslips/s  "
+                          f"{rendered:>6} rendered  {size / 2**20:6.1f} MiB zip")
+
+    def handle(self, *args, **options):
+        with rolled_back(), tempfile.TemporaryDirectory() as cache:
+            emps = seed_employees(options['employees'])
+            seed_attendance(emps, 2031, 1)
+            period = PayrollPeriod.objects.create(month=1, year=2031)
+            generate_payroll(period)
+            self.stdout.write(f"{period.records.count()} payroll records")
+            with override_settings(PAYSLIP_CACHE_DIR=os.path.join(cache, 'serial')):
+                self.run("cold, 1 worker", period, 1)
+            with override_settings(PAYSLIP_CACHE_DIR=os.path.join(cache, 'pool')):
+                self.run(f"cold, {options['workers']} workers", period, options['workers'])
+                self.run("cached", period, options['workers'])
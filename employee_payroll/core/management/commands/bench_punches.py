@@ -0,0 +1,62 @@
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.models import Attendance
+from core.punches import import_punches
+from ._bench import rolled_back, timed, seed_employees
+
+
+def write_log(path, employees, year, month, days, punches, fmt):
+    """Shuffled punch log: `punches` events per employee per working day (first/last plus noise)."""
+    rnd = random.Random(11)
+    events = []
+    start = datetime(year, month, 1)
+    for emp in employees:
+        for d in range(days):
+            day = start + timedelta(days=d)
+            first = day.replace(hour=8) + timedelta(minutes=rnd.randrange(0, 120))
+            last = first + timedelta(hours=rnd.choice([3, 8, 9, 10]), minutes=rnd.randrange(0, 60))
+            events += [first, last] + [first + (last - first) * rnd.random() for _ in range(punches - 2)]
+            events[-punches:] = [(emp.code, t) for t in events[-punches:]]
+    rnd.shuffle(events)
+    with open(path, 'w', encoding='utf-8') as fh:
+        if fmt == 'csv':
+            fh.write('employee,timestamp,device\n')
+            fh.writelines(f"{code},{t.isoformat(timespec='seconds')},GATE1\n" for code, t in events)
+        else:
+            fh.writelines(json.dumps({'employee': code, 'timestamp': t.isoformat(timespec='seconds')}) + '\n'
+                          for code, t in events)
+    return len(events)
+
+
+class Command(BaseCommand):
+    help = "Benchmark punch-log import (seeds employees in a transaction that is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=26)
+        parser.add_argument('--punches', type=int, default=6, help="events per employee per day (>= 2)")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+
+    def handle(self, *args, **options):
+        year, month = 2031, 1
+        fmt = options['format']
+        with tempfile.TemporaryDirectory() as tmp, rolled_back():
+            emps = seed_employees(options['employees'])
+            path = os.path.join(tmp, f'punches.{fmt}')
+            n = write_log(path, emps, year, month, options['days'], max(2, options['punches']), fmt)
+            self.stdout.write(f"{n} punches for {len(emps)} employees ({os.path.getsize(path) / 2**20:.1f} MiB)")
+            for label in ("import", "re-import"):
+                start = time.perf_counter()
+                with open(path, newline='', encoding='utf-8') as fh, timed(self.stdout, label):
+                    result = import_punches(fh, fmt)
+                elapsed = time.perf_counter() - start
+                rows = Attendance.objects.filter(employee__in=emps).count()
+                self.stdout.write(f"  {result['events'] / elapsed:,.0f} punches/s, "
+                                  f"{rows} attendance rows")
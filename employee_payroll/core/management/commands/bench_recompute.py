@@ -0,0 +1,43 @@
+import random
+from datetime import date, time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Attendance, PayrollPeriod, PayrollRecord
+from core.payroll import generate_payroll, recompute_changed
+from ._bench import rolled_back, timed, seed_employees, seed_attendance
+
+
+class Command(BaseCommand):
+    help = "Benchmark incremental payroll recomputation after a few attendance corrections (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=10000)
+        parser.add_argument('--corrections', type=int, default=50)
+
+    def handle(self, *args, **options):
+        year, month = 2031, 1
+        with rolled_back():
+            emps = seed_employees(options['employees'])
+            seed_attendance(emps, year, month)
+            period = PayrollPeriod.objects.create(month=month, year=year)
+            generate_payroll(period)
+            self.stdout.write(f"{len(emps)} employees, {options['corrections']} attendance corrections")
+
+            rnd = random.Random(3)
+            with timed(self.stdout, "corrections (save)"):
+                for emp in rnd.sample(emps, options['corrections']):
+                    a = Attendance.objects.get(employee=emp, date=date(year, month, 2))
+                    a.status, a.check_in, a.check_out = 'PRESENT', time(9, 0), time(21, 0)
+                    a.save()
+            with timed(self.stdout, "dry run"):
+                diff = recompute_changed(period, dry_run=True)
+            with timed(self.stdout, "incremental recompute"):
+                recompute_changed(period)
+            self.stdout.write(f"  {len(diff['changed'])} changed, {diff['unchanged']} unchanged")
+            incremental = {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)}
+            with timed(self.stdout, "full regeneration"):
+                generate_payroll(period)
+            full = {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)}
+            self.stdout.write(self.style.SUCCESS("results match") if incremental == full
+                              else self.style.ERROR("results differ"))
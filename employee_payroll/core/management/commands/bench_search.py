@@ -0,0 +1,68 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from core.models import Employee
+from core.search import keyset_page, search_employees
+from ._bench import rolled_back, timed
+
+FIRST = ['Arjun', 'Priya', 'Karthik', 'Divya', 'Suresh', 'Lakshmi', 'Vijay', 'Anitha', 'Rahul', 'Meena',
+         'Ganesh', 'Kavya', 'Ramesh', 'Deepa', 'Arun', 'Sangeetha', 'Manoj', 'Revathi', 'Prakash', 'Nandhini']
+LAST = ['Kumar', 'Raman', 'Subramanian', 'Iyer', 'Nair', 'Reddy', 'Krishnan', 'Pillai', 'Rao', 'Menon',
+        'Srinivasan', 'Natarajan', 'Shankar', 'Balaji', 'Mohan', 'Venkatesh', 'Chandran', 'Gopal', 'Das', 'Joseph']
+DEPARTMENTS = ['Operations', 'Sales', 'IT', 'HR', 'Finance', 'Logistics', 'Support', 'Marketing']
+DESIGNATIONS = ['Executive', 'Senior Executive', 'Associate', 'Team Lead', 'Manager', 'Analyst', 'Engineer']
+QUERIES = ['kum', 'priya nair', 'fin', 'SRCH054321', 'nobody']
+
+
+def legacy_page(q, page):
+    # employee_list before the search index: four icontains lookups and offset paging
+    qs = Employee.objects.filter(Q(code__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q)
+                                 | Q(email__icontains=q))
+    p = Paginator(qs.order_by('code'), 20).get_page(page)
+    return list(p)
+
+
+class Command(BaseCommand):
+    help = "Benchmark employee search and keyset paging against icontains and offset paging (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def per_call(self, label, fn):
+        start = time.perf_counter()
+        for _ in range(self.repeat):
+            result = fn()
+        self.stdout.write(f"  {label:<34} {(time.perf_counter() - start) * 1000 / self.repeat:8.1f} ms")
+        return result
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        rnd = random.Random(11)
+        n = options['employees']
+        with rolled_back():
+            emps = []
+            for i in range(n):
+                first, last = rnd.choice(FIRST), rnd.choice(LAST)
+                emps.append(Employee(code=f'SRCH{i:06d}', first_name=first, last_name=last,
+                                     email=f'{first.lower()}.{last.lower()}{i}@example.com',
+                                     department=rnd.choice(DEPARTMENTS), designation=rnd.choice(DESIGNATIONS),
+                                     base_salary=Decimal(rnd.randrange(15000, 150000))))
+            with timed(self.stdout, f"insert {n} (index kept)"):
+                Employee.objects.bulk_create(emps, batch_size=2000)
+
+            for q in QUERIES:
+                rows, _, after = self.per_call(f"{q!r} search, first page", lambda: keyset_page(search_employees(q)))
+                self.per_call(f"{q!r} icontains, first page", lambda: legacy_page(q, 1))
+                self.stdout.write(f"    {len(rows)} on first page, {search_employees(q).count()} matches, "
+                                  f"{len(legacy_page(q, 1))} on legacy first page")
+
+            deep = Employee.objects.order_by('code').values_list('code', flat=True)[n - 100]
+            self.stdout.write(f"deep page (~{n - 100}th employee, no query)")
+            self.per_call("keyset after cursor", lambda: keyset_page(Employee.objects.all(), after=deep))
+            self.per_call("offset page", lambda: legacy_page('', (n - 100) // 20))
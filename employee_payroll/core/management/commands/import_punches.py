@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.punches import FORMATS, PunchFormatError, import_punches
+
+
+class Command(BaseCommand):
+    help = "Import a biometric punch log (CSV or JSON lines) into attendance; safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help="default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        try:
+            with open(path, newline='', encoding='utf-8') as fh:
+                result = import_punches(fh, fmt, options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except PunchFormatError as e:
+            raise CommandError(f"{path}: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['events']} punches, {result['written']} attendance rows written"))
+        if result['unknown']:
+            self.stdout.write(self.style.WARNING(
+                f"skipped {len(result['unknown'])} unknown employee code(s): {', '.join(result['unknown'][:20])}"))
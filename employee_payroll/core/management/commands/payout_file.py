@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import PayrollPeriod
+from core.payouts import FORMATS, write_payout
+
+
+class Command(BaseCommand):
+    help = "Write the bank payout file for a payroll period's net pay."
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int)
+        parser.add_argument('month', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='neft')
+
+    def handle(self, *args, **options):
+        try:
+            period = PayrollPeriod.objects.get(year=options['year'], month=options['month'])
+        except PayrollPeriod.DoesNotExist:
+            raise CommandError(f"no payroll period {options['month']:02d}/{options['year']}")
+        try:
+            with open(options['path'], 'wb') as out:
+                result = write_payout(period, options['format'], out)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"{result['count']} payments, total {result['total']}"))
+        for code, reason in result['skipped'][:20]:
+            self.stdout.write(self.style.WARNING(f"skipped {code}: {reason}"))
+        if len(result['skipped']) > 20:
+            self.stdout.write(self.style.WARNING(f"... and {len(result['skipped']) - 20} more"))
@@ -0,0 +1,84 @@
+"""
+Dashboard metrics through the cache framework.
+
+Each group of metrics has its own key and is computed on a miss:
+
+    headcount        active employees, total and per department
+    present:<date>   employees present on a day
+    payroll          latest period and gross/net per period and department
+                     for the last TREND_PERIODS periods with records
+
+Writers drop only the keys they can affect: signals (core.signals) for
+Employee/Attendance/PayrollPeriod/PayrollRecord saves and deletes, and the
+bulk attendance and payroll writers explicitly. Deletes wait for the
+transaction to commit so a concurrent miss cannot re-cache old data.
+METRICS_CACHE_TIMEOUT bounds staleness when every process has its own
+local-memory cache.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import PRESENT_STATUSES, Attendance, Employee, PayrollPeriod, PayrollRecord
+
+HEADCOUNT_KEY = 'metrics:headcount'
+PAYROLL_KEY = 'metrics:payroll'
+TREND_PERIODS = 6
+
+def _present_key(day):
+    return f'metrics:present:{day.isoformat()}'
+
+def _cached(key, compute):
+    return cache.get_or_set(key, compute, getattr(settings, 'METRICS_CACHE_TIMEOUT', 300))
+
+def _invalidate(*keys):
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+def invalidate_employees():
+    # department changes move payroll cost between departments too
+    _invalidate(HEADCOUNT_KEY, PAYROLL_KEY)
+
+def invalidate_attendance(days):
+    _invalidate(*{_present_key(d) for d in days})
+
+def invalidate_payroll():
+    _invalidate(PAYROLL_KEY)
+
+def _headcount():
+    rows = Employee.objects.filter(active=True).values('department').annotate(n=Count('id')).order_by('department')
+    departments = [(r['department'] or 'Unassigned', r['n']) for r in rows]
+    return {'total': sum(n for _, n in departments), 'departments': departments}
+
+def _payroll():
+    latest = PayrollPeriod.objects.order_by('-year', '-month').first()
+    periods = list(PayrollPeriod.objects.filter(records__isnull=False).distinct()
+                   .order_by('-year', '-month')[:TREND_PERIODS])[::-1]
+    rows = (PayrollRecord.objects.filter(period__in=periods).values('period_id', 'employee__department')
+            .annotate(gross=Sum('gross'), net=Sum('net'), n=Count('id')).order_by())
+    totals = {p.id: {'gross': 0, 'net': 0, 'employees': 0} for p in periods}
+    by_dept = defaultdict(dict)
+    for r in rows:
+        t = totals[r['period_id']]
+        t['gross'] += r['gross']
+        t['net'] += r['net']
+        t['employees'] += r['n']
+        by_dept[r['employee__department'] or 'Unassigned'][r['period_id']] = r['gross']
+    return {
+        'latest': (latest.month, latest.year) if latest else None,
+        'periods': [{'label': f'{p.month:02d}/{p.year}', **totals[p.id]} for p in periods],
+        'departments': [{'name': name, 'gross': [costs.get(p.id, 0) for p in periods]}
+                        for name, costs in sorted(by_dept.items())],
+    }
+
+def headcount():
+    return _cached(HEADCOUNT_KEY, _headcount)
+
+def present_on(day):
+    return _cached(_present_key(day),
+                   lambda: Attendance.objects.filter(date=day, status__in=PRESENT_STATUSES).count())
+
+def payroll_trend():
+    return _cached(PAYROLL_KEY, _payroll)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_payrolljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
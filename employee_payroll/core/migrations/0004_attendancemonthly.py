@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill(apps, schema_editor):
+    Attendance = apps.get_model('core', 'Attendance')
+    AttendanceMonthly = apps.get_model('core', 'AttendanceMonthly')
+    rows = Attendance.objects.annotate(y=ExtractYear('date'), m=ExtractMonth('date')).values(
+        'employee_id', 'y', 'm').annotate(
+        present=Count('id', filter=Q(status__in=('PRESENT', 'LATE', 'HALF_DAY'))),
+        absents=Count('id', filter=Q(status='ABSENT')),
+        half_days=Count('id', filter=Q(status='HALF_DAY')),
+        late=Count('id', filter=Q(status='LATE')),
+        work_hours=Sum('work_hours'),
+        ot_hours=Sum('overtime_hours'),
+    ).order_by()
+    AttendanceMonthly.objects.bulk_create(
+        [AttendanceMonthly(employee_id=r['employee_id'], year=r['y'], month=r['m'], present_days=r['present'],
+                           absent_days=r['absents'], half_days=r['half_days'], late_days=r['late'],
+                           work_hours=r['work_hours'] or 0, ot_hours=r['ot_hours'] or 0)
+         for r in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_payrollrecord_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('present_days', models.IntegerField(default=0)),
+                ('absent_days', models.IntegerField(default=0)),
+                ('half_days', models.IntegerField(default=0)),
+                ('late_days', models.IntegerField(default=0)),
+                ('work_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('ot_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to='core.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'month'], name='core_attend_year_0dae18_idx')],
+                'unique_together': {('employee', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
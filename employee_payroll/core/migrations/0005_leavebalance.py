@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_attendancemonthly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('type', models.CharField(choices=[('CL', 'Casual'), ('SL', 'Sick'), ('PL', 'Privilege'), ('LOP', 'Loss of Pay')], max_length=3)),
+                ('days', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balances', to='core.employee')),
+            ],
+            options={
+                'unique_together': {('employee', 'year', 'type')},
+            },
+        ),
+    ]
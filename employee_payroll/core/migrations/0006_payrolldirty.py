@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_leavebalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollDirty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_dirty', to='core.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'month'], name='core_payrol_year_efbc7e_idx')],
+                'unique_together': {('employee', 'year', 'month')},
+            },
+        ),
+    ]
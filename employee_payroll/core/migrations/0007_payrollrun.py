@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PAY_COLUMNS = ('basic', 'hra', 'allowances', 'overtime_pay', 'pf', 'esi', 'tax', 'lop', 'gross', 'net')
+
+
+def baseline(apps, schema_editor):
+    # existing records become run 1 of their period, so later runs can be diffed against them
+    PayrollPeriod = apps.get_model('core', 'PayrollPeriod')
+    PayrollRecord = apps.get_model('core', 'PayrollRecord')
+    PayrollRun = apps.get_model('core', 'PayrollRun')
+    PayrollRecordVersion = apps.get_model('core', 'PayrollRecordVersion')
+    for period in PayrollPeriod.objects.filter(records__isnull=False).distinct():
+        records = list(PayrollRecord.objects.filter(period=period).values('employee_id', 'employee__code', *PAY_COLUMNS))
+        run = PayrollRun.objects.create(period=period, number=1, kind='BASELINE', added=len(records))
+        PayrollRecordVersion.objects.bulk_create(
+            [PayrollRecordVersion(run=run, period=period, employee_id=r['employee_id'], employee_code=r['employee__code'],
+                                  op='ADD', **{c: r[c] for c in PAY_COLUMNS})
+             for r in records], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_payrolldirty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField()),
+                ('kind', models.CharField(choices=[('BASELINE', 'BASELINE'), ('FULL', 'FULL'), ('INCREMENTAL', 'INCREMENTAL')], max_length=12)),
+                ('added', models.IntegerField(default=0)),
+                ('changed', models.IntegerField(default=0)),
+                ('removed', models.IntegerField(default=0)),
+                ('unchanged', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='core.payrollperiod')),
+            ],
+            options={
+                'ordering': ['period', 'number'],
+                'unique_together': {('period', 'number')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollRecordVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_code', models.CharField(max_length=20)),
+                ('op', models.CharField(choices=[('ADD', 'ADD'), ('CHANGE', 'CHANGE'), ('REMOVE', 'REMOVE')], max_length=6)),
+                ('basic', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('hra', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('allowances', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('overtime_pay', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('pf', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('esi', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('lop', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('employee', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='payroll_versions', to='core.employee')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='record_versions', to='core.payrollperiod')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='core.payrollrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'run'], name='core_payrol_period__72f6d5_idx'), models.Index(fields=['employee', 'period'], name='core_payrol_employe_f6ee12_idx')],
+            },
+        ),
+        migrations.RunPython(baseline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:22
+
+from django.db import migrations
+
+from core.search import FTS_TABLE, FTS_TRIGGERS, SEARCH_FIELDS, install_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in FTS_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif connection.vendor == 'postgresql':
+            for f in SEARCH_FIELDS:
+                cursor.execute(f'DROP INDEX IF EXISTS core_employee_{f}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_payrollrun'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
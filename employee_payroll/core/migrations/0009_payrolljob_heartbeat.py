@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_employee_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrolljob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payrolljob',
+            name='owner',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
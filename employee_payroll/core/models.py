@@ -23,12 +23,22 @@ class Employee(models.Model):
     def __str__(self):
         return f"{self.code} - {self.first_name} {self.last_name}".strip()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # pay inputs as loaded, so a save that changes them marks the employee's payroll as changed
+        obj._loaded_pay = tuple(obj.__dict__.get(f) for f in PAY_FIELDS)
+        return obj
+
+PAY_FIELDS = ('base_salary', 'hourly_rate', 'active')
+
 ATT_STATUS = (
     ('PRESENT','PRESENT'),
     ('ABSENT','ABSENT'),
     ('LATE','LATE'),
     ('HALF_DAY','HALF_DAY'),
 )
+PRESENT_STATUSES = ('PRESENT', 'LATE', 'HALF_DAY')
 
 class Attendance(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances')
@@ -44,33 +54,75 @@ class Attendance(models.Model):
         ordering = ['-date']
 
     def save(self, *args, **kwargs):
-        if self.check_in and self.check_out:
-            dt_in = datetime.combine(self.date, self.check_in)
-            dt_out = datetime.combine(self.date, self.check_out)
-            if dt_out < dt_in:
-                dt_out = dt_out + timedelta(days=1)
-            hours = (dt_out - dt_in).total_seconds() / 3600.0
-            self.work_hours = round(hours, 2)
-            self.overtime_hours = round(max(0.0, hours - 8.0), 2)
-            # Simple rules
-            if self.work_hours < 4:
-                self.status = 'HALF_DAY'
-            # Late if after 9:30
-            if self.check_in > datetime.strptime('09:30','%H:%M').time():
-                if self.status == 'PRESENT':
-                    self.status = 'LATE'
-        else:
-            # No times implies absent unless explicitly set
-            if self.status not in ['HALF_DAY','LATE','PRESENT']:
-                self.status = 'ABSENT'
+        self.status, self.work_hours, self.overtime_hours = derive_attendance(
+            self.date, self.check_in, self.check_out, self.status, self.work_hours, self.overtime_hours)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # employee/date the row was loaded under, so moving it also refreshes what it moved away from
+        if 'employee_id' in obj.__dict__ and 'date' in obj.__dict__:
+            obj._loaded_key = (obj.employee_id, obj.date)
+        return obj
+
+LATE_AFTER = datetime.strptime('09:30','%H:%M').time()
+
+def derive_attendance(day, check_in, check_out, status, work_hours=0, overtime_hours=0):
+    """
+    Attendance rules shared by Attendance.save() and bulk writers.
+    Returns (status, work_hours, overtime_hours).
+    """
+    if check_in and check_out:
+        dt_in = datetime.combine(day, check_in)
+        dt_out = datetime.combine(day, check_out)
+        if dt_out < dt_in:
+            dt_out = dt_out + timedelta(days=1)
+        hours = (dt_out - dt_in).total_seconds() / 3600.0
+        work_hours = round(hours, 2)
+        overtime_hours = round(max(0.0, hours - 8.0), 2)
+        # Simple rules
+        if work_hours < 4:
+            status = 'HALF_DAY'
+        # Late if after 9:30
+        if check_in > LATE_AFTER:
+            if status == 'PRESENT':
+                status = 'LATE'
+    else:
+        # No times implies absent unless explicitly set
+        if status not in ['HALF_DAY','LATE','PRESENT']:
+            status = 'ABSENT'
+    return status, work_hours, overtime_hours
+
+class AttendanceMonthly(models.Model):
+    """Per-employee month totals of Attendance, kept current by core.attendance.refresh_monthly()."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='monthly_attendance')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    present_days = models.IntegerField(default=0)
+    absent_days = models.IntegerField(default=0)
+    half_days = models.IntegerField(default=0)
+    late_days = models.IntegerField(default=0)
+    work_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    ot_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee','year','month')
+        indexes = [models.Index(fields=['year','month'])]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.month:02d}/{self.year}"
+
 LEAVE_TYPES = (
     ('CL','Casual'),
     ('SL','Sick'),
     ('PL','Privilege'),
     ('LOP','Loss of Pay'),
 )
+PAID_LEAVE_TYPES = ('CL','SL','PL')
+# yearly entitlement when an employee has no LeaveBalance row for the type
+DEFAULT_LEAVE_DAYS = {'CL': 12, 'SL': 12, 'PL': 15}
 
 class Leave(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leaves')
@@ -82,6 +134,24 @@ class Leave(models.Model):
     def __str__(self):
         return f"{self.employee.code} {self.type} {self.start_date} - {self.end_date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        obj._loaded_start = obj.__dict__.get('start_date')
+        return obj
+
+class LeaveBalance(models.Model):
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_balances')
+    year = models.IntegerField()
+    type = models.CharField(max_length=3, choices=LEAVE_TYPES)
+    days = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('employee','year','type')
+
+    def __str__(self):
+        return f"{self.employee.code} {self.type} {self.year}: {self.days}"
+
 class PayrollPeriod(models.Model):
     month = models.IntegerField()  # 1-12
     year = models.IntegerField()
@@ -111,6 +181,127 @@ class PayrollRecord(models.Model):
     net = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.employee.code} - {self.period}"
+
+class PayrollDirty(models.Model):
+    """An employee whose payroll inputs for a month changed since its unlocked period was computed."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='payroll_dirty')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    marked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee','year','month')
+        indexes = [models.Index(fields=['year','month'])]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.month:02d}/{self.year}"
+
+RUN_KIND = (
+    ('BASELINE','BASELINE'),
+    ('FULL','FULL'),
+    ('INCREMENTAL','INCREMENTAL'),
+)
+
+class PayrollRun(models.Model):
+    """One generation or recompute of a period's payroll, numbered from 1 within the period."""
+    period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, related_name='runs')
+    number = models.IntegerField()
+    kind = models.CharField(max_length=12, choices=RUN_KIND)
+    added = models.IntegerField(default=0)
+    changed = models.IntegerField(default=0)
+    removed = models.IntegerField(default=0)
+    unchanged = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('period','number')
+        ordering = ['period','number']
+
+    def __str__(self):
+        return f"{self.period} run {self.number} ({self.kind})"
+
+VERSION_OP = (
+    ('ADD','ADD'),
+    ('CHANGE','CHANGE'),
+    ('REMOVE','REMOVE'),
+)
+
+class PayrollRecordVersion(models.Model):
+    """
+    A payroll record as a run left it. Written once, never updated: a run only
+    stores the records it added, changed or removed (with the values before
+    removal). The employee is kept by id and code so deleting an employee
+    does not erase their payroll history.
+    """
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='versions')
+    period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, related_name='record_versions')
+    employee = models.ForeignKey(Employee, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='payroll_versions')
+    employee_code = models.CharField(max_length=20)
+    op = models.CharField(max_length=6, choices=VERSION_OP)
+
+    basic = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    hra = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    allowances = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    overtime_pay = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    pf = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    esi = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    lop = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    gross = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['period','run']),
+            models.Index(fields=['employee','period']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Payroll record versions are immutable')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.employee_code} {self.op} - {self.run}"
+
+JOB_STATUS = (
+    ('QUEUED','QUEUED'),
+    ('RUNNING','RUNNING'),
+    ('DONE','DONE'),
+    ('FAILED','FAILED'),
+)
+
+class PayrollJob(models.Model):
+    period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default='QUEUED')
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # the process running the job (host:pid) and when it last showed it was alive
+    owner = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def percent(self):
+        if self.status == 'DONE':
+            return 100
+        return int(self.processed * 100 / self.total) if self.total else 0
+
+    @property
+    def active(self):
+        return self.status in ('QUEUED', 'RUNNING')
+
+    def __str__(self):
+        return f"{self.period} {self.status} {self.processed}/{self.total}"
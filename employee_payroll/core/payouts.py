@@ -0,0 +1,201 @@
+"""
+Bank payout files for a period's net pay.
+
+The period's records are read with the employees' bank details as one
+ordered query through iterator(), validated row by row and written straight
+to the output file, so memory stays flat whatever the headcount. Rows that
+fail validation are left out of the file and reported with the reason:
+
+  * account number: 9 to 18 digits (spaces ignored)
+  * IFSC: 4 letters, a zero, 6 letters or digits
+  * net pay above zero, and a beneficiary name
+  * an account (number + IFSC) shared by several employees in the period,
+    found with one grouped query before the file is written
+
+Formats are registered with @payout_format and write a header, one line
+per payment and a trailer; amounts are exact Decimals. Each file carries a
+batch reference PAY<yyyymm>R<run> naming the payroll run it pays
+(core.runs), so a payment can be traced back to its audited record.
+"""
+import abc
+import io
+import re
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from tempfile import TemporaryFile
+
+from django.db.models import Count, Max, Value
+from django.db.models.functions import Replace, Trim, Upper
+from django.http import FileResponse
+
+from .models import PayrollRecord
+
+CHUNK_SIZE = 2000
+IFSC_RE = re.compile(r'[A-Z]{4}0[A-Z0-9]{6}')
+ACCOUNT_RE = re.compile(r'\d{9,18}')
+
+Payment = namedtuple('Payment', 'code name bank account ifsc amount')
+
+FORMATS = {}
+
+def payout_format(name):
+    """Class decorator registering a PayoutFormat subclass under `name`."""
+    def register(cls):
+        cls.name = name
+        FORMATS[name] = cls
+        return cls
+    return register
+
+class PayoutFormat(abc.ABC):
+    extension = 'txt'
+    content_type = 'text/plain'
+    line_end = '\r\n'
+
+    def __init__(self, period, reference, value_date):
+        self.period = period
+        self.reference = reference
+        self.value_date = value_date
+
+    def header(self):
+        return None
+
+    @abc.abstractmethod
+    def row(self, seq, p):
+        """The line for payment `p`, the `seq`th in the file."""
+
+    def trailer(self, count, total):
+        return None
+
+def _csv_field(value):
+    value = str(value)
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+def _ascii(value, width):
+    # fixed-width files take upper-case ASCII letters, digits and spaces only
+    return re.sub(r'[^A-Z0-9 ]', '', value.upper())[:width].ljust(width)
+
+def _paise(amount):
+    return int(amount * 100)
+
+@payout_format('neft')
+class NeftCsv(PayoutFormat):
+    """Bulk NEFT upload sheet as CSV, one beneficiary per line."""
+    extension = 'csv'
+    content_type = 'text/csv'
+
+    def __init__(self, period, reference, value_date):
+        super().__init__(period, reference, value_date)
+        # the same on every line
+        self._tail = (value_date.strftime('%d/%m/%Y'), f'Salary {period.month:02d}/{period.year}')
+
+    def header(self):
+        return 'Sr No,Beneficiary Name,Account Number,IFSC,Bank,Amount,Value Date,Narration,Reference'
+
+    def row(self, seq, p):
+        return ','.join(_csv_field(v) for v in (
+            seq, p.name, p.account, p.ifsc, p.bank, f'{p.amount:.2f}', *self._tail, f'{self.reference}-{p.code}'))
+
+@payout_format('fixed')
+class FixedWidth(PayoutFormat):
+    """
+    Host-to-host fixed-width file: an H record, one D record per payment and
+    a T record with the count and total for the bank's control check.
+    Amounts are in paise, zero-padded.
+    """
+    def header(self):
+        return f'H{self.reference:<20}{self.value_date:%Y%m%d}'
+
+    def row(self, seq, p):
+        ref = f'{self.reference}-{p.code}'[:30]
+        return f'D{seq:06d}{p.ifsc:<11}{p.account:<18}{_ascii(p.name, 35)}{_paise(p.amount):015d}{ref:<30}'
+
+    def trailer(self, count, total):
+        return f'T{count:06d}{_paise(total):018d}'
+
+def payout_reference(period):
+    run = period.runs.aggregate(n=Max('number'))['n'] or 0
+    return f'PAY{period.year}{period.month:02d}R{run}'
+
+def payments(period):
+    """Payment rows for the period's records, by employee code (one streamed query)."""
+    qs = PayrollRecord.objects.filter(period=period).order_by('employee__code').values_list(
+        'employee__code', 'employee__first_name', 'employee__last_name', 'employee__bank_name',
+        'employee__account_no', 'employee__ifsc', 'net')
+    for code, first, last, bank, account, ifsc, net in qs.iterator(chunk_size=CHUNK_SIZE):
+        yield Payment(code, f'{first} {last}'.strip(), bank, account.replace(' ', ''), ifsc.strip().upper(), net)
+
+def shared_accounts(period):
+    """{(account, ifsc)} used by more than one employee with a record in the period."""
+    # grouped on the same normalized values payments() yields
+    rows = (PayrollRecord.objects.filter(period=period).exclude(employee__account_no='')
+            .annotate(account=Replace('employee__account_no', Value(' '), Value('')),
+                      ifsc=Upper(Trim('employee__ifsc')))
+            .values('account', 'ifsc').annotate(n=Count('id')).filter(n__gt=1))
+    return {(r['account'], r['ifsc']) for r in rows}
+
+def payment_problem(p, shared=()):
+    """Why the payment cannot be sent, or None."""
+    if p.amount <= 0:
+        return 'net pay is not positive'
+    if not p.name:
+        return 'missing beneficiary name'
+    if not ACCOUNT_RE.fullmatch(p.account):
+        return 'invalid account number'
+    if not IFSC_RE.fullmatch(p.ifsc):
+        return 'invalid IFSC'
+    if (p.account, p.ifsc) in shared:
+        return 'account shared with another employee'
+    return None
+
+def valid_payments(period, skipped):
+    """Yield the period's payments that can be sent; append (employee code, reason) for the others to `skipped`."""
+    shared = shared_accounts(period)
+    for p in payments(period):
+        problem = payment_problem(p, shared)
+        if problem:
+            skipped.append((p.code, problem))
+        else:
+            yield p
+
+def validate_payouts(period):
+    """{'count', 'total', 'skipped': [(employee code, reason)]} without writing a file."""
+    skipped, count, total = [], 0, Decimal('0')
+    for p in valid_payments(period, skipped):
+        count += 1
+        total += p.amount
+    return {'count': count, 'total': total, 'skipped': skipped}
+
+def write_payout(period, fmt, out, value_date=None):
+    """
+    Write the period's valid payments in format `fmt` to the binary file `out`.
+    Returns the same summary as validate_payouts().
+    """
+    spec = FORMATS[fmt](period, payout_reference(period), value_date or date.today())
+    text = io.TextIOWrapper(out, encoding='ascii', errors='replace', newline='')
+    skipped, count, total = [], 0, Decimal('0')
+    header = spec.header()
+    if header is not None:
+        text.write(header + spec.line_end)
+    for p in valid_payments(period, skipped):
+        count += 1
+        total += p.amount
+        text.write(spec.row(count, p) + spec.line_end)
+    trailer = spec.trailer(count, total)
+    if trailer is not None:
+        text.write(trailer + spec.line_end)
+    text.flush()
+    text.detach()
+    return {'count': count, 'total': total, 'skipped': skipped}
+
+def payout_filename(period, fmt):
+    return f'payout_{period.year}_{period.month:02d}_{fmt}.{FORMATS[fmt].extension}'
+
+def payout_response(period, fmt, value_date=None):
+    tmp = TemporaryFile()
+    write_payout(period, fmt, tmp, value_date)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=payout_filename(period, fmt),
+                        content_type=FORMATS[fmt].content_type)
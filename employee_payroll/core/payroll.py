@@ -0,0 +1,118 @@
+from calendar import monthrange
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from .attendance import attendance_totals
+from .leave import paid_leave_days
+from .metrics import invalidate_payroll
+from .models import Employee, Attendance, AttendanceMonthly, PayrollDirty, PayrollRecord
+from .runs import commit_run, payroll_diff
+from .calculators import compute_payroll_for_employee, compute_payroll_batch, from_paise, np
+
+def period_range(month, year):
+    _, last_day = monthrange(year, month)
+    return date(year, month, 1), date(year, month, last_day)
+
+def attendance_summaries(start_dt, end_dt, employee_ids=None):
+    """
+    Summaries for every employee with attendance in an arbitrary date range,
+    from one grouped query over the attendance rows:
+    {employee_id: {'present_days', 'absent_days', 'half_days', 'ot_hours', 'lop_days'}}.
+    For a calendar month use monthly_summaries().
+    """
+    qs = Attendance.objects.filter(date__range=(start_dt, end_dt))
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    return {r['employee_id']: make_summary(r['present'], r['absents'], r['half_days'], r['ot_hours'])
+            for r in attendance_totals(qs)}
+
+def monthly_summaries(year, month, employee_ids=None):
+    """Same as attendance_summaries() for a calendar month, read from the AttendanceMonthly rows."""
+    qs = AttendanceMonthly.objects.filter(year=year, month=month)
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    rows = qs.values_list('employee_id', 'present_days', 'absent_days', 'half_days', 'ot_hours')
+    return {emp_id: make_summary(present, absents, half_days, ot) for emp_id, present, absents, half_days, ot in rows}
+
+def make_summary(present=0, absents=0, half_days=0, ot_hours=None, paid_leave=0):
+    # LOP: absents and half days, less those covered by paid leave
+    return {
+        'present_days': present,
+        'absent_days': absents,
+        'half_days': half_days,
+        'ot_hours': ot_hours or 0,
+        'paid_leave_days': paid_leave,
+        'lop_days': absents + (half_days * 0.5) - paid_leave,
+    }
+
+def period_summaries(period, employee_ids=None):
+    """monthly_summaries() with absences on approved paid leave taken out of LOP (core.leave)."""
+    summaries = monthly_summaries(period.year, period.month, employee_ids)
+    paid = paid_leave_days(*period_range(period.month, period.year), employee_ids)
+    for emp_id, days in paid.items():
+        s = summaries.get(emp_id)
+        if s:
+            summaries[emp_id] = make_summary(s['present_days'], s['absent_days'], s['half_days'], s['ot_hours'], days)
+    return summaries
+
+def build_records(period, employees, summaries):
+    """Unsaved PayrollRecord objects for `employees` (employees without attendance get an empty summary)."""
+    empty = make_summary()
+    rows = [summaries.get(emp.id, empty) for emp in employees]
+    if np is None or not employees:
+        return [PayrollRecord(period=period, employee=emp, **compute_payroll_for_employee(emp, summary))
+                for emp, summary in zip(employees, rows)]
+    pay = compute_payroll_batch([emp.base_salary for emp in employees], [emp.hourly_rate for emp in employees],
+                                [r['ot_hours'] for r in rows], [r['lop_days'] for r in rows])
+    cols = {k: from_paise(v) for k, v in pay.items()}
+    return [PayrollRecord(period=period, employee=emp, **{k: cols[k][i] for k in cols})
+            for i, emp in enumerate(employees)]
+
+def generate_payroll(period, batch_size=1000):
+    """
+    Recompute the period's payroll records for all active employees as a new
+    versioned run (core.runs). A handful of queries for the data (employees,
+    attendance summary, paid leave, current records) plus one INSERT per
+    `batch_size` records written, all in one transaction.
+    Returns the number of records.
+    """
+    started = timezone.now()
+    employees = list(Employee.objects.filter(active=True).only('id', 'base_salary', 'hourly_rate'))
+    summaries = period_summaries(period)
+    records = build_records(period, employees, summaries)
+    with transaction.atomic():
+        commit_run(period, records, 'FULL', batch_size=batch_size)
+        clear_changes(period, before=started)
+        invalidate_payroll()
+    return len(records)
+
+def clear_changes(period, before=None):
+    """Drop the period's change marks (those made up to `before`, if given)."""
+    qs = PayrollDirty.objects.filter(year=period.year, month=period.month)
+    if before is not None:
+        qs = qs.filter(marked_at__lte=before)
+    qs.delete()
+
+def recompute_changed(period, dry_run=False, batch_size=1000):
+    """
+    Recompute the period's records only for employees marked as changed
+    (core.changes) and return payroll_diff() of old vs new records. Employees
+    no longer active lose their record. Unless dry_run, the changes are
+    committed as an INCREMENTAL run and the marks read are cleared in one
+    transaction; marks made meanwhile stay for the next run.
+    """
+    started = timezone.now()
+    ids = list(PayrollDirty.objects.filter(year=period.year, month=period.month)
+               .values_list('employee_id', flat=True))
+    employees = list(Employee.objects.filter(active=True, id__in=ids).only('id', 'base_salary', 'hourly_rate'))
+    records = build_records(period, employees, period_summaries(period, [e.id for e in employees]))
+    if dry_run:
+        old = {r.employee_id: r for r in PayrollRecord.objects.filter(period=period, employee_id__in=ids)}
+        return payroll_diff(old, {r.employee_id: r for r in records})
+    with transaction.atomic():
+        _, diff = commit_run(period, records, 'INCREMENTAL', employee_ids=ids, batch_size=batch_size)
+        clear_changes(period, before=started)
+        invalidate_payroll()
+    return diff
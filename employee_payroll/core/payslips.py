@@ -0,0 +1,110 @@
+"""
+Payslip PDFs with an on-disk cache and bulk (zip) generation.
+
+Each payslip is stored under PAYSLIP_CACHE_DIR/<year>_<month>/ as
+<record id>_<hash of its HTML>.pdf. The HTML is cheap to render and holds
+everything printed, so a regenerated record, an edited employee (name,
+bank details, PAN) or a changed template gets a new file, and an unchanged
+payslip is never converted twice.
+
+For a whole period the HTML is rendered here (one compiled template, no
+per-record lookups) and only the wkhtmltopdf conversions, which dominate
+the cost, are spread over a pool of worker processes. Workers are spawned
+rather than forked because the web process may already be running threads
+(payroll jobs), and they only need pdfkit, not Django.
+"""
+import hashlib
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryFile
+
+import pdfkit
+from django.conf import settings
+from django.http import FileResponse
+from django.template.loader import get_template
+
+from .exports import PDF_OPTIONS
+
+PAYSLIP_TEMPLATE = 'payroll/payslip_pdf.html'
+
+def payslip_filename(record):
+    return f'payslip_{record.employee.code}_{record.period.year}_{record.period.month:02d}.pdf'
+
+def _period_dir(period):
+    return Path(settings.PAYSLIP_CACHE_DIR) / f'{period.year}_{period.month:02d}'
+
+def payslip_path(record, html):
+    digest = hashlib.sha256(html.encode()).hexdigest()[:20]
+    return _period_dir(record.period) / f'{record.id}_{digest}.pdf'
+
+def _render_file(job):
+    # runs in a worker process: html -> pdf, written under a temp name then moved into place
+    html, path = job
+    tmp = f'{path}.{os.getpid()}.tmp'
+    pdfkit.from_string(html, tmp, options=PDF_OPTIONS)
+    os.replace(tmp, path)
+    return path
+
+def render_payslips(records, workers=None):
+    """
+    Make sure every record has a cached PDF. Returns ([(record, path)], number rendered).
+    Records need employee and period loaded (select_related).
+    """
+    template = get_template(PAYSLIP_TEMPLATE)
+    out, todo = [], []
+    for r in records:
+        html = template.render({'r': r})
+        path = payslip_path(r, html)
+        out.append((r, path))
+        if not path.exists():
+            todo.append((html, str(path)))
+    for d in {os.path.dirname(p) for _, p in todo}:
+        os.makedirs(d, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    if workers <= 1:
+        for job in todo:
+            _render_file(job)
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            list(pool.map(_render_file, todo, chunksize=max(1, len(todo) // (workers * 4))))
+    return out, len(todo)
+
+def payslip_pdf(record):
+    """Path of the record's payslip PDF, rendering it if it is not cached yet."""
+    return render_payslips([record], workers=1)[0][0][1]
+
+def prune_payslips(period, keep):
+    """Remove cached PDFs of the period that are not in `keep` (older versions, deleted records)."""
+    d = _period_dir(period)
+    if not d.is_dir():
+        return 0
+    keep = {Path(p).name for p in keep}
+    stale = [p for p in d.glob('*.pdf') if p.name not in keep]
+    for p in stale:
+        p.unlink(missing_ok=True)
+    return len(stale)
+
+def payslips_zip(period, workers=None):
+    """
+    All payslips of the period in one zip (a temp file, positioned at 0).
+    Returns (file, number of payslips, number rendered now).
+    """
+    records = period.records.select_related('employee', 'period').order_by('employee__code')
+    paths, rendered = render_payslips(records, workers)
+    prune_payslips(period, [p for _, p in paths])
+    tmp = TemporaryFile()
+    # PDFs are already compressed
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as zf:
+        for r, path in paths:
+            zf.write(path, payslip_filename(r))
+    tmp.seek(0)
+    return tmp, len(paths), rendered
+
+def payslips_zip_response(period, workers=None):
+    tmp, _, _ = payslips_zip(period, workers)
+    return FileResponse(tmp, as_attachment=True, filename=f'payslips_{period.year}_{period.month:02d}.zip',
+                        content_type='application/zip')
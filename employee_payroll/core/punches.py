@@ -0,0 +1,111 @@
+"""
+Biometric punch-log import.
+
+Devices export one event per punch: an employee code and a timestamp, as
+CSV (``employee,timestamp`` header, extra columns ignored) or JSON lines
+(``{"employee": "E001", "timestamp": "2030-05-02T09:03:11"}``). Punches carry
+no in/out direction, so the log is read as a stream, each employee's punches
+are put in time order (the order of events in the file does not matter) and
+grouped into shifts: a shift starts at a punch and takes every later punch
+within MAX_SHIFT of that start, so a night shift (in 22:00, out 06:00 the
+next morning) stays one shift. The shift belongs to the date of its first
+punch.
+
+Each employee-day becomes one Attendance row (first punch = check-in, last
+punch = check-out, a lone punch leaves check-out empty) written with
+bulk_upsert_attendance(), so re-importing the same log rewrites the same rows
+and never duplicates them. A second shift starting on a day that already has
+one extends that day's check-out. All punches for a day's shifts should be
+in one import: a day present in a later file replaces that day's
+check-in/out.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .attendance import bulk_upsert_attendance
+from .models import Employee
+
+FORMATS = ('csv', 'jsonl')
+MAX_SHIFT = timedelta(hours=14)     # a punch later than this after the shift's first starts a new shift
+
+class PunchFormatError(ValueError):
+    pass
+
+def _parse_ts(value):
+    ts = datetime.fromisoformat(value.strip())
+    if timezone.is_aware(ts):
+        ts = timezone.localtime(ts).replace(tzinfo=None)
+    return ts
+
+def read_punches(fh, fmt='csv'):
+    """Yield (line_no, employee_code, timestamp) from an open text file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(fh)
+        if not reader.fieldnames or not {'employee', 'timestamp'} <= set(reader.fieldnames):
+            raise PunchFormatError("CSV header must contain 'employee' and 'timestamp'")
+        rows = ((reader.line_num, r['employee'], r['timestamp']) for r in reader)
+    elif fmt == 'jsonl':
+        rows = ((n, *_json_punch(n, line)) for n, line in enumerate(fh, 1) if line.strip())
+    else:
+        raise PunchFormatError(f"format must be one of {', '.join(FORMATS)}")
+    for line_no, code, ts in rows:
+        try:
+            yield line_no, (code or '').strip(), _parse_ts(ts or '')
+        except ValueError:
+            raise PunchFormatError(f"line {line_no}: invalid timestamp {ts!r}")
+
+def _json_punch(line_no, line):
+    try:
+        d = json.loads(line)
+        return d['employee'], d['timestamp']
+    except (ValueError, KeyError, TypeError):
+        raise PunchFormatError(f"line {line_no}: expected {{\"employee\": ..., \"timestamp\": ...}}")
+
+def pair_punches(punches):
+    """{(employee_code, date): [first, last]} from (line_no, code, timestamp) events, one entry per shift start date."""
+    stamps = defaultdict(list)
+    for _, code, ts in punches:
+        stamps[code].append(ts)
+    days = {}
+    for code, times in stamps.items():
+        times.sort()
+        start = None
+        for ts in times:
+            if start is None or ts - start > MAX_SHIFT:
+                start = ts
+                span = days.setdefault((code, ts.date()), [ts, ts])
+            span[1] = ts
+    return days
+
+def import_punches(fh, fmt='csv', batch_size=1000):
+    """
+    Import a punch log. Returns {'events', 'days', 'written', 'unknown'} where
+    unknown is the sorted list of employee codes not found.
+    """
+    events = 0
+    def counted(punches):
+        nonlocal events
+        for p in punches:
+            events += 1
+            yield p
+    days = pair_punches(counted(read_punches(fh, fmt)))
+
+    ids = dict(Employee.objects.values_list('code', 'id'))
+    unknown = set()
+    rows = []
+    for (code, day), (first, last) in sorted(days.items(), key=lambda kv: kv[0][1]):
+        emp_id = ids.get(code)
+        if emp_id is None:
+            unknown.add(code)
+            continue
+        check_out = last.time() if last > first else None
+        rows.append((emp_id, day, 'PRESENT', first.time(), check_out))
+    with transaction.atomic():
+        for i in range(0, len(rows), batch_size):
+            bulk_upsert_attendance(rows[i:i + batch_size], batch_size=batch_size)
+    return {'events': events, 'days': len(days), 'written': len(rows), 'unknown': sorted(unknown)}
@@ -0,0 +1,105 @@
+"""
+Versioned payroll runs.
+
+PayrollRecord holds a period's current payroll. Every writer of it
+(generate, background job, incremental recompute) goes through commit_run(),
+which compares the new records with the current ones and
+
+  * writes only the difference: added records are created, changed ones
+    replaced and removed ones deleted; unchanged records are not touched
+  * numbers the run (PayrollRun) and stores one immutable
+    PayrollRecordVersion per added, changed or removed record
+
+so nothing is lost when a period is regenerated, and storage grows with
+what changed, not with headcount. The period as of run N is, per employee,
+the latest version from runs 1..N (run_snapshot()); two runs are compared
+through the employees touched in between (run_diff()). Within a period run
+ids increase with run numbers, so both read the (period, run) index without
+joining PayrollRun; an employee's history across years reads the
+(employee, period) index.
+"""
+from django.db.models import Max
+
+from .models import Employee, PayrollRecord, PayrollRecordVersion, PayrollRun
+
+PAY_COLUMNS = ('basic', 'hra', 'allowances', 'overtime_pay', 'pf', 'esi', 'tax', 'lop', 'gross', 'net')
+
+def payroll_diff(old, new):
+    """
+    Compare {employee_id: record or version} before/after. Returns
+    {'changed': {employee_id: {column: (old, new)}}, 'added': [ids], 'removed': [ids], 'unchanged': n}.
+    """
+    changed, unchanged = {}, 0
+    for emp_id in old.keys() & new.keys():
+        cols = {c: (getattr(old[emp_id], c), getattr(new[emp_id], c)) for c in PAY_COLUMNS
+                if getattr(old[emp_id], c) != getattr(new[emp_id], c)}
+        if cols:
+            changed[emp_id] = cols
+        else:
+            unchanged += 1
+    return {'changed': changed, 'added': sorted(new.keys() - old.keys()),
+            'removed': sorted(old.keys() - new.keys()), 'unchanged': unchanged}
+
+def _version(run, record, op, codes):
+    return PayrollRecordVersion(run=run, period_id=run.period_id, employee_id=record.employee_id,
+                                employee_code=codes.get(record.employee_id, ''), op=op,
+                                **{c: getattr(record, c) for c in PAY_COLUMNS})
+
+def commit_run(period, records, kind, employee_ids=None, batch_size=1000):
+    """
+    Make the unsaved `records` the period's payroll, for every employee or only
+    `employee_ids` (current records in scope without a new one are removed),
+    and version the difference as a new run. Call inside a transaction.
+    Returns (run, payroll_diff() of current vs new).
+    """
+    qs = PayrollRecord.objects.filter(period=period)
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    old = {r.employee_id: r for r in qs.only('id', 'employee_id', *PAY_COLUMNS)}
+    new = {r.employee_id: r for r in records}
+    diff = payroll_diff(old, new)
+    stale = [*diff['changed'], *diff['removed']]
+    if stale:
+        PayrollRecord.objects.filter(pk__in=[old[i].pk for i in stale]).delete()
+    PayrollRecord.objects.bulk_create([new[i] for i in [*diff['changed'], *diff['added']]], batch_size=batch_size)
+
+    number = (PayrollRun.objects.filter(period=period).aggregate(n=Max('number'))['n'] or 0) + 1
+    run = PayrollRun.objects.create(period=period, number=number, kind=kind, added=len(diff['added']),
+                                    changed=len(diff['changed']), removed=len(diff['removed']),
+                                    unchanged=diff['unchanged'])
+    codes = dict(Employee.objects.filter(id__in=[*stale, *diff['added']]).values_list('id', 'code'))
+    versions = [_version(run, new[i], 'ADD', codes) for i in diff['added']]
+    versions += [_version(run, new[i], 'CHANGE', codes) for i in diff['changed']]
+    versions += [_version(run, old[i], 'REMOVE', codes) for i in diff['removed']]
+    PayrollRecordVersion.objects.bulk_create(versions, batch_size=batch_size)
+    return run, diff
+
+def run_snapshot(run, employee_ids=None):
+    """{employee_id: PayrollRecordVersion} for the records the period had after `run`."""
+    qs = PayrollRecordVersion.objects.filter(period_id=run.period_id, run_id__lte=run.id)
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    latest = {}
+    for v in qs.order_by('run_id'):
+        latest[v.employee_id] = v
+    return {emp_id: v for emp_id, v in latest.items() if v.op != 'REMOVE'}
+
+def run_diff(old_run, new_run):
+    """
+    payroll_diff() of the period after `old_run` (None: before its first run)
+    vs after `new_run`, reading only employees with versions in between.
+    'unchanged' counts those touched but back to the same values.
+    """
+    low = old_run.id if old_run else 0
+    touched = set(PayrollRecordVersion.objects.filter(period_id=new_run.period_id, run_id__gt=low,
+                                                      run_id__lte=new_run.id)
+                  .values_list('employee_id', flat=True))
+    old = run_snapshot(old_run, touched) if old_run else {}
+    return payroll_diff(old, run_snapshot(new_run, touched))
+
+def employee_history(employee_id, years=None):
+    """Every version of the employee's payroll, by period and run; `years` = (first, last) limits the periods."""
+    qs = PayrollRecordVersion.objects.filter(employee_id=employee_id).select_related('run', 'period')
+    if years:
+        qs = qs.filter(period__year__range=years)
+    return qs.order_by('period__year', 'period__month', 'run_id')
@@ -0,0 +1,142 @@
+"""
+Employee search.
+
+The query is split into words and every word must appear somewhere in code,
+first/last name, email, department or designation ("arj kum" finds Arjun
+Kumar, "umar" Kumar too, "sal" the Sales department, "001" code E001).
+
+    SQLite      an FTS5 table over core_employee with the trigram tokenizer
+                (external content, so only the index is stored), kept in
+                sync by triggers; words shorter than a trigram fall back to
+                icontains on the rows the longer words selected
+    PostgreSQL  pg_trgm GIN indexes on the UPPER() of each column, which
+                serve the icontains lookups
+    other       the same icontains lookups without an index
+
+install_search_index() creates whatever the database supports and is
+idempotent. It runs from the migration and again after every migrate,
+because SQLite table rebuilds for later schema changes drop the triggers;
+an FTS table built with another tokenizer is dropped and rebuilt.
+
+Lists are paged by keyset on the unique code: a page is "the next 20 codes
+after X", an index range scan whatever the depth, with no COUNT.
+"""
+import re
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Employee
+
+SEARCH_FIELDS = ('code', 'first_name', 'last_name', 'email', 'department', 'designation')
+PAGE_SIZE = 20
+
+FTS_TABLE = 'core_employee_fts'
+FTS_MIN_WORD = 3    # the trigram index cannot look up shorter words
+_fts = {}  # database name -> whether it has the FTS table
+_COLUMNS = ', '.join(SEARCH_FIELDS)
+_NEW = ', '.join(f'new.{f}' for f in SEARCH_FIELDS)
+_OLD = ', '.join(f'old.{f}' for f in SEARCH_FIELDS)
+FTS_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_employee BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW});
+        END""",
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_employee BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD});
+        END""",
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_COLUMNS} ON core_employee BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD});
+            INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW});
+        END""",
+}
+
+def _install_fts(cursor):
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+    row = cursor.fetchone()
+    if row and "tokenize='trigram'" not in row[0]:
+        # the word-prefix index of earlier versions
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE {FTS_TABLE}')
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s", [f'{FTS_TABLE}_%'])
+    if {name for name, in cursor.fetchall()} >= FTS_TRIGGERS.keys():
+        return
+    cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_COLUMNS}, "
+                   f"content='core_employee', content_rowid='id', tokenize='trigram')")
+    for sql in FTS_TRIGGERS.values():
+        cursor.execute(sql)
+    # rows written while a trigger was missing
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+def _install_trigram(cursor):
+    cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for f in SEARCH_FIELDS:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS core_employee_{f}_trgm ON core_employee '
+                       f'USING gin ((UPPER({f}::text)) gin_trgm_ops)')
+
+def install_search_index(connection):
+    """Create the search index for the connection's database, if it has one. Returns True if it has."""
+    install = {'sqlite': _install_fts, 'postgresql': _install_trigram}.get(connection.vendor)
+    if install is None:
+        return False
+    _fts.pop(connection.settings_dict['NAME'], None)
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            install(cursor)
+    except DatabaseError:
+        # no FTS5 in this SQLite build, or not allowed to create the extension
+        return False
+    return True
+
+def _has_fts(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts[name] = cursor.fetchone() is not None
+    return _fts[name]
+
+def search_words(q):
+    return re.findall(r'[^\W_]+', q.lower())
+
+def search_employees(q, qs=None):
+    """Employees (of `qs`) matching every word of `q`; all of them for an empty query."""
+    qs = Employee.objects.all() if qs is None else qs
+    if not q.strip():
+        return qs
+    words = search_words(q)
+    if not words:
+        return qs.none()
+    if _has_fts(connections[qs.db]):
+        indexed = [w for w in words if len(w) >= FTS_MIN_WORD]
+        if indexed:
+            match = ' '.join(f'"{w}"' for w in indexed)
+            qs = qs.filter(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+        words = [w for w in words if len(w) < FTS_MIN_WORD]
+    for w in words:
+        qs = qs.filter(Q(*[Q(**{f'{f}__icontains': w}) for f in SEARCH_FIELDS], _connector=Q.OR))
+    return qs
+
+def keyset_page(qs, after=None, before=None, size=PAGE_SIZE):
+    """
+    One page of `qs` by code: the `size` codes after `after`, or before
+    `before`. Returns (employees, previous cursor, next cursor); a cursor is
+    None at that end of the list.
+    """
+    if before:
+        rows = list(qs.filter(code__lt=before).order_by('-code')[:size + 1])
+        has_prev = len(rows) > size
+        rows = rows[:size][::-1]
+        return rows, (rows[0].code if has_prev else None), (rows[-1].code if rows else None)
+    if after:
+        qs = qs.filter(code__gt=after)
+    rows = list(qs.order_by('code')[:size + 1])
+    has_next = len(rows) > size
+    rows = rows[:size]
+    return rows, (rows[0].code if after and rows else None), (rows[-1].code if has_next else None)
@@ -0,0 +1,99 @@
+import threading
+
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from .attendance import refresh_monthly
+from .changes import mark_changed, mark_open_months
+from .metrics import invalidate_attendance, invalidate_employees, invalidate_payroll
+from .models import PAY_FIELDS, Attendance, Employee, Leave, LeaveBalance, PayrollPeriod, PayrollRecord
+from .search import install_search_index
+
+# employees whose delete is in progress in this thread: their attendance and
+# leave go with them, and marks or summaries written for them would point at
+# a deleted row
+_deleting = threading.local()
+
+def _being_deleted(employee_id):
+    return employee_id in getattr(_deleting, 'ids', ())
+
+def _attendance_keys(instance):
+    keys = {(instance.employee_id, instance.date)}
+    old = getattr(instance, '_loaded_key', None)
+    if old:
+        keys.add(old)
+    return keys
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, **kwargs):
+    keys = _attendance_keys(instance)
+    months = {(emp_id, d.year, d.month) for emp_id, d in keys}
+    refresh_monthly(months)
+    mark_changed(months)
+    invalidate_attendance({d for _, d in keys})
+    instance._loaded_key = (instance.employee_id, instance.date)
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    if not _being_deleted(instance.employee_id):
+        months = [(instance.employee_id, instance.date.year, instance.date.month)]
+        refresh_monthly(months)
+        mark_changed(months)
+    invalidate_attendance([instance.date])
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, **kwargs):
+    pay = tuple(getattr(instance, f) for f in PAY_FIELDS)
+    if created or pay != getattr(instance, '_loaded_pay', pay):
+        mark_open_months([instance.id])
+    instance._loaded_pay = pay
+    invalidate_employees()
+
+@receiver(pre_delete, sender=Employee)
+def employee_deleting(sender, instance, **kwargs):
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    _deleting.ids.add(instance.id)
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    _deleting.ids.discard(instance.id)
+    invalidate_employees()
+
+@receiver(post_save, sender=Leave)
+def leave_saved(sender, instance, **kwargs):
+    since = min(instance.start_date, getattr(instance, '_loaded_start', None) or instance.start_date)
+    mark_open_months([instance.employee_id], since=since, until_year=instance.end_date.year)
+    instance._loaded_start = instance.start_date
+
+@receiver(post_delete, sender=Leave)
+def leave_deleted(sender, instance, **kwargs):
+    if _being_deleted(instance.employee_id):
+        return
+    mark_open_months([instance.employee_id], since=instance.start_date, until_year=instance.end_date.year)
+
+@receiver(post_save, sender=LeaveBalance)
+@receiver(post_delete, sender=LeaveBalance)
+def leave_balance_changed(sender, instance, **kwargs):
+    if _being_deleted(instance.employee_id):
+        return
+    mark_open_months([instance.employee_id], year=instance.year)
+
+@receiver(post_save, sender=PayrollPeriod)
+@receiver(post_delete, sender=PayrollPeriod)
+# no post_delete for PayrollRecord: a receiver would stop regeneration from deleting
+# a period's records in one query; the payroll writers invalidate explicitly
+@receiver(post_save, sender=PayrollRecord)
+def payroll_changed(sender, **kwargs):
+    invalidate_payroll()
+
+@receiver(post_migrate)
+def search_index_checked(sender, using, **kwargs):
+    # SQLite rebuilds core_employee for some schema changes, which drops the FTS triggers
+    if sender.name != 'core':
+        return
+    applied = MigrationRecorder(connections[using]).migration_qs.filter(app='core', name='0008_employee_search')
+    if applied.exists():
+        install_search_index(connections[using])
@@ -1,3 +1,591 @@
-from django.test import TestCase
+import random
+import tempfile
+from concurrent.futures import Future
+from datetime import date, time, timedelta
+from io import BytesIO, StringIO
+from decimal import Decimal
+from itertools import product
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import jobs
+from .attendance import bulk_upsert_attendance
+from .calculators import compute_payroll_for_employee, compute_payroll_batch, from_paise
+from .exports import XLSX_CONTENT_TYPE
+from .models import (Employee, Attendance, AttendanceMonthly, Leave, LeaveBalance, PayrollDirty, PayrollJob,
+                     PayrollPeriod, PayrollRecord, PayrollRecordVersion)
+from .leave import LeaveCalendar, paid_intervals, paid_leave_days
+from .metrics import headcount, payroll_trend, present_on
+from .payroll import attendance_summaries, generate_payroll, monthly_summaries, period_range, recompute_changed
+from .payouts import write_payout
+from .payslips import payslip_pdf, prune_payslips
+from .punches import import_punches
+from .runs import employee_history, run_diff, run_snapshot
+from .search import keyset_page, search_employees
+
+
+class _Emp:
+    def __init__(self, base_salary, hourly_rate):
+        self.base_salary = base_salary
+        self.hourly_rate = hourly_rate
+
+
+class PayrollBatchParityTests(SimpleTestCase):
+    def assertParity(self, bases, hourly, ot, lop):
+        batch = compute_payroll_batch(bases, hourly, ot, lop)
+        cols = {k: from_paise(v) for k, v in batch.items()}
+        for i in range(len(bases)):
+            expected = compute_payroll_for_employee(_Emp(bases[i], hourly[i]), {'ot_hours': ot[i], 'lop_days': lop[i]})
+            got = {k: cols[k][i] for k in expected}
+            self.assertEqual(got, expected, f"base={bases[i]} hourly={hourly[i]} ot={ot[i]} lop={lop[i]}")
+
+    def test_grid(self):
+        # odd paise, multiples of 13 and 26 (LOP per day terminates) and their neighbours
+        bases = sorted({Decimal(p) / 100 for p in (0, 1, 2, 3, 5, 7, 13, 25, 26, 27, 51, 99, 100, 101, 1299, 1300, 1301,
+                                                   2599, 2600, 2601, 1000001, 1500050, 2345677, 9999999, 12345678)})
+        hourly = [Decimal('0'), Decimal('0.01'), Decimal('133.33'), Decimal('250.55')]
+        ot = [Decimal('0'), Decimal('0.01'), Decimal('1.5'), Decimal('7.77'), Decimal('40.25')]
+        lop = [d / 2 for d in range(0, 63)]
+        rows = list(product(bases, hourly, ot, lop))
+        self.assertParity(*[list(col) for col in zip(*rows)])
+
+    def test_random(self):
+        rnd = random.Random(2024)
+        n = 20000
+        self.assertParity([Decimal(rnd.randrange(0, 50000000)) / 100 for _ in range(n)],
+                          [Decimal(rnd.randrange(0, 200000)) / 100 for _ in range(n)],
+                          [Decimal(rnd.randrange(0, 30000)) / 100 for _ in range(n)],
+                          [rnd.randrange(0, 63) * 0.5 for _ in range(n)])
+
+    def test_lop_half_paisa_ties(self):
+        # odd paise with 13 LOP days land exactly on half a paisa
+        bases = [Decimal(p) / 100 for p in range(1, 4001, 2)]
+        n = len(bases)
+        self.assertParity(bases, [Decimal('0')] * n, [Decimal('0')] * n, [13] * n)
+
+    def test_rejects_sub_paisa_amounts(self):
+        with self.assertRaises(ValueError):
+            compute_payroll_batch([Decimal('100.005')], [0], [0], [0])
+        with self.assertRaises(ValueError):
+            compute_payroll_batch([Decimal('100')], [0], [0], [0.25])
+
+
+class GeneratePayrollTests(TestCase):
+    def test_matches_scalar_calculator(self):
+        emps = [Employee.objects.create(code=f'E{i}', first_name='E', email=f'e{i}@example.com',
+                                        base_salary=Decimal(b), hourly_rate=Decimal(h))
+                for i, (b, h) in enumerate([('30000.01', '150.00'), ('45555.55', '0'), ('0', '99.99')])]
+        Attendance.objects.create(employee=emps[0], date=date(2030, 5, 2), check_in=time(9, 0), check_out=time(19, 30))
+        Attendance.objects.create(employee=emps[0], date=date(2030, 5, 3), status='ABSENT')
+        Attendance.objects.create(employee=emps[1], date=date(2030, 5, 2), check_in=time(9, 0), check_out=time(12, 0))
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+
+        self.assertEqual(generate_payroll(period), 3)
+        for emp, summary in zip(emps, [{'ot_hours': Decimal('2.50'), 'lop_days': 1},
+                                       {'ot_hours': 0, 'lop_days': 0.5},
+                                       {'ot_hours': 0, 'lop_days': 0}]):
+            rec = PayrollRecord.objects.get(period=period, employee=emp)
+            for field, value in compute_payroll_for_employee(emp, summary).items():
+                self.assertEqual(getattr(rec, field), value, f"{emp.code} {field}")
+
+    def test_matches_per_employee_computation(self):
+        # the grouped query + bulk_create against the per-employee loop it replaced: LOP from absences and
+        # half days, absences on approved paid leave, a mid-month joiner, no attendance and an inactive employee
+        def emp(i, **kw):
+            return Employee.objects.create(code=f'E{i}', first_name='E', email=f'e{i}@example.com',
+                                           base_salary=Decimal('31234.57'), hourly_rate=Decimal('180.40'), **kw)
+        lop, leave, joiner, idle = emp(0), emp(1), emp(2, date_of_joining=d(16)), emp(3)
+        gone = emp(4, active=False)
+        for day in range(1, 32):
+            for e in (lop, leave, gone):
+                status = 'ABSENT' if day % 7 == 0 else 'HALF_DAY' if day % 5 == 0 else 'PRESENT'
+                Attendance.objects.create(employee=e, date=d(day), status=status,
+                                          check_in=time(9, 0), check_out=time(18, 0) if day % 3 else time(20, 15))
+            if day >= 16:
+                Attendance.objects.create(employee=joiner, date=d(day), status='ABSENT' if day == 20 else 'PRESENT',
+                                          check_in=time(9, 0), check_out=time(19, 0))
+        Leave.objects.create(employee=leave, type='CL', start_date=d(14), end_date=d(21), approved=True)
+        Leave.objects.create(employee=lop, type='CL', start_date=d(14), end_date=d(21))
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+
+        # the original loop: a filtered query, a COUNT per status and a SUM per employee
+        start, end = period_range(5, 2030)
+        expected = {}
+        for e in Employee.objects.filter(active=True):
+            qs = Attendance.objects.filter(employee=e, date__range=(start, end))
+            absents = qs.filter(status='ABSENT').count()
+            half_days = qs.filter(status='HALF_DAY').count()
+            ot_hours = qs.aggregate(s=Sum('overtime_hours'))['s'] or 0
+            paid = paid_leave_days(start, end, [e.id]).get(e.id, 0)
+            expected[e.id] = compute_payroll_for_employee(
+                e, {'ot_hours': ot_hours, 'lop_days': absents + (half_days * 0.5) - paid})
+
+        self.assertEqual(generate_payroll(period), 4)
+        records = {r.employee_id: r for r in PayrollRecord.objects.filter(period=period)}
+        self.assertEqual(records.keys(), expected.keys())
+        self.assertNotIn(gone.id, records)
+        for emp_id, values in expected.items():
+            for field, value in values.items():
+                self.assertEqual(getattr(records[emp_id], field), value, f"{emp_id} {field}")
+        self.assertGreater(records[lop.id].lop, records[leave.id].lop)
+        self.assertGreater(records[joiner.id].lop, 0)
+        self.assertEqual(records[idle.id].lop, 0)
+
+
+class PayslipCacheTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(PAYSLIP_CACHE_DIR=tmp.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # stands in for wkhtmltopdf: the "PDF" is the HTML it was given
+        patcher = mock.patch('core.payslips.pdfkit.from_string', side_effect=self.fake_pdf)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rendered = []
+
+    def fake_pdf(self, html, path, options=None):
+        self.rendered.append(html)
+        with open(path, 'w') as f:
+            f.write(html)
+
+    def test_employee_edit_renders_a_new_payslip(self):
+        emp = Employee.objects.create(code='E1', first_name='E', email='e1@example.com', base_salary=Decimal('26000'),
+                                      account_no='111122223333')
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+        generate_payroll(period)
+        record = lambda: PayrollRecord.objects.select_related('employee', 'period').get(period=period)
+
+        first = payslip_pdf(record())
+        self.assertEqual(payslip_pdf(record()), first)
+        self.assertEqual(len(self.rendered), 1)
+
+        emp.account_no = '999988887777'
+        emp.save()
+        second = payslip_pdf(record())
+        self.assertNotEqual(second, first)
+        self.assertIn('999988887777', second.read_text())
+        self.assertEqual(prune_payslips(period, [second]), 1)
+        self.assertFalse(first.exists())
+
+
+class ExcelExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.emp = Employee.objects.create(code='E1', first_name='Asha', last_name='Rao', email='e1@example.com',
+                                           base_salary=Decimal('26000'), hourly_rate=Decimal('100'))
+
+    def workbook(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        return openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+
+    def test_attendance_workbook(self):
+        Attendance.objects.create(employee=self.emp, date=d(2), check_in=time(9, 0), check_out=time(19, 0))
+        ws = self.workbook(reverse('attendance_export_excel'), {'year': 2030, 'month': 5})['Attendance']
+        self.assertEqual(list(ws.values), [
+            ('Emp Code', 'Name', 'Date', 'Status', 'Check In', 'Check Out', 'Hours', 'OT Hours'),
+            ('E1', 'Asha Rao', '2030-05-02', 'PRESENT', '09:00:00', '19:00:00', 10, 2),
+        ])
+
+    def test_payroll_workbook(self):
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+        generate_payroll(period)
+        rec = PayrollRecord.objects.get(period=period)
+        ws = self.workbook(reverse('payroll_export_excel', args=[period.id]))['Payroll']
+        header, *rows = ws.values
+        self.assertEqual(header, ('Emp Code', 'Name', 'Basic', 'HRA', 'Allowances', 'OT Pay', 'PF', 'ESI', 'Tax',
+                                  'LOP', 'Gross', 'Net'))
+        self.assertEqual(rows, [('E1', 'Asha Rao', *(float(getattr(rec, f)) for f in (
+            'basic', 'hra', 'allowances', 'overtime_pay', 'pf', 'esi', 'tax', 'lop', 'gross', 'net')))])
+
+
+class BulkAttendanceTests(TestCase):
+    def test_upsert_matches_save(self):
+        shifts = [('PRESENT', time(9, 0), time(18, 0)), ('PRESENT', time(9, 45), time(19, 30)),
+                  ('PRESENT', time(22, 0), time(6, 30)), ('PRESENT', time(9, 0), time(12, 0)),
+                  ('ABSENT', None, None), ('HALF_DAY', None, None), ('LEAVE', None, None)]
+        emps = [Employee.objects.create(code=f'E{i}', first_name='E', email=f'e{i}@example.com')
+                for i in range(len(shifts))]
+        day = date(2030, 5, 2)
+        rows = [(e.id, day, st, ci, co) for e, (st, ci, co) in zip(emps, shifts)]
+        # an existing row is updated in place, not duplicated
+        Attendance.objects.create(employee=emps[0], date=day, status='ABSENT')
+
+        self.assertEqual(bulk_upsert_attendance(rows), len(rows))
+        self.assertEqual(Attendance.objects.filter(date=day).count(), len(rows))
+        ref_day = date(2030, 5, 3)
+        for emp_id, dt, st, ci, co in rows:
+            # reference row derived by Attendance.save() on the next day
+            Attendance.objects.create(employee_id=emp_id, date=ref_day, status=st, check_in=ci, check_out=co)
+        fields = ('employee_id', 'status', 'work_hours', 'overtime_hours')
+        self.assertEqual(list(Attendance.objects.filter(date=day).order_by('employee_id').values_list(*fields)),
+                         list(Attendance.objects.filter(date=ref_day).order_by('employee_id').values_list(*fields)))
+
+
+class PunchImportTests(TestCase):
+    def test_first_in_last_out_and_reimport(self):
+        Employee.objects.create(code='E1', first_name='E', email='e1@example.com')
+        Employee.objects.create(code='E2', first_name='E', email='e2@example.com')
+        log = ("employee,timestamp,device\n"
+               "E1,2030-05-02T13:00:00,G1\nE1,2030-05-02T18:15:00,G1\nE1,2030-05-02T09:40:00,G2\n"
+               "E2,2030-05-02T08:55:00,G1\nE2,2030-05-03T09:00:00,G1\nE2,2030-05-03T11:00:00,G1\n"
+               "X9,2030-05-02T09:00:00,G1\n")
+        for _ in range(2):
+            result = import_punches(StringIO(log), 'csv')
+            self.assertEqual((result['events'], result['written'], result['unknown']), (7, 3, ['X9']))
+        rows = {(a.employee.code, a.date.day): (a.check_in, a.check_out, a.status)
+                for a in Attendance.objects.select_related('employee')}
+        self.assertEqual(rows, {('E1', 2): (time(9, 40), time(18, 15), 'LATE'),
+                                ('E2', 2): (time(8, 55), None, 'PRESENT'),
+                                ('E2', 3): (time(9, 0), time(11, 0), 'HALF_DAY')})
+
+    def test_overnight_shift_belongs_to_its_start_date(self):
+        Employee.objects.create(code='E1', first_name='E', email='e1@example.com')
+        Employee.objects.create(code='E2', first_name='E', email='e2@example.com')
+        # E1 works two nights; E2 forgets to punch out, and the next morning is too late to close that shift
+        log = ("employee,timestamp\n"
+               "E1,2030-05-04T06:00:00\nE1,2030-05-02T22:00:00\nE1,2030-05-03T22:05:00\nE1,2030-05-03T06:15:00\n"
+               "E2,2030-05-02T17:00:00\nE2,2030-05-03T08:00:00\nE2,2030-05-03T18:00:00\n")
+        result = import_punches(StringIO(log), 'csv')
+        self.assertEqual((result['events'], result['days'], result['written']), (7, 4, 4))
+        rows = {(a.employee.code, a.date.day): (a.check_in, a.check_out, a.work_hours)
+                for a in Attendance.objects.select_related('employee')}
+        self.assertEqual(rows, {('E1', 2): (time(22, 0), time(6, 15), Decimal('8.25')),
+                                ('E1', 3): (time(22, 5), time(6, 0), Decimal('7.92')),
+                                ('E2', 2): (time(17, 0), None, 0),
+                                ('E2', 3): (time(8, 0), time(18, 0), Decimal('10.00'))})
+
+
+class AttendanceMonthlyTests(TestCase):
+    def assertInSync(self, year, month):
+        self.assertEqual(monthly_summaries(year, month), attendance_summaries(*period_range(month, year)))
+
+    def test_follows_save_edit_delete_and_bulk(self):
+        e1 = Employee.objects.create(code='E1', first_name='E', email='e1@example.com')
+        e2 = Employee.objects.create(code='E2', first_name='E', email='e2@example.com')
+        a = Attendance.objects.create(employee=e1, date=date(2030, 5, 2), check_in=time(9, 0), check_out=time(19, 0))
+        Attendance.objects.create(employee=e1, date=date(2030, 5, 3), status='ABSENT')
+        self.assertInSync(2030, 5)
+        self.assertEqual(AttendanceMonthly.objects.get(employee=e1, year=2030, month=5).ot_hours, Decimal('2.00'))
+
+        # moving a row to another month refreshes both months
+        a = Attendance.objects.get(pk=a.pk)
+        a.date = date(2030, 6, 1)
+        a.save()
+        self.assertInSync(2030, 5)
+        self.assertInSync(2030, 6)
+
+        bulk_upsert_attendance([(e2.id, date(2030, 5, 2), 'PRESENT', time(9, 0), time(12, 0)),
+                                (e1.id, date(2030, 5, 3), 'PRESENT', time(10, 0), time(18, 0))])
+        self.assertInSync(2030, 5)
+
+        Attendance.objects.filter(employee=e1).delete()
+        self.assertInSync(2030, 5)
+        self.assertFalse(AttendanceMonthly.objects.filter(employee=e1).exists())
+
+
+class DashboardMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_until_a_relevant_write(self):
+        e = Employee.objects.create(code='E1', first_name='E', email='e1@example.com', department='Ops',
+                                    base_salary=Decimal('26000'))
+        day = date(2030, 5, 2)
+        self.assertEqual(headcount(), {'total': 1, 'departments': [('Ops', 1)]})
+        self.assertEqual(present_on(day), 0)
+        with self.assertNumQueries(0):
+            headcount()
+            present_on(day)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(employee=e, date=day, check_in=time(9, 0), check_out=time(18, 0))
+        self.assertEqual(present_on(day), 1)
+        with self.assertNumQueries(0):
+            headcount()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            e.department = 'Sales'
+            e.save()
+            generate_payroll(PayrollPeriod.objects.create(month=5, year=2030))
+        self.assertEqual(headcount()['departments'], [('Sales', 1)])
+        trend = payroll_trend()
+        self.assertEqual(trend['latest'], (5, 2030))
+        self.assertEqual([d['name'] for d in trend['departments']], ['Sales'])
+        self.assertEqual(trend['periods'][0]['gross'], PayrollRecord.objects.get().gross)
+
+
+def d(day, month=5):
+    return date(2030, month, day)
+
+
+class LeaveIntervalTests(SimpleTestCase):
+    entitled = {'CL': 12, 'SL': 12, 'PL': 15}
+
+    def test_overlapping_ranges_are_charged_once(self):
+        intervals, used = paid_intervals([(d(1), d(5), 'CL'), (d(3), d(8), 'SL'), (d(4), d(4), 'PL')], self.entitled)
+        self.assertEqual(intervals, [(d(1), d(8))])
+        self.assertEqual(used, {'CL': 5, 'SL': 3})
+
+    def test_nested_duplicate_and_adjacent_ranges(self):
+        leaves = [(d(10), d(20), 'PL'), (d(12), d(14), 'CL'), (d(10), d(20), 'PL'), (d(21), d(22), 'CL'),
+                  (d(25), d(25), 'SL')]
+        intervals, used = paid_intervals(leaves, self.entitled)
+        self.assertEqual(intervals, [(d(10), d(22)), (d(25), d(25))])
+        self.assertEqual(used, {'PL': 11, 'CL': 2, 'SL': 1})
+
+    def test_days_past_the_balance_are_unpaid(self):
+        leaves = [(d(1), d(3), 'CL'), (d(2), d(6), 'CL'), (d(20), d(21), 'CL'), (d(22), d(23), 'SL')]
+        intervals, used = paid_intervals(leaves, {'CL': 4, 'SL': 1})
+        # CL: 1-3 paid, 4 paid (balance reached), 5-6 and 20-21 unpaid; SL: 22 paid, 23 unpaid
+        self.assertEqual(intervals, [(d(1), d(4)), (d(22), d(22))])
+        self.assertEqual(used, {'CL': 8, 'SL': 2})
+
+    def test_covers_uses_interval_boundaries(self):
+        cal = LeaveCalendar({1: [(d(1), d(3)), (d(10), d(10)), (d(20), d(25))]})
+        covered = [day for day in range(1, 31) if cal.covers(1, d(day))]
+        self.assertEqual(covered, [1, 2, 3, 10, 20, 21, 22, 23, 24, 25])
+        self.assertFalse(cal.covers(2, d(1)))
+
+
+class LeaveAwarePayrollTests(TestCase):
+    def test_paid_leave_is_not_lop(self):
+        e1 = Employee.objects.create(code='E1', first_name='E', email='e1@example.com', base_salary=Decimal('26000'))
+        e2 = Employee.objects.create(code='E2', first_name='E', email='e2@example.com', base_salary=Decimal('26000'))
+        for day in (2, 3, 6, 7):
+            Attendance.objects.create(employee=e1, date=d(day), status='ABSENT')
+            Attendance.objects.create(employee=e2, date=d(day), status='ABSENT')
+        Attendance.objects.create(employee=e1, date=d(8), status='HALF_DAY')
+        LeaveBalance.objects.create(employee=e1, year=2030, type='SL', days=1)
+        # overlapping approved leave covers 2, 3 (CL) and 6 (SL, 7 is past the SL balance);
+        # the half day on 8 is covered by PL; e2's leave is not approved or unpaid
+        Leave.objects.create(employee=e1, type='CL', start_date=d(28, 4), end_date=d(3), approved=True)
+        Leave.objects.create(employee=e1, type='CL', start_date=d(2), end_date=d(3), approved=True)
+        Leave.objects.create(employee=e1, type='SL', start_date=d(6), end_date=d(7), approved=True)
+        Leave.objects.create(employee=e1, type='PL', start_date=d(8), end_date=d(8), approved=True)
+        Leave.objects.create(employee=e2, type='CL', start_date=d(2), end_date=d(3))
+        Leave.objects.create(employee=e2, type='LOP', start_date=d(6), end_date=d(7), approved=True)
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+
+        generate_payroll(period)
+        lop = {r.employee_id: r.lop for r in PayrollRecord.objects.filter(period=period)}
+        self.assertEqual(lop[e1.id], Decimal('1000.00'))    # 1 day (the 7th) of 26000 / 26
+        self.assertEqual(lop[e2.id], Decimal('4000.00'))
+
+
+class IncrementalPayrollTests(TestCase):
+    def test_only_changed_employees_are_recomputed(self):
+        emps = [Employee.objects.create(code=f'E{i}', first_name='E', email=f'e{i}@example.com',
+                                        base_salary=Decimal('26000'), hourly_rate=Decimal('100'))
+                for i in range(4)]
+        for e in emps:
+            Attendance.objects.create(employee=e, date=d(2), check_in=time(9, 0), check_out=time(18, 0))
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+        generate_payroll(period)
+        self.assertFalse(PayrollDirty.objects.exists())
+        before = {r.employee_id: r.pk for r in PayrollRecord.objects.filter(period=period)}
+
+        a = Attendance.objects.get(employee=emps[0])
+        a.check_out = time(20, 0)                     # 1h -> 3h overtime at 1.5x
+        a.save()
+        Attendance.objects.create(employee=emps[1], date=d(3), status='ABSENT')
+        Leave.objects.create(employee=emps[1], type='CL', start_date=d(3), end_date=d(3), approved=True)
+        emps[2].active = False
+        emps[2].save()
+        emps[3].save()                                # no pay change, not marked
+        new = Employee.objects.create(code='E9', first_name='E', email='e9@example.com', base_salary=Decimal('13000'))
+
+        diff = recompute_changed(period, dry_run=True)
+        self.assertEqual(set(diff['changed']), {emps[0].id})
+        self.assertEqual(diff['changed'][emps[0].id]['overtime_pay'], (Decimal('150.00'), Decimal('450.00')))
+        self.assertEqual((diff['added'], diff['removed'], diff['unchanged']), ([new.id], [emps[2].id], 1))
+        self.assertEqual(PayrollDirty.objects.count(), 4)
+
+        recompute_changed(period)
+        self.assertFalse(PayrollDirty.objects.exists())
+        after = {r.employee_id: r.pk for r in PayrollRecord.objects.filter(period=period)}
+        self.assertEqual(after[emps[3].id], before[emps[3].id])   # untouched
+        incremental = {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)}
+        generate_payroll(period)
+        self.assertEqual(incremental, {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)})
+
+    def test_deleting_an_employee_marks_nothing(self):
+        # the attendance and leave deleted with the employee must not leave change marks pointing at it
+        emp = Employee.objects.create(code='E1', first_name='E', email='e1@example.com', base_salary=Decimal('26000'))
+        PayrollPeriod.objects.create(month=5, year=2030)
+        Attendance.objects.create(employee=emp, date=d(2), check_in=time(9, 0), check_out=time(18, 0))
+        Leave.objects.create(employee=emp, type='CL', start_date=d(3), end_date=d(3), approved=True)
+        LeaveBalance.objects.create(employee=emp, year=2030, type='CL', days=2)
+        other = Employee.objects.create(code='E2', first_name='E', email='e2@example.com')
+        PayrollDirty.objects.all().delete()
+
+        emp.delete()
+        connection.check_constraints()
+        self.assertFalse(PayrollDirty.objects.exists())
+        Attendance.objects.create(employee=other, date=d(2), status='ABSENT')
+        self.assertEqual(list(PayrollDirty.objects.values_list('employee_id', flat=True)), [other.id])
+
+
+class PayrollJobTests(TestCase):
+    def setUp(self):
+        # jobs are handed to a stand-in executor and stay queued; run_payroll_job() is called directly
+        self.executor = mock.Mock(submit=mock.Mock(side_effect=lambda *a: Future()))
+        for patcher in (mock.patch.object(jobs, '_executor', self.executor),
+                        mock.patch.object(jobs, '_start_heartbeat'), mock.patch.dict(jobs._running, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.period = PayrollPeriod.objects.create(month=5, year=2030)
+
+    def test_enqueue_returns_the_active_job(self):
+        job = jobs.enqueue_payroll(self.period)
+        self.assertEqual((job.status, job.owner), ('QUEUED', jobs.job_owner()))
+        self.assertEqual(jobs.enqueue_payroll(self.period).pk, job.pk)
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+    def test_live_job_of_another_process_is_kept(self):
+        job = PayrollJob.objects.create(period=self.period, status='RUNNING', owner='other:1',
+                                        heartbeat_at=timezone.now() - timedelta(seconds=30))
+        self.assertEqual(jobs.enqueue_payroll(self.period).pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'RUNNING')
+        self.executor.submit.assert_not_called()
+
+    def test_stale_job_is_taken_over(self):
+        # another process whose heartbeat stopped, and this process's own job no longer in its worker
+        for owner, heartbeat in (('other:1', timezone.now() - jobs.STALE_AFTER), (jobs.job_owner(), timezone.now())):
+            old = PayrollJob.objects.create(period=self.period, status='RUNNING', owner=owner, heartbeat_at=heartbeat)
+            job = jobs.enqueue_payroll(self.period)
+            old.refresh_from_db()
+            self.assertNotEqual(job.pk, old.pk)
+            self.assertEqual((old.status, old.error), ('FAILED', 'interrupted'))
+            PayrollJob.objects.filter(pk=job.pk).update(status='DONE')
+            jobs._running.clear()
+
+    def test_run_and_failure(self):
+        Employee.objects.create(code='E1', first_name='E', email='e1@example.com', base_salary=Decimal('26000'))
+        job = jobs.run_payroll_job(jobs.enqueue_payroll(self.period))
+        self.assertEqual((job.status, job.processed, job.total), ('DONE', 1, 1))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertEqual(PayrollRecord.objects.filter(period=self.period).count(), 1)
+
+        self.period.locked = True
+        self.period.save()
+        job = jobs.run_payroll_job(jobs.enqueue_payroll(self.period))
+        self.assertEqual(job.status, 'FAILED')
+        self.assertTrue(job.error.startswith('Period locked'))
+
+
+class PayrollRunTests(TestCase):
+    def test_runs_store_only_changes_and_can_be_replayed(self):
+        emps = [Employee.objects.create(code=f'E{i}', first_name='E', email=f'e{i}@example.com',
+                                        base_salary=Decimal('26000'), hourly_rate=Decimal('100'))
+                for i in range(3)]
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+        generate_payroll(period)
+        first = period.runs.get()
+        self.assertEqual((first.number, first.kind, first.added), (1, 'FULL', 3))
+        nets = {r.employee_id: r.net for r in PayrollRecord.objects.filter(period=period)}
+
+        generate_payroll(period)                      # nothing changed: a run, no versions
+        self.assertEqual(period.runs.count(), 2)
+        self.assertEqual(PayrollRecordVersion.objects.count(), 3)
+
+        emps[0].base_salary = Decimal('52000')
+        emps[0].save()
+        emps[1].active = False
+        emps[1].save()
+        recompute_changed(period)
+        third = period.runs.get(number=3)
+        self.assertEqual((third.kind, third.changed, third.removed), ('INCREMENTAL', 1, 1))
+        self.assertEqual(PayrollRecordVersion.objects.filter(run=third).count(), 2)
+
+        self.assertEqual({i: v.net for i, v in run_snapshot(first).items()}, nets)
+        self.assertEqual(set(run_snapshot(third)), {emps[0].id, emps[2].id})
+        diff = run_diff(first, third)
+        self.assertEqual((list(diff['changed']), diff['removed']), ([emps[0].id], [emps[1].id]))
+        self.assertEqual(diff['changed'][emps[0].id]['basic'], (Decimal('13000.00'), Decimal('26000.00')))
+
+        gone = emps[1].id
+        emps[1].delete()                              # history outlives the employee
+        self.assertEqual([v.op for v in employee_history(gone)], ['ADD', 'REMOVE'])
+
+class EmployeeSearchTests(TestCase):
+    def setUp(self):
+        people = [('E001', 'Arjun', 'Kumar', 'Sales'), ('E002', 'Priya', 'Raman', 'IT'),
+                  ('E003', 'Arun', 'Kumaresan', 'Sales'), ('E004', 'Meena', 'Arjunan', 'HR')]
+        for code, first, last, dept in people:
+            Employee.objects.create(code=code, first_name=first, last_name=last, department=dept,
+                                    email=f'{first.lower()}@example.com', base_salary=Decimal('20000'))
+
+    def codes(self, q):
+        return sorted(search_employees(q).values_list('code', flat=True))
+
+    def test_words_anywhere_across_fields(self):
+        self.assertEqual(self.codes('arj'), ['E001', 'E004'])
+        self.assertEqual(self.codes('kum sal'), ['E001', 'E003'])
+        self.assertEqual(self.codes('e002'), ['E002'])
+        self.assertEqual(self.codes('priya@exa'), ['E002'])
+        self.assertEqual(self.codes('umar'), ['E001', 'E003'])
+        self.assertEqual(self.codes('001'), ['E001'])
+        self.assertEqual(self.codes('JUNAN'), ['E004'])
+        self.assertEqual(len(self.codes('')), 4)
+
+    def test_short_words(self):
+        self.assertEqual(self.codes('hr'), ['E004'])
+        self.assertEqual(self.codes('it ya'), ['E002'])
+        self.assertEqual(self.codes('sales 3'), ['E003'])
+
+    def test_index_follows_writes(self):
+        e = Employee.objects.get(code='E002')
+        e.department = 'Finance'
+        e.save()
+        self.assertEqual(self.codes('fin'), ['E002'])
+        self.assertEqual(self.codes('it'), [])
+        e.delete()
+        self.assertEqual(self.codes('priya'), [])
+
+    def test_keyset_pages(self):
+        qs = Employee.objects.all()
+        rows, before, after = keyset_page(qs, size=3)
+        self.assertEqual(([r.code for r in rows], before, after), (['E001', 'E002', 'E003'], None, 'E003'))
+        rows, before, after = keyset_page(qs, after='E003', size=3)
+        self.assertEqual(([r.code for r in rows], before, after), (['E004'], 'E004', None))
+        rows, before, after = keyset_page(qs, before='E004', size=2)
+        self.assertEqual(([r.code for r in rows], before, after), (['E002', 'E003'], 'E002', 'E003'))
+
+
+class PayoutFileTests(TestCase):
+    def test_valid_accounts_only_with_control_totals(self):
+        details = [('E001', '123456789012', 'SBIN0001234'), ('E002', '12345', 'SBIN0001234'),
+                   ('E003', '222233334444', 'HDFC0XYZ'), ('E004', '5555 6666 7777', 'icic0000999'),
+                   ('E005', '888899990000', 'UTIB0000001'), ('E006', '888899990000', 'UTIB0000001'),
+                   ('E007', '4444 5555 6666', 'kkbk0000123 '), ('E008', '444455556666', 'KKBK0000123')]
+        for code, account, ifsc in details:
+            Employee.objects.create(code=code, first_name='Emp', last_name=code, email=f'{code}@example.com',
+                                    base_salary=Decimal('26000'), account_no=account, ifsc=ifsc)
+        period = PayrollPeriod.objects.create(month=5, year=2030)
+        generate_payroll(period)
+
+        out = BytesIO()
+        result = write_payout(period, 'fixed', out, value_date=date(2030, 6, 1))
+        lines = out.getvalue().decode('ascii').split('\r\n')[:-1]
+        self.assertEqual(dict(result['skipped']), {'E002': 'invalid account number', 'E003': 'invalid IFSC',
+                                                   'E005': 'account shared with another employee',
+                                                   'E006': 'account shared with another employee',
+                                                   'E007': 'account shared with another employee',
+                                                   'E008': 'account shared with another employee'})
+        self.assertEqual(result['count'], 2)
+        self.assertEqual(lines[0], f'H{"PAY203005R1":<20}20300601')
+        self.assertTrue(lines[2].startswith('D000002ICIC0000999555566667777'))
+        self.assertEqual(lines[-1], f'T000002{int(result["total"] * 100):018d}')
+        self.assertEqual({len(l) for l in lines[1:-1]}, {1 + 6 + 11 + 18 + 35 + 15 + 30})
@@ -18,7 +18,14 @@ urlpatterns = [
 
     path('payroll/periods/', views.payroll_periods, name='payroll_periods'),
     path('payroll/generate/', views.payroll_generate, name='payroll_generate'),
+    path('payroll/jobs/<int:job_id>/', views.payroll_job_status, name='payroll_job_status'),
     path('payroll/<int:period_id>/records/', views.payroll_records, name='payroll_records'),
+    path('payroll/<int:period_id>/recompute/', views.payroll_recompute, name='payroll_recompute'),
+    path('payroll/<int:period_id>/runs/', views.payroll_runs, name='payroll_runs'),
+    path('payroll/<int:period_id>/runs/<int:number>/', views.payroll_run_diff, name='payroll_run_diff'),
     path('payroll/<int:period_id>/export/xlsx/', views.payroll_export_excel, name='payroll_export_excel'),
+    path('payroll/<int:period_id>/payslips/zip/', views.payroll_payslips_zip, name='payroll_payslips_zip'),
+    path('payroll/<int:period_id>/payout/', views.payroll_payout, name='payroll_payout'),
+    path('payroll/<int:period_id>/payout/<str:fmt>/', views.payroll_payout_file, name='payroll_payout_file'),
     path('payroll/payslip/<int:record_id>/pdf/', views.payroll_payslip_pdf, name='payroll_payslip_pdf'),
 ]
@@ -1,46 +1,46 @@
-from calendar import monthrange
 from datetime import date
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Sum, Q
+from django.db import transaction
+from django.http import FileResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.core.paginator import Paginator
 from django.utils import timezone
 
-from .models import Employee, Attendance, PayrollPeriod, PayrollRecord
+from .models import (Employee, Attendance, PayrollPeriod, PayrollRecord, PayrollJob, PayrollDirty, PayrollRun,
+                     PayrollRecordVersion)
 from .forms import EmployeeForm, AttendanceForm, BulkAttendanceForm
-from .calculators import compute_payroll_for_employee
-from .exports import export_attendance_excel, export_payroll_excel, render_pdf
+from .jobs import enqueue_payroll
+from .payroll import period_range, recompute_changed
+from .attendance import bulk_upsert_attendance, parse_time
+from .exports import export_attendance_excel, export_payroll_excel
+from .metrics import headcount, payroll_trend, present_on
+from .payslips import payslip_filename, payslip_pdf, payslips_zip_response
+from .runs import employee_history, run_diff
+from .search import keyset_page, search_employees
+from .payouts import FORMATS as PAYOUT_FORMATS, payout_response, validate_payouts
 
 def staff_required(view):
     return login_required(user_passes_test(lambda u: u.is_staff)(view))
 
 @login_required
 def dashboard(request):
-    emp_count = Employee.objects.filter(active=True).count()
-    today = timezone.localdate()
-    this_month = today.month
-    this_year = today.year
-    present_today = Attendance.objects.filter(date=today, status__in=['PRESENT','LATE','HALF_DAY']).count()
-    last_period = PayrollPeriod.objects.order_by('-year','-month').first()
+    staff = headcount()
     return render(request, 'dashboard.html', {
-        'emp_count': emp_count,
-        'present_today': present_today,
-        'last_period': last_period,
+        'emp_count': staff['total'],
+        'departments': staff['departments'],
+        'present_today': present_on(timezone.localdate()),
+        'payroll': payroll_trend(),
     })
 
 # Employees
 @staff_required
 def employee_list(request):
     q = request.GET.get('q','')
-    qs = Employee.objects.all()
-    if q:
-        qs = qs.filter(Q(code__icontains=q)|Q(first_name__icontains=q)|Q(last_name__icontains=q)|Q(email__icontains=q))
-    paginator = Paginator(qs.order_by('code'), 20)
-    page = request.GET.get('page')
-    employees = paginator.get_page(page)
-    return render(request, 'employees/list.html', {'employees': employees, 'q': q})
+    employees, before, after = keyset_page(search_employees(q), after=request.GET.get('after'),
+                                           before=request.GET.get('before'))
+    return render(request, 'employees/list.html', {'employees': employees, 'q': q, 'before': before, 'after': after})
 
 @staff_required
 def employee_create(request):
@@ -70,7 +70,7 @@ def employee_edit(request, pk):
 @staff_required
 def employee_detail(request, pk):
     emp = get_object_or_404(Employee, pk=pk)
-    return render(request, 'employees/detail.html', {'emp': emp})
+    return render(request, 'employees/detail.html', {'emp': emp, 'history': employee_history(emp.id)})
 
 @staff_required
 def employee_delete(request, pk):
@@ -85,7 +85,7 @@ def attendance_list(request):
     emp_id = request.GET.get('employee')
     month = int(request.GET.get('month', date.today().month))
     year = int(request.GET.get('year', date.today().year))
-    qs = Attendance.objects.select_related('employee').filter(date__month=month, date__year=year)
+    qs = Attendance.objects.select_related('employee').filter(date__range=period_range(month, year))
     if emp_id:
         qs = qs.filter(employee_id=emp_id)
     paginator = Paginator(qs.order_by('-date'), 25)
@@ -128,45 +128,61 @@ def attendance_bulk(request):
         form = BulkAttendanceForm(request.POST)
         if form.is_valid():
             dt = form.cleaned_data['date']
-            for emp in employees:
-                status = request.POST.get(f'status_{emp.id}', 'ABSENT')
-                check_in = request.POST.get(f'check_in_{emp.id}') or None
-                check_out = request.POST.get(f'check_out_{emp.id}') or None
-                Attendance.objects.update_or_create(
-                    employee=emp, date=dt,
-                    defaults={'status': status, 'check_in': check_in, 'check_out': check_out}
-                )
-            messages.success(request, 'Bulk attendance saved')
-            return redirect('attendance_list')
+            rows, bad = [], []
+            for emp_id, code in employees.values_list('id', 'code'):
+                try:
+                    check_in = parse_time(request.POST.get(f'check_in_{emp_id}'))
+                    check_out = parse_time(request.POST.get(f'check_out_{emp_id}'))
+                except ValueError:
+                    bad.append(code)
+                    continue
+                rows.append((emp_id, dt, request.POST.get(f'status_{emp_id}', 'ABSENT'), check_in, check_out))
+            if bad:
+                messages.error(request, f"Invalid check-in/out time for: {', '.join(bad)}")
+            else:
+                with transaction.atomic():
+                    bulk_upsert_attendance(rows)
+                messages.success(request, 'Bulk attendance saved')
+                return redirect('attendance_list')
     else:
         form = BulkAttendanceForm()
     return render(request, 'attendance/bulk.html', {'form': form, 'employees': employees})
 
+EXPORT_CHUNK = 2000
+
 @staff_required
 def attendance_export_excel(request):
     emp_id = request.GET.get('employee')
-    month = int(request.GET.get('month', date.today().month))
     year = int(request.GET.get('year', date.today().year))
-    qs = Attendance.objects.select_related('employee').filter(date__month=month, date__year=year)
+    month = request.GET.get('month', str(date.today().month))
+    # an empty month exports the whole year
+    if month:
+        start_dt, end_dt = period_range(int(month), year)
+        filename = f'attendance_{year}_{int(month):02d}.xlsx'
+    else:
+        start_dt, end_dt = date(year, 1, 1), date(year, 12, 31)
+        filename = f'attendance_{year}.xlsx'
+    qs = Attendance.objects.filter(date__range=(start_dt, end_dt))
     if emp_id:
         qs = qs.filter(employee_id=emp_id)
-    rows = []
-    for a in qs.order_by('employee__code','date'):
-        rows.append([
-            a.employee.code,
-            f"{a.employee.first_name} {a.employee.last_name}".strip(),
-            a.date.isoformat(),
-            a.status,
-            a.check_in.isoformat() if a.check_in else '',
-            a.check_out.isoformat() if a.check_out else '',
-            float(a.work_hours),
-            float(a.overtime_hours),
-        ])
-    return export_attendance_excel(rows, filename=f'attendance_{year}_{month:02d}.xlsx')
+    qs = qs.order_by('employee__code','date').values_list(
+        'employee__code', 'employee__first_name', 'employee__last_name', 'date', 'status',
+        'check_in', 'check_out', 'work_hours', 'overtime_hours')
+    rows = ([code, f"{first} {last}".strip(), dt.isoformat(), status,
+             check_in.isoformat() if check_in else '', check_out.isoformat() if check_out else '',
+             float(hours), float(ot)]
+            for code, first, last, dt, status, check_in, check_out, hours, ot in qs.iterator(chunk_size=EXPORT_CHUNK))
+    return export_attendance_excel(rows, filename=filename)
 
 @staff_required
 def payroll_periods(request):
-    periods = PayrollPeriod.objects.all()
+    periods = list(PayrollPeriod.objects.all())
+    # latest job per period
+    jobs = {}
+    for job in PayrollJob.objects.filter(period__in=periods).order_by('period_id', '-created_at'):
+        jobs.setdefault(job.period_id, job)
+    for p in periods:
+        p.last_job = jobs.get(p.id)
     return render(request, 'payroll/periods.html', {'periods': periods})
 
 @staff_required
@@ -179,64 +195,113 @@ def payroll_generate(request):
             messages.warning(request, 'Period locked')
             return redirect('payroll_periods')
 
-        # compute for each employee
-        employees = Employee.objects.filter(active=True)
-        # Determine month range
-        _, last_day = monthrange(year, month)
-        start_dt = date(year, month, 1)
-        end_dt = date(year, month, last_day)
-
-        # wipe existing
-        PayrollRecord.objects.filter(period=period).delete()
-
-        for emp in employees:
-            qs = Attendance.objects.filter(employee=emp, date__range=(start_dt, end_dt))
-            present = qs.filter(status__in=['PRESENT','LATE','HALF_DAY']).count()
-            absents = qs.filter(status='ABSENT').count()
-            half_days = qs.filter(status='HALF_DAY').count()
-            ot_hours = qs.aggregate(s=Sum('overtime_hours'))['s'] or 0
-            # LOP assume absents are LOP
-            summary = {
-                'present_days': present,
-                'absent_days': absents,
-                'half_days': half_days,
-                'ot_hours': ot_hours,
-                'lop_days': absents + (half_days * 0.5),
-            }
-            comp = compute_payroll_for_employee(emp, summary)
-            PayrollRecord.objects.create(
-                period=period, employee=emp,
-                basic=comp['basic'], hra=comp['hra'], allowances=comp['allowances'],
-                overtime_pay=comp['overtime_pay'], pf=comp['pf'], esi=comp['esi'],
-                tax=comp['tax'], lop=comp['lop'], gross=comp['gross'], net=comp['net']
-            )
-        messages.success(request, 'Payroll generated')
-        return redirect('payroll_records', period_id=period.id)
+        enqueue_payroll(period)
+        messages.info(request, f'Payroll generation for {period} started')
+        return redirect('payroll_periods')
     return redirect('payroll_periods')
 
+@staff_required
+def payroll_job_status(request, job_id):
+    job = get_object_or_404(PayrollJob, pk=job_id)
+    return JsonResponse({
+        'id': job.id, 'period': job.period_id, 'status': job.status,
+        'processed': job.processed, 'total': job.total, 'percent': job.percent,
+        'error': job.error.split('\n', 1)[0] if job.error else '',
+        'records_url': reverse('payroll_records', args=[job.period_id]),
+    })
+
 @staff_required
 def payroll_records(request, period_id):
     period = get_object_or_404(PayrollPeriod, pk=period_id)
     records = PayrollRecord.objects.select_related('employee').filter(period=period)
-    return render(request, 'payroll/records.html', {'period': period, 'records': records})
+    changes = PayrollDirty.objects.filter(year=period.year, month=period.month).count()
+    return render(request, 'payroll/records.html', {'period': period, 'records': records, 'changes': changes})
+
+@staff_required
+def payroll_recompute(request, period_id):
+    period = get_object_or_404(PayrollPeriod, pk=period_id)
+    if period.locked:
+        messages.warning(request, 'Period locked')
+        return redirect('payroll_records', period_id=period.id)
+    if request.method == 'POST':
+        diff = recompute_changed(period)
+        messages.success(request, f"Recomputed: {len(diff['changed'])} changed, {len(diff['added'])} added, "
+                                  f"{len(diff['removed'])} removed, {diff['unchanged']} unchanged")
+        return redirect('payroll_records', period_id=period.id)
+    diff = recompute_changed(period, dry_run=True)
+    return render(request, 'payroll/recompute.html', {'period': period, 'diff': diff, **_diff_rows(period, diff)})
+
+def _diff_rows(period, diff):
+    # rows for payroll/_diff.html; employees deleted since are shown by their code from the versions
+    ids = [*diff['changed'], *diff['added'], *diff['removed']]
+    employees = Employee.objects.in_bulk(ids)
+    missing = [i for i in ids if i not in employees]
+    if missing:
+        codes = dict(PayrollRecordVersion.objects.filter(period=period, employee_id__in=missing)
+                     .values_list('employee_id', 'employee_code'))
+        employees.update({i: Employee(id=i, code=codes.get(i, '')) for i in missing})
+    return {
+        'changed': [(employees[i], sorted(cols.items())) for i, cols in diff['changed'].items()],
+        'added': [employees[i] for i in diff['added']],
+        'removed': [employees[i] for i in diff['removed']],
+    }
+
+@staff_required
+def payroll_runs(request, period_id):
+    period = get_object_or_404(PayrollPeriod, pk=period_id)
+    return render(request, 'payroll/runs.html', {'period': period, 'runs': period.runs.order_by('-number')})
+
+@staff_required
+def payroll_run_diff(request, period_id, number):
+    period = get_object_or_404(PayrollPeriod, pk=period_id)
+    run = get_object_or_404(PayrollRun, period=period, number=number)
+    runs = list(period.runs.all())
+    try:
+        against = int(request.GET.get('against', number - 1))
+    except ValueError:
+        against = number - 1
+    base = next((r for r in runs if r.number == against), None)
+    old, new = (run, base) if base and base.number > run.number else (base, run)
+    diff = run_diff(old, new)
+    return render(request, 'payroll/run_diff.html', {
+        'period': period, 'run': run, 'runs': runs, 'against': against, 'old': old, 'new': new,
+        'old_label': f'Run {old.number}' if old else '', 'new_label': f'Run {new.number}',
+        'diff': diff, **_diff_rows(period, diff),
+    })
 
 @staff_required
 def payroll_export_excel(request, period_id):
     period = get_object_or_404(PayrollPeriod, pk=period_id)
-    records = PayrollRecord.objects.select_related('employee').filter(period=period).order_by('employee__code')
-    rows = []
-    for r in records:
-        rows.append([
-            r.employee.code,
-            f"{r.employee.first_name} {r.employee.last_name}".strip(),
-            float(r.basic), float(r.hra), float(r.allowances), float(r.overtime_pay),
-            float(r.pf), float(r.esi), float(r.tax), float(r.lop),
-            float(r.gross), float(r.net)
-        ])
+    qs = PayrollRecord.objects.filter(period=period).order_by('employee__code').values_list(
+        'employee__code', 'employee__first_name', 'employee__last_name',
+        'basic', 'hra', 'allowances', 'overtime_pay', 'pf', 'esi', 'tax', 'lop', 'gross', 'net')
+    rows = ([code, f"{first} {last}".strip(), *map(float, amounts)]
+            for code, first, last, *amounts in qs.iterator(chunk_size=EXPORT_CHUNK))
     return export_payroll_excel(rows, filename=f'payroll_{period.year}_{period.month:02d}.xlsx')
 
 @staff_required
 def payroll_payslip_pdf(request, record_id):
-    r = get_object_or_404(PayrollRecord, pk=record_id)
-    ctx = {'r': r}
-    return render_pdf('payroll/payslip_pdf.html', ctx, filename=f'payslip_{r.employee.code}_{r.period.year}_{r.period.month:02d}.pdf')
+    r = get_object_or_404(PayrollRecord.objects.select_related('employee', 'period'), pk=record_id)
+    return FileResponse(open(payslip_pdf(r), 'rb'), as_attachment=True, filename=payslip_filename(r),
+                        content_type='application/pdf')
+
+@staff_required
+def payroll_payslips_zip(request, period_id):
+    period = get_object_or_404(PayrollPeriod, pk=period_id)
+    return payslips_zip_response(period)
+
+@staff_required
+def payroll_payout(request, period_id):
+    period = get_object_or_404(PayrollPeriod, pk=period_id)
+    summary = validate_payouts(period)
+    return render(request, 'payroll/payout.html', {
+        'period': period, 'summary': summary, 'skipped': summary['skipped'][:200], 'formats': sorted(PAYOUT_FORMATS),
+    })
+
+@staff_required
+def payroll_payout_file(request, period_id, fmt):
+    period = get_object_or_404(PayrollPeriod, pk=period_id)
+    if fmt not in PAYOUT_FORMATS:
+        messages.error(request, f'Unknown payout format {fmt}')
+        return redirect('payroll_payout', period_id=period.id)
+    return payout_response(period, fmt)
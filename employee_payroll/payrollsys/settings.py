@@ -103,6 +103,18 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Dashboard metrics (core.metrics). Each process keeps its own local-memory
+# cache, so other processes see a change after at most METRICS_CACHE_TIMEOUT
+# seconds; use a file or shared backend to have invalidation reach them all.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'payroll-metrics',
+    }
+}
+METRICS_CACHE_TIMEOUT = 300
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -129,3 +141,9 @@ LOGOUT_REDIRECT_URL = 'login'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# The bulk attendance form posts status/check-in/check-out per active employee
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 50000
+
+# Rendered payslip PDFs, keyed by record and a hash of the payslip HTML (core.payslips)
+PAYSLIP_CACHE_DIR = BASE_DIR / 'payslip_cache'
@@ -0,0 +1,140 @@
+"""
+Load test for order_server.py: dozens of concurrent terminals.
+
+Starts the server in a child process on a throw-away database with one
+table per waiter terminal, then runs asyncio clients over keep-alive
+connections. Each waiter repeatedly opens an order, adds items, sends them
+to the kitchen, marks them done and finalizes the bill; one kitchen screen
+polls /kitchen?since=... in the background. Prints p50/p99 per operation.
+
+Run:
+    python bench_order_server.py --terminals 40 --orders 20
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+import order_server
+
+
+def run_server(db_file, n_tables, port_queue):
+    import restaurant_pos as pos
+    pos.DB_FILE = db_file
+    pos.init_db()
+    con = pos.sqlite3.connect(db_file)
+    existing = con.execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+    con.executemany("INSERT INTO tables(name) VALUES (?)", [(f"T{i}",) for i in range(existing + 1, n_tables + 1)])
+    con.commit()
+    con.close()
+    asyncio.run(order_server.serve("127.0.0.1", 0, db_file, ready=port_queue.put))
+
+
+class Client:
+    def __init__(self, reader, writer, stats):
+        self.reader, self.writer, self.stats = reader, writer, stats
+
+    @classmethod
+    async def connect(cls, port, stats):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        return cls(reader, writer, stats)
+
+    async def call(self, op, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        t0 = time.perf_counter()
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: pos\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        payload = json.loads(await self.reader.readexactly(length))
+        self.stats.setdefault(op, []).append(time.perf_counter() - t0)
+        status = int(status_line.split()[1])
+        if status >= 400:
+            raise RuntimeError(f"{op} {path}: HTTP {status} {payload}")
+        return payload
+
+    def close(self):
+        self.writer.close()
+
+
+async def waiter(port, table_id, n_orders, menu, stats, rnd):
+    c = await Client.connect(port, stats)
+    for _ in range(n_orders):
+        order_id = (await c.call("open", "POST", "/orders", {'table_id': table_id}))['order_id']
+        lines = [await c.call("add", "POST", f"/orders/{order_id}/items",
+                              {'menu_item_id': rnd.choice(menu)['id'], 'qty': rnd.randint(1, 3)})
+                 for _ in range(rnd.randint(2, 8))]
+        await c.call("send", "POST", f"/orders/{order_id}/send", {})
+        for line in lines:
+            await c.call("status", "POST", f"/items/{line['id']}/status", {'status': 'done'})
+        await c.call("finalize", "POST", f"/orders/{order_id}/finalize", {'gst_percent': 5})
+    c.close()
+
+
+async def kitchen(port, stats, stop):
+    c = await Client.connect(port, stats)
+    seq = (await c.call("kitchen", "GET", "/kitchen"))['seq']
+    while not stop.is_set():
+        seq = (await c.call("kitchen", "GET", f"/kitchen?since={seq}"))['seq']
+        await asyncio.sleep(0.2)
+    c.close()
+
+
+async def run(port, terminals, n_orders):
+    stats = {}
+    probe = await Client.connect(port, {})
+    menu = await probe.call("menu", "GET", "/menu")
+    tables = await probe.call("tables", "GET", "/tables")
+    probe.close()
+    stop = asyncio.Event()
+    kitchen_task = asyncio.create_task(kitchen(port, stats, stop))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(waiter(port, tables[i]['id'], n_orders, menu, stats, random.Random(i))
+                           for i in range(terminals)))
+    wall = time.perf_counter() - t0
+    stop.set()
+    await kitchen_task
+    return stats, wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Order server load test")
+    ap.add_argument("--terminals", type=int, default=40)
+    ap.add_argument("--orders", type=int, default=20, help="orders per terminal")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="pos_server_bench_")
+    port_queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=run_server, daemon=True,
+                                   args=(os.path.join(tmp, "pos.db"), args.terminals, port_queue))
+    proc.start()
+    port = port_queue.get(timeout=30)
+    try:
+        stats, wall = asyncio.run(run(port, args.terminals, args.orders))
+    finally:
+        proc.terminate()
+
+    total = sum(len(v) for v in stats.values())
+    print(f"{args.terminals} terminals, {total} requests in {wall:.2f}s ({total / wall:.0f} req/s)")
+    print(f"{'op':<10}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for op, vals in sorted(stats.items()):
+        vals.sort()
+        p50 = vals[len(vals) // 2] * 1000
+        p99 = vals[min(len(vals) - 1, int(len(vals) * 0.99))] * 1000
+        print(f"{op:<10}{len(vals):>8}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
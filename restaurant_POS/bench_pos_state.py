@@ -0,0 +1,104 @@
+"""
+Dinner-rush benchmark: per-click SQLite round-trips vs OrderStore.
+
+Simulates waiters hopping between 50 tables and adding 2,000 items. Each
+"click" replays what POSApp does: select a table (table list + open order
+lookup/creation + order lines), add an item, reload the order lines and
+subtotal. Every 40 adds a random table is billed so tables turn over.
+
+Run:
+    python bench_pos_state.py --tables 50 --adds 2000
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from decimal import Decimal
+
+import restaurant_pos as pos
+
+
+def setup_db(path, n_tables):
+    pos.DB_FILE = path
+    pos.init_db()
+    con = pos.sqlite3.connect(path)
+    existing = con.execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+    con.executemany("INSERT INTO tables(name) VALUES (?)",
+                    [(f"T{i}",) for i in range(existing + 1, n_tables + 1)])
+    con.commit()
+    con.close()
+
+
+def run_legacy(n_adds, menu, rnd):
+    switch, add = [], []
+    for i in range(n_adds):
+        t0 = time.perf_counter()
+        rows = pos.get_tables()
+        table_id = rows[rnd.randrange(len(rows))][0]
+        order_id = pos.get_open_order_for_table(table_id) or pos.create_order(table_id)
+        items = pos.get_order_items(order_id)
+        sum(pos.money(r[4]) for r in items)
+        t1 = time.perf_counter()
+        m = rnd.choice(menu)
+        pos.add_order_item(order_id, m[0], m[1], Decimal(rnd.randint(1, 3)), Decimal(str(m[2])))
+        items = pos.get_order_items(order_id)
+        sum(pos.money(r[4]) for r in items)
+        t2 = time.perf_counter()
+        switch.append(t1 - t0)
+        add.append(t2 - t1)
+        if i % 40 == 39:
+            pos.finalize_bill(order_id)
+    return switch, add
+
+
+def run_store(n_adds, menu, rnd):
+    store = pos.OrderStore()
+    switch, add = [], []
+    for i in range(n_adds):
+        t0 = time.perf_counter()
+        rows = store.get_tables()
+        table_id = rows[rnd.randrange(len(rows))][0]
+        order_id = store.open_order(table_id)
+        store.order_items(order_id)
+        store.subtotal(order_id)
+        t1 = time.perf_counter()
+        m = rnd.choice(menu)
+        store.add_item(order_id, m[0], m[1], Decimal(rnd.randint(1, 3)), Decimal(str(m[2])))
+        store.order_items(order_id)
+        store.subtotal(order_id)
+        t2 = time.perf_counter()
+        switch.append(t1 - t0)
+        add.append(t2 - t1)
+        if i % 40 == 39:
+            store.finalize(order_id)
+    store.close()
+    return switch, add
+
+
+def report(label, switch, add):
+    def pct(vals, p):
+        vals = sorted(vals)
+        return vals[min(len(vals) - 1, int(p / 100.0 * len(vals)))] * 1000
+    total = sum(switch) + sum(add)
+    print(f"{label:<8} total {total:7.3f}s | switch p50 {pct(switch, 50):6.3f}ms p99 {pct(switch, 99):6.3f}ms"
+          f" | add p50 {pct(add, 50):6.3f}ms p99 {pct(add, 99):6.3f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="POS order-state benchmark")
+    ap.add_argument("--tables", type=int, default=50)
+    ap.add_argument("--adds", type=int, default=2000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="pos_bench_")
+    for label, runner in (("legacy", run_legacy), ("store", run_store)):
+        setup_db(os.path.join(tmp, f"{label}.db"), args.tables)
+        menu = pos.get_menu_items()
+        switch, add = runner(args.adds, menu, random.Random(42))
+        report(label, switch, add)
+
+
+if __name__ == "__main__":
+    main()
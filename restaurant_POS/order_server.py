@@ -0,0 +1,281 @@
+"""
+Local order server for multi-terminal POS (asyncio, stdlib only).
+
+One process owns pos.db through an OrderStore; waiter tablets and kitchen
+screens talk to it over HTTP/JSON (keep-alive). All requests are handled on
+a single event loop, so store operations are naturally serialized and no
+two terminals can interleave writes to the same order.
+
+Endpoints:
+    GET    /tables                       tables with status
+    GET    /menu?q=&menu=&category=      menu items (optionally filtered / name search)
+    GET    /menu/code/<code>             menu item by quick code
+    POST   /orders                       {"table_id": 1} -> open (or existing) order
+    GET    /orders/<id>                  lines + subtotal
+    POST   /orders/<id>/items            {"menu_item_id": 3, "qty": 2} (or {"code": 12, ...})
+    DELETE /items/<id>                   remove a line not yet sent to the kitchen
+    POST   /items/<id>/status            {"status": "preparing" | "done" | "served"}
+    POST   /orders/<id>/send             send pending lines to the kitchen
+    POST   /orders/<id>/finalize         {"gst_percent": 5} -> bill and free the table
+    POST   /orders/<id>/edits            {"add": [{"menu_item_id": 3, "qty": 2}], "remove": [ids],
+                                          "status": [{"id": 7, "status": "served"}],
+                                          "finalize": true, "gst_percent": 5}
+                                         -> all applied in one transaction
+Billing an order that is no longer open answers 409.
+    GET    /kitchen?since=<seq>&station= kitchen queue, oldest order first (full without since, else changes)
+    GET    /stations                     stations with queue depth and oldest open order
+
+Run:
+    python order_server.py --port 8766
+"""
+
+import json
+import asyncio
+import argparse
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlparse, parse_qs
+
+import restaurant_pos as pos
+
+ITEM_STATUSES = pos.ITEM_STATUSES
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class OrderServer:
+    def __init__(self, db_file=None):
+        if db_file:
+            pos.DB_FILE = db_file
+        pos.init_db()
+        self.store = pos.OrderStore()
+        self.menu = pos.MenuIndex(self.store.con)
+
+    # --- request dispatch ---
+    def handle(self, method, path, query, body):
+        parts = [p for p in path.split('/') if p]
+        store = self.store
+        if method == 'GET' and parts == ['tables']:
+            return [{'id': t[0], 'name': t[1], 'status': t[2]} for t in store.get_tables()]
+        if method == 'GET' and parts[:1] == ['menu']:
+            self.menu.refresh_if_stale()
+            if parts[1:2] == ['code'] and len(parts) == 3:
+                m = self.menu.lookup_code(parts[2])
+                if not m:
+                    raise HTTPError(404, "unknown menu code")
+                return self._menu_item(m)
+            if len(parts) == 1:
+                q = {k: v[0] for k, v in query.items()}
+                return [self._menu_item(m) for m in self.menu.search(q.get('q', ''), q.get('menu'), q.get('category'))]
+        if method == 'POST' and parts == ['orders']:
+            try:
+                return {'order_id': store.open_order(int(body['table_id']))}
+            except (KeyError, TypeError, ValueError):
+                raise HTTPError(404, "unknown table")
+        if method == 'GET' and parts == ['kitchen']:
+            station = query.get('station', [None])[0]
+            if 'since' not in query:
+                seq = pos.get_change_seq(store.con)
+                rows = pos.get_station_queue(store.con, station)
+                return {'seq': seq, 'items': [self._kitchen_row(r) for r in rows], 'removed': []}
+            seq, rows, removed = pos.get_item_changes(store.con, int(query['since'][0]))
+            # lines routed elsewhere are reported as removed so a station screen can drop them
+            removed += [r[0] for r in rows if station and r[9] != station]
+            return {'seq': seq, 'items': [self._kitchen_row(r) for r in rows if not station or r[9] == station],
+                    'removed': removed}
+        if method == 'GET' and parts == ['stations']:
+            return [{'station': name, 'queued': n, 'oldest_order_at': oldest}
+                    for name, n, oldest in pos.get_stations(store.con)]
+
+        if len(parts) >= 2 and parts[0] == 'orders':
+            order_id = self._int(parts[1])
+            if order_id not in store.items:
+                raise HTTPError(404, "order not open")
+            if method == 'GET' and len(parts) == 2:
+                return self._order(order_id)
+            if method == 'POST' and parts[2:] == ['items']:
+                m = self._lookup_menu(body)
+                qty = self._decimal(body.get('qty', 1), positive=True)
+                row = store.add_item(order_id, m[0], m[1], qty, Decimal(str(m[2])))
+                return self._line(row)
+            if method == 'POST' and parts[2:] == ['send']:
+                store.send_to_kitchen(order_id)
+                return self._order(order_id)
+            if method == 'POST' and parts[2:] == ['edits']:
+                return self._edits(order_id, body)
+            if method == 'POST' and parts[2:] == ['finalize']:
+                gst_percent = self._decimal(body.get('gst_percent', 5.0), limit=100)
+                subtotal, gst, total = store.finalize(order_id, gst_percent=float(gst_percent))
+                return {'order_id': order_id, 'subtotal': subtotal, 'gst': gst, 'total': total}
+
+        if len(parts) >= 2 and parts[0] == 'items':
+            item_id = self._int(parts[1])
+            if item_id not in store.item_order:
+                raise HTTPError(404, "item not on an open order")
+            if method == 'DELETE' and len(parts) == 2:
+                if not store.remove_item(item_id):
+                    raise HTTPError(409, "item already preparing/served")
+                return {'removed': item_id}
+            if method == 'POST' and parts[2:] == ['status']:
+                status = body.get('status')
+                if status not in ITEM_STATUSES:
+                    raise HTTPError(400, f"status must be one of {', '.join(ITEM_STATUSES)}")
+                store.set_item_status(item_id, status)
+                return self._line(store.items[store.item_order[item_id]][item_id])
+        raise HTTPError(404, "not found")
+
+    def _edits(self, order_id, body):
+        adds = []
+        for a in self._list(body, 'add', dict):
+            m = self._lookup_menu(a)
+            adds.append((m[0], m[1], self._decimal(a.get('qty', 1), positive=True), Decimal(str(m[2]))))
+        removes = [self._int(i) for i in self._list(body, 'remove')]
+        statuses = [(self._int(s.get('id')), s.get('status')) for s in self._list(body, 'status', dict)]
+        gst_percent = float(self._decimal(body.get('gst_percent', 5.0), limit=100)) if body.get('finalize') else None
+        result = self.store.apply_edits(order_id, adds, removes, statuses, gst_percent)
+        out = {'added': [self._line(r) for r in result['added']], 'removed': result['removed'],
+               'statuses': [{'id': i, 'status': st} for i, st in result['statuses']]}
+        if result['bill'] is not None:
+            subtotal, gst, total = result['bill']
+            out['bill'] = {'order_id': order_id, 'subtotal': subtotal, 'gst': gst, 'total': total}
+        else:
+            out['order'] = self._order(order_id)
+        return out
+
+    def _lookup_menu(self, body):
+        self.menu.refresh_if_stale()
+        if body.get('code') is not None:
+            m = self.menu.lookup_code(body['code'])
+        else:
+            m = self.menu.get(self._int(body.get('menu_item_id')))
+        if not m:
+            raise HTTPError(400, "unknown menu item")
+        return m
+
+    @staticmethod
+    def _menu_item(m):
+        return {'id': m[0], 'name': m[1], 'price': m[2], 'category': m[3], 'code': m[4], 'menu': m[5]}
+
+    @staticmethod
+    def _list(body, key, entry_type=None):
+        """body[key] as a list (empty if missing), each entry of entry_type if given, else 400."""
+        value = body.get(key) or []
+        if not isinstance(value, list):
+            raise HTTPError(400, f"{key} must be a list")
+        if entry_type is not None and not all(isinstance(v, entry_type) for v in value):
+            raise HTTPError(400, f"each {key} entry must be a JSON object")
+        return value
+
+    @staticmethod
+    def _int(v):
+        try:
+            return int(v)
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"invalid id {v!r}")
+
+    @staticmethod
+    def _decimal(v, positive=False, limit=pos.MAX_NUMBER):
+        """A finite number not below zero (above zero if positive) and at most `limit`, else 400."""
+        try:
+            d = Decimal(str(v))
+        except InvalidOperation:
+            raise HTTPError(400, f"invalid number {v!r}")
+        if not d.is_finite() or d < 0 or (positive and d == 0):
+            raise HTTPError(400, f"number must be finite and {'above' if positive else 'not below'} zero: {v!r}")
+        if d > limit:
+            raise HTTPError(400, f"number must be at most {limit}: {v!r}")
+        return d
+
+    @staticmethod
+    def _line(r):
+        return {'id': r[0], 'name': r[1], 'qty': r[2], 'rate': r[3], 'total': r[4], 'status': r[5]}
+
+    @staticmethod
+    def _kitchen_row(r):
+        return {'id': r[0], 'table_id': r[1], 'table': r[2], 'name': r[3], 'qty': r[4],
+                'status': r[7], 'order_id': r[8], 'station': r[9], 'order_created_at': r[10]}
+
+    def _order(self, order_id):
+        return {'order_id': order_id, 'table_id': self.store.order_table[order_id],
+                'items': [self._line(r) for r in self.store.order_items(order_id)],
+                'subtotal': str(self.store.subtotal(order_id))}
+
+    # --- HTTP/1.1 over asyncio streams ---
+    async def client_connected(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                if not request_line.strip():
+                    continue    # stray CRLF between requests
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    k, _, v = line.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+                close = headers.get('connection', '').lower() == 'close'
+                try:
+                    try:
+                        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                        length = int(headers.get('content-length') or 0)
+                        if length < 0:
+                            raise ValueError(length)
+                    except ValueError:
+                        # the next request cannot be framed either
+                        close = True
+                        raise HTTPError(400, "malformed request line or Content-Length")
+                    raw = await reader.readexactly(length) if length else b''
+                    url = urlparse(target)
+                    body = json.loads(raw) if raw else {}
+                    if not isinstance(body, dict):
+                        raise HTTPError(400, "body must be a JSON object")
+                    status, payload = 200, self.handle(method, url.path, parse_qs(url.query), body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except pos.OrderAlreadyBilled as e:
+                    status, payload = 409, {'error': str(e)}
+                except ValueError as e:
+                    status, payload = 400, {'error': str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                data = json.dumps(payload, default=str).encode('utf-8')
+                writer.write(f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, db_file=None, ready=None):
+    app = OrderServer(db_file)
+    server = await asyncio.start_server(app.client_connected, host, port, backlog=256)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="POS local order server")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--db", default=None, help="SQLite file (default: pos.db)")
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.db,
+                          ready=lambda p: print(f"Order server listening on {args.host}:{p}")))
+    except KeyboardInterrupt:
+        pass
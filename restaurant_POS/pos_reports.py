@@ -0,0 +1,254 @@
+"""
+End-of-day close and sales reporting for the restaurant POS.
+
+close_day() computes a day's rollups straight from orders/order_items with
+a few set-based INSERT ... SELECT statements in one transaction and stores
+them; re-closing a day replaces its rows. sales_report() then answers range
+queries (months at a time) from the small rollup tables only.
+
+Rollups per day:
+    sales_daily        orders, subtotal, GST, total, average ticket time
+    sales_daily_items  qty/amount per menu item (with its category)
+    sales_daily_tables orders/amount per table
+    sales_daily_hours  orders/amount per hour the order was opened
+
+A billed order belongs to the day it was billed (created_at for orders
+billed before billed_at was recorded).
+
+ticket_timings() reports kitchen latency per station from the per-line
+queued_at / preparing_at / done_at timestamps.
+
+Run:
+    python pos_reports.py close [YYYY-MM-DD | --all]
+    python pos_reports.py report FROM TO
+    python pos_reports.py timings FROM TO
+"""
+
+import sys
+import sqlite3
+import argparse
+import datetime
+
+DB_FILE = "pos.db"
+
+_BILLED_DAY = "substr(COALESCE(o.billed_at, o.created_at), 1, 10)"
+
+
+def init_report_tables(con):
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT PRIMARY KEY,
+        orders INTEGER,
+        subtotal REAL,
+        gst REAL,
+        total REAL,
+        avg_ticket_secs REAL,
+        ticket_count INTEGER,
+        closed_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS sales_daily_items (
+        day TEXT,
+        menu_item_id INTEGER,
+        name TEXT,
+        category TEXT,
+        qty REAL,
+        amount REAL,
+        PRIMARY KEY(day, menu_item_id, name)
+    );
+    CREATE TABLE IF NOT EXISTS sales_daily_tables (
+        day TEXT,
+        table_id INTEGER,
+        table_name TEXT,
+        orders INTEGER,
+        amount REAL,
+        PRIMARY KEY(day, table_id)
+    );
+    CREATE TABLE IF NOT EXISTS sales_daily_hours (
+        day TEXT,
+        hour INTEGER,
+        orders INTEGER,
+        amount REAL,
+        PRIMARY KEY(day, hour)
+    );
+    CREATE INDEX IF NOT EXISTS idx_orders_billed_day
+        ON orders(substr(COALESCE(billed_at, created_at), 1, 10)) WHERE status = 'billed';
+    """)
+
+
+def close_day(con, day):
+    """(Re)compute and store the rollups for one day. Returns the sales_daily row."""
+    init_report_tables(con)
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        for t in ("sales_daily", "sales_daily_items", "sales_daily_tables", "sales_daily_hours"):
+            cur.execute(f"DELETE FROM {t} WHERE day = ?", (day,))
+        billed = f"FROM orders o WHERE o.status = 'billed' AND {_BILLED_DAY} = :day"
+        cur.execute(f"""
+            INSERT INTO sales_daily(day, orders, subtotal, gst, total, avg_ticket_secs, ticket_count, closed_at)
+            SELECT :day, COUNT(*), COALESCE(SUM(o.total - o.gst), 0), COALESCE(SUM(o.gst), 0),
+                   COALESCE(SUM(o.total), 0),
+                   AVG((julianday(o.billed_at) - julianday(o.created_at)) * 86400.0),
+                   COUNT(o.billed_at), :now
+            {billed}
+        """, {'day': day, 'now': datetime.datetime.now().isoformat()})
+        cur.execute(f"""
+            INSERT INTO sales_daily_items(day, menu_item_id, name, category, qty, amount)
+            SELECT :day, oi.menu_item_id, oi.name, COALESCE(m.category, 'Other'), SUM(oi.qty), SUM(oi.total)
+            FROM order_items oi
+            JOIN orders o ON o.id = oi.order_id
+            LEFT JOIN menu_items m ON m.id = oi.menu_item_id
+            WHERE o.status = 'billed' AND {_BILLED_DAY} = :day
+            GROUP BY oi.menu_item_id, oi.name
+        """, {'day': day})
+        cur.execute(f"""
+            INSERT INTO sales_daily_tables(day, table_id, table_name, orders, amount)
+            SELECT :day, o.table_id, t.name, COUNT(*), SUM(o.total)
+            FROM orders o LEFT JOIN tables t ON t.id = o.table_id
+            WHERE o.status = 'billed' AND {_BILLED_DAY} = :day
+            GROUP BY o.table_id
+        """, {'day': day})
+        cur.execute(f"""
+            INSERT INTO sales_daily_hours(day, hour, orders, amount)
+            SELECT :day, CAST(substr(o.created_at, 12, 2) AS INTEGER), COUNT(*), SUM(o.total)
+            {billed}
+            GROUP BY 2
+        """, {'day': day})
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    cur.execute("SELECT day, orders, subtotal, gst, total, avg_ticket_secs FROM sales_daily WHERE day = ?", (day,))
+    return cur.fetchone()
+
+
+def close_open_days(con, upto=None):
+    """Close every day with billed orders that has no rollup yet (up to and including `upto`)."""
+    init_report_tables(con)
+    upto = upto or datetime.date.today().isoformat()
+    days = [r[0] for r in con.execute(f"""
+        SELECT DISTINCT {_BILLED_DAY} FROM orders o
+        WHERE o.status = 'billed' AND {_BILLED_DAY} <= ?
+          AND {_BILLED_DAY} NOT IN (SELECT day FROM sales_daily)
+        ORDER BY 1
+    """, (upto,))]
+    for day in days:
+        close_day(con, day)
+    return days
+
+
+def sales_report(con, date_from, date_to):
+    """Aggregate stored rollups over [date_from, date_to]."""
+    init_report_tables(con)
+    cur = con.cursor()
+    rng = (date_from, date_to)
+    cur.execute("""
+        SELECT COUNT(*), COALESCE(SUM(orders), 0), COALESCE(SUM(subtotal), 0), COALESCE(SUM(gst), 0),
+               COALESCE(SUM(total), 0),
+               SUM(avg_ticket_secs * ticket_count) / NULLIF(SUM(CASE WHEN avg_ticket_secs IS NOT NULL
+                                                                  THEN ticket_count END), 0)
+        FROM sales_daily WHERE day BETWEEN ? AND ?
+    """, rng)
+    days, orders, subtotal, gst, total, avg_ticket = cur.fetchone()
+    report = {
+        'from': date_from, 'to': date_to, 'days_closed': days, 'orders': orders,
+        'subtotal': subtotal, 'gst': gst, 'total': total,
+        'avg_ticket': total / orders if orders else 0.0,
+        'avg_ticket_secs': avg_ticket,
+    }
+    cur.execute("""
+        SELECT name, category, SUM(qty), SUM(amount) FROM sales_daily_items
+        WHERE day BETWEEN ? AND ? GROUP BY menu_item_id, name ORDER BY SUM(amount) DESC
+    """, rng)
+    report['items'] = cur.fetchall()
+    cur.execute("""
+        SELECT category, SUM(qty), SUM(amount) FROM sales_daily_items
+        WHERE day BETWEEN ? AND ? GROUP BY category ORDER BY SUM(amount) DESC
+    """, rng)
+    report['categories'] = cur.fetchall()
+    cur.execute("""
+        SELECT table_name, SUM(orders), SUM(amount) FROM sales_daily_tables
+        WHERE day BETWEEN ? AND ? GROUP BY table_id ORDER BY SUM(amount) DESC
+    """, rng)
+    report['tables'] = cur.fetchall()
+    cur.execute("""
+        SELECT hour, SUM(orders), SUM(amount) FROM sales_daily_hours
+        WHERE day BETWEEN ? AND ? GROUP BY hour ORDER BY hour
+    """, rng)
+    report['hours'] = cur.fetchall()
+    return report
+
+
+def ticket_timings(con, date_from, date_to):
+    """
+    Per-station kitchen timings (seconds) for lines finished over [date_from, date_to]:
+    (station, lines, avg wait queued->preparing, avg cook preparing->done,
+     avg total queued->done, max total).
+    """
+    cur = con.cursor()
+    cur.execute("""
+        SELECT station, COUNT(*), AVG(wait), AVG(cook), AVG(wait + cook), MAX(wait + cook)
+        FROM (SELECT COALESCE(station, '-') AS station,
+                     (julianday(preparing_at) - julianday(queued_at)) * 86400.0 AS wait,
+                     (julianday(done_at) - julianday(preparing_at)) * 86400.0 AS cook
+              FROM order_items
+              WHERE done_at IS NOT NULL AND queued_at IS NOT NULL
+                AND substr(queued_at, 1, 10) BETWEEN ? AND ?)
+        GROUP BY station ORDER BY station
+    """, (date_from, date_to))
+    return cur.fetchall()
+
+
+def format_timings(rows):
+    lines = [f"  {'Station':<14}{'Lines':>7}{'Wait':>10}{'Cook':>10}{'Total':>10}{'Max':>10}"]
+    for station, n, wait, cook, total, worst in rows:
+        lines.append(f"  {station:<14}{n:>7}" + "".join(f"{(v or 0) / 60:>9.1f}m" for v in (wait, cook, total, worst)))
+    return "\n".join(lines)
+
+
+def format_report(r):
+    lines = [f"Sales {r['from']} .. {r['to']}  ({r['days_closed']} day(s) closed)",
+             f"Orders: {r['orders']}  Subtotal: {r['subtotal']:.2f}  GST: {r['gst']:.2f}  Total: {r['total']:.2f}",
+             f"Average ticket: {r['avg_ticket']:.2f}"
+             + (f"  Average ticket time: {r['avg_ticket_secs'] / 60:.1f} min" if r['avg_ticket_secs'] else "")]
+    for title, rows, fmt in (
+            ("Items", r['items'], lambda x: f"  {x[0]:<30}{x[1]:<14}{x[2]:>8g}{x[3]:>12.2f}"),
+            ("Categories", r['categories'], lambda x: f"  {x[0]:<30}{x[1]:>8g}{x[2]:>12.2f}"),
+            ("Tables", r['tables'], lambda x: f"  {x[0] or '-':<30}{x[1]:>8}{x[2]:>12.2f}"),
+            ("Hours", r['hours'], lambda x: f"  {x[0]:02d}:00{'':<25}{x[1]:>8}{x[2]:>12.2f}")):
+        lines.append(f"{title}:")
+        lines.extend(fmt(x) for x in rows)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="POS end-of-day close and sales reports")
+    ap.add_argument("--db", default=DB_FILE)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("close", help="close a day (default today)")
+    c.add_argument("day", nargs="?", default=datetime.date.today().isoformat())
+    c.add_argument("--all", action="store_true", help="close every unclosed day up to `day`")
+    r = sub.add_parser("report", help="sales report over closed days")
+    r.add_argument("date_from")
+    r.add_argument("date_to")
+    t = sub.add_parser("timings", help="kitchen ticket times per station")
+    t.add_argument("date_from")
+    t.add_argument("date_to")
+    args = ap.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.cmd == "close":
+            days = close_open_days(con, args.day) if args.all else [close_day(con, args.day)[0]]
+            print(f"Closed {len(days)} day(s): {', '.join(days)}" if days else "Nothing to close")
+        elif args.cmd == "timings":
+            print(format_timings(ticket_timings(con, args.date_from, args.date_to)))
+        else:
+            print(format_report(sales_report(con, args.date_from, args.date_to)))
+    finally:
+        con.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Offline-first sync between POS databases (terminal <-> main, or any pair).
+
+Every insert/update/delete on orders and order_items appends (table, row id,
+op) to sync_log through triggers, whichever connection made the change.
+A sync pulls the peer's log entries past the watermark kept for that peer,
+fetches the current state of just those rows and merges them:
+
+- each terminal allocates order/line ids from its own range
+  (terminal_id * TERMINAL_ID_RANGE ...) through next_id(), so rows never
+  collide (AUTOINCREMENT cannot do this: it always continues after the
+  largest id in the table, which may be another terminal's);
+- merges are state based and commutative: the further-along status wins
+  (open < billed, pending < preparing < done < served), timestamps keep
+  the earliest value, and a deleted line stays deleted;
+- a row is only written when the merged result differs from the local
+  row, so re-applying a batch is a no-op and syncs do not ping-pong;
+- a batch and the new watermark are committed in the same transaction.
+
+Tables and menu items are not replicated; terminals share the same
+layout and menu ids.
+
+Run:
+    python pos_sync.py init --terminal 2 terminal2.db   (before first use)
+    python pos_sync.py sync terminal2.db pos.db
+    python pos_sync.py status pos.db
+"""
+
+import sys
+import uuid
+import sqlite3
+import argparse
+import datetime
+
+DB_FILE = "pos.db"
+TERMINAL_ID_RANGE = 1_000_000_000
+BATCH_SIZE = 5000
+
+ORDER_COLS = ("id", "table_id", "created_at", "status", "total", "gst", "paid", "receipt_path", "billed_at")
+ITEM_COLS = ("id", "order_id", "menu_item_id", "name", "qty", "rate", "total", "status",
+             "station", "queued_at", "preparing_at", "done_at")
+ORDER_RANK = {'open': 0, 'billed': 1}
+ITEM_RANK = {'pending': 0, 'preparing': 1, 'done': 2, 'served': 3}
+_ROW_TABLES = {'orders': ORDER_COLS, 'order_items': ITEM_COLS}
+
+
+def init_sync(con):
+    """Create the sync log, its triggers and the node/peer bookkeeping tables."""
+    cur = con.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tbl TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('upsert', 'delete'))
+    )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sync_log_deleted ON sync_log(tbl, row_id) WHERE op = 'delete'")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        node_id TEXT NOT NULL,
+        terminal_id INTEGER NOT NULL DEFAULT 0
+    )""")
+    cur.execute("INSERT OR IGNORE INTO sync_state(id, node_id) VALUES (1, ?)", (uuid.uuid4().hex,))
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_ids (
+        tbl TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    )""")
+    lo = node_info(con)[1] * TERMINAL_ID_RANGE
+    for tbl in _ROW_TABLES:
+        cur.execute(f"""
+            INSERT OR IGNORE INTO sync_ids(tbl, last_id)
+            SELECT ?, COALESCE(MAX(id), ?) FROM {tbl} WHERE id >= ? AND id < ?
+        """, (tbl, lo, lo, lo + TERMINAL_ID_RANGE))
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_peers (
+        node_id TEXT PRIMARY KEY,
+        pulled_seq INTEGER NOT NULL DEFAULT 0,
+        synced_at TEXT
+    )""")
+    for tbl in _ROW_TABLES:
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_sync_insert AFTER INSERT ON {tbl}
+        BEGIN INSERT INTO sync_log(tbl, row_id, op) VALUES ('{tbl}', NEW.id, 'upsert'); END""")
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_sync_update AFTER UPDATE ON {tbl}
+        BEGIN INSERT INTO sync_log(tbl, row_id, op) VALUES ('{tbl}', NEW.id, 'upsert'); END""")
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {tbl}_sync_delete AFTER DELETE ON {tbl}
+        BEGIN INSERT INTO sync_log(tbl, row_id, op) VALUES ('{tbl}', OLD.id, 'delete'); END""")
+    con.commit()
+
+
+def node_info(con):
+    return con.execute("SELECT node_id, terminal_id FROM sync_state WHERE id = 1").fetchone()
+
+
+def next_id(cur, tbl):
+    """
+    Allocate the next id for `tbl` (orders or order_items) from this
+    terminal's range. Ids are never reused, so tombstones stay unambiguous.
+    The UPDATE comes first so the write lock is held before the read.
+    """
+    cur.execute("UPDATE sync_ids SET last_id = last_id + 1 WHERE tbl = ?", (tbl,))
+    cur.execute("SELECT last_id FROM sync_ids WHERE tbl = ?", (tbl,))
+    return cur.fetchone()[0]
+
+
+def set_terminal(con, terminal_id):
+    """Assign this database a terminal id (and id range). Only allowed before it has orders."""
+    init_sync(con)
+    if terminal_id < 0:
+        raise ValueError("terminal id must be >= 0")
+    if node_info(con)[1] != terminal_id and con.execute("SELECT COUNT(*) FROM orders").fetchone()[0]:
+        raise ValueError("terminal id can only be changed on a database without orders")
+    cur = con.cursor()
+    cur.execute("UPDATE sync_state SET terminal_id = ? WHERE id = 1", (terminal_id,))
+    lo = terminal_id * TERMINAL_ID_RANGE
+    for tbl in _ROW_TABLES:
+        cur.execute(f"""
+            UPDATE sync_ids SET last_id = (SELECT COALESCE(MAX(id), ?) FROM {tbl} WHERE id >= ? AND id < ?)
+            WHERE tbl = ?
+        """, (lo, lo, lo + TERMINAL_ID_RANGE, tbl))
+    con.commit()
+
+
+def changes_since(con, since_seq, limit=BATCH_SIZE):
+    """
+    Rows changed after `since_seq` (at most `limit` log entries), read in one
+    snapshot. Returns (last_seq, {'orders': rows, 'order_items': rows, 'deleted': ids}).
+    """
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    try:
+        cur.execute("SELECT seq, tbl, row_id, op FROM sync_log WHERE seq > ? ORDER BY seq LIMIT ?", (since_seq, limit))
+        log = cur.fetchall()
+        last = {}
+        for seq, tbl, row_id, op in log:
+            last[(tbl, row_id)] = op
+        batch = {'orders': [], 'order_items': [], 'deleted': []}
+        for tbl, cols in _ROW_TABLES.items():
+            ids = [row_id for (t, row_id), op in last.items() if t == tbl and op == 'upsert']
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                cur.execute(f"SELECT {', '.join(cols)} FROM {tbl} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                batch[tbl].extend(cur.fetchall())
+        batch['deleted'] = [row_id for (t, row_id), op in last.items() if t == 'order_items' and op == 'delete']
+    finally:
+        con.commit()
+    return (log[-1][0] if log else since_seq), batch
+
+
+def _merge(local, remote, rank, status_idx, time_idx=()):
+    """Deterministic merge of two versions of a row: further status wins, earliest timestamps kept."""
+    if local is None:
+        return remote
+    winner, other = (remote, local) if rank.get(remote[status_idx], 0) >= rank.get(local[status_idx], 0) else (local, remote)
+    merged = list(winner)
+    for i in range(len(merged)):
+        if merged[i] is None and other[i] is not None:
+            merged[i] = other[i]
+    for i in time_idx:
+        stamps = [v for v in (local[i], remote[i]) if v is not None]
+        merged[i] = min(stamps) if stamps else None
+    return tuple(merged)
+
+
+def apply_changes(con, source_node, upto_seq, batch):
+    """Merge a batch from `source_node` and advance its watermark, in one transaction."""
+    cur = con.cursor()
+    stats = {'orders': 0, 'order_items': 0, 'deleted': 0}
+    touched_tables = set()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        deleted = set(batch['deleted'])
+        for i in range(0, len(batch['order_items']), 500):
+            chunk = [r[0] for r in batch['order_items'][i:i + 500]]
+            cur.execute(f"SELECT row_id FROM sync_log WHERE tbl = 'order_items' AND op = 'delete' "
+                        f"AND row_id IN ({','.join('?' * len(chunk))})", chunk)
+            deleted.update(r[0] for r in cur.fetchall())
+        for tbl, cols in _ROW_TABLES.items():
+            rank = ORDER_RANK if tbl == 'orders' else ITEM_RANK
+            time_idx = [cols.index(c) for c in ("created_at", "queued_at", "preparing_at", "done_at", "billed_at")
+                        if c in cols]
+            rows = [r for r in batch[tbl] if tbl == 'orders' or r[0] not in deleted]
+            local = {}
+            for i in range(0, len(rows), 500):
+                chunk = [r[0] for r in rows[i:i + 500]]
+                cur.execute(f"SELECT {', '.join(cols)} FROM {tbl} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                local.update((r[0], r) for r in cur.fetchall())
+            inserts, updates = [], []
+            for remote in rows:
+                mine = local.get(remote[0])
+                merged = _merge(mine, tuple(remote), rank, cols.index('status'), time_idx)
+                if mine is None:
+                    inserts.append(merged)
+                elif merged != mine:
+                    updates.append(merged[1:] + (merged[0],))
+                else:
+                    continue
+                if tbl == 'orders':
+                    touched_tables.update(t for t in (merged[1], mine and mine[1]) if t is not None)
+            cur.executemany(f"INSERT INTO {tbl}({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", inserts)
+            cur.executemany(f"UPDATE {tbl} SET {', '.join(c + ' = ?' for c in cols[1:])} WHERE id = ?", updates)
+            stats[tbl] = len(inserts) + len(updates)
+        for item_id in batch['deleted']:
+            cur.execute("DELETE FROM order_items WHERE id = ?", (item_id,))
+            if cur.rowcount:
+                stats['deleted'] += 1
+            else:
+                # never seen here: keep a tombstone so a later copy is not resurrected
+                cur.execute("INSERT INTO sync_log(tbl, row_id, op) VALUES ('order_items', ?, 'delete')", (item_id,))
+        if touched_tables:
+            tids = sorted(touched_tables)
+            cur.execute(f"""
+                UPDATE tables SET status = CASE WHEN EXISTS (
+                    SELECT 1 FROM orders o WHERE o.table_id = tables.id AND o.status = 'open')
+                    THEN 'Occupied' ELSE 'Free' END
+                WHERE id IN ({','.join('?' * len(tids))})
+            """, tids)
+        cur.execute("""
+            INSERT INTO sync_peers(node_id, pulled_seq, synced_at) VALUES (?, ?, ?)
+            ON CONFLICT(node_id) DO UPDATE SET pulled_seq = excluded.pulled_seq, synced_at = excluded.synced_at
+        """, (source_node, upto_seq, datetime.datetime.now().isoformat()))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return stats
+
+
+def pull(local, remote, batch_size=BATCH_SIZE):
+    """Bring `local` up to date with `remote`. Returns merged row counts."""
+    source = node_info(remote)[0]
+    r = local.execute("SELECT pulled_seq FROM sync_peers WHERE node_id = ?", (source,)).fetchone()
+    seq = r[0] if r else 0
+    totals = {'orders': 0, 'order_items': 0, 'deleted': 0}
+    while True:
+        new_seq, batch = changes_since(remote, seq, batch_size)
+        if new_seq == seq:
+            return totals
+        for k, v in apply_changes(local, source, new_seq, batch).items():
+            totals[k] += v
+        seq = new_seq
+
+
+def sync(a, b, batch_size=BATCH_SIZE):
+    """Two-way sync; returns (merged into a, merged into b)."""
+    into_a = pull(a, b, batch_size)
+    into_b = pull(b, a, batch_size)
+    return into_a, into_b
+
+
+def _connect(path):
+    con = sqlite3.connect(path, isolation_level=None)
+    con.execute("PRAGMA busy_timeout=5000")
+    return con
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="POS terminal sync")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("init", help="set up sync and assign a terminal id")
+    i.add_argument("--terminal", type=int, required=True)
+    i.add_argument("db")
+    s = sub.add_parser("sync", help="two-way sync between two databases")
+    s.add_argument("db")
+    s.add_argument("peer")
+    st = sub.add_parser("status", help="node id, terminal id, log position and peer watermarks")
+    st.add_argument("db", nargs="?", default=DB_FILE)
+    args = ap.parse_args(argv)
+
+    import restaurant_pos
+    if args.cmd == "init":
+        restaurant_pos.DB_FILE = args.db
+        restaurant_pos.init_db()
+        con = _connect(args.db)
+        try:
+            set_terminal(con, args.terminal)
+        except ValueError as e:
+            print(e)
+            return 1
+        finally:
+            con.close()
+        print(f"{args.db}: terminal {args.terminal}, ids from {args.terminal * TERMINAL_ID_RANGE + 1}")
+        return 0
+    if args.cmd == "sync":
+        for path in (args.db, args.peer):
+            restaurant_pos.DB_FILE = path
+            restaurant_pos.init_db()
+        a, b = _connect(args.db), _connect(args.peer)
+        try:
+            into_a, into_b = sync(a, b)
+        finally:
+            a.close()
+            b.close()
+        print(f"{args.db} <- {args.peer}: {into_a}")
+        print(f"{args.peer} <- {args.db}: {into_b}")
+        return 0
+    con = _connect(args.db)
+    try:
+        init_sync(con)
+        node_id, terminal_id = node_info(con)
+        seq = con.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_log").fetchone()[0]
+        print(f"node {node_id}  terminal {terminal_id}  log seq {seq}")
+        for peer, pulled, at in con.execute("SELECT node_id, pulled_seq, synced_at FROM sync_peers ORDER BY synced_at"):
+            print(f"  peer {peer}: pulled up to {pulled} at {at}")
+    finally:
+        con.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
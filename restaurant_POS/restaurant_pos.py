@@ -8,6 +8,14 @@ Features:
 - Kitchen screen (view pending orders per table, mark prepared)
 - Save bills to SQLite, generate PDF receipt in receipts/
 - Offline storage with sqlite3
+- In-memory order/table state (OrderStore) written through to SQLite
+- Kitchen screen updates incrementally from an order_items change log
+- Receipts rendered off the UI thread (A4 PDF and 80mm ESC/POS), cached per order
+- End-of-day close with stored sales rollups (see pos_reports.py)
+- Batched order edits and billing applied in one transaction (apply_order_edits)
+- Cached menu index: several menus, category filter, name search and numeric quick codes
+- Kitchen lines routed to stations by category, queued oldest order first, with per-line timings
+- Offline terminals sync orders with the main database (see pos_sync.py)
 
 Requires:
     pip install reportlab
@@ -17,8 +25,13 @@ Run:
 
 import os
 import sys
+import io
+import bisect
 import sqlite3
 import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, ROUND_HALF_UP
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
@@ -30,11 +43,35 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 
+from pos_reports import close_day
+from pos_sync import init_sync, next_id
+
 DB_FILE = "pos.db"
+KITCHEN_POLL_MS = 1000       # kitchen screen change-log poll interval
+CHANGE_LOG_KEEP = 10000      # change-log rows kept when pruning at startup
+RECEIPT_WIDTH = 48           # characters per line on 80mm paper (font A)
+RECEIPT_CACHE_SIZE = 200     # billed orders whose receipt bytes are kept for reprints
+# Thermal printer device or file for ESC/POS output (e.g. /dev/usb/lp0).
+# When unset, ESC/POS receipts are written next to the PDFs in receipts/.
+PRINTER_DEVICE = os.environ.get("POS_PRINTER")
+ITEM_STATUSES = ('pending', 'preparing', 'done', 'served')
+DEFAULT_STATION = "Kitchen"  # station for categories without a routing entry
+# Initial category -> station routing (editable in the category_stations table)
+DEFAULT_ROUTING = {"Beverage": "Bar", "Burger": "Grill", "Sides": "Grill", "Pizza": "Tandoor"}
 
 def money(x):
     return Decimal(x).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
+MAX_NUMBER = Decimal(10) ** 9   # qty/rate ceiling, so qty * rate stays inside Decimal precision
+
+def check_line(qty, rate):
+    """ValueError unless qty is a finite number above zero and rate one not below zero, both at most MAX_NUMBER."""
+    qty, rate = Decimal(str(qty)), Decimal(str(rate))
+    if not qty.is_finite() or qty <= 0 or qty > MAX_NUMBER:
+        raise ValueError(f"qty must be a finite number above zero and at most {MAX_NUMBER}, not {qty}")
+    if not rate.is_finite() or rate < 0 or rate > MAX_NUMBER:
+        raise ValueError(f"rate must be a finite number not below zero and at most {MAX_NUMBER}, not {rate}")
+
 # ---------------------
 # Database helpers
 # ---------------------
@@ -79,6 +116,104 @@ def init_db():
         FOREIGN KEY(order_id) REFERENCES orders(id),
         FOREIGN KEY(menu_item_id) REFERENCES menu_items(id)
     )""")
+
+    # orders.billed_at (added after the first release) feeds ticket-time reporting
+    cur.execute("PRAGMA table_info(orders)")
+    if 'billed_at' not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE orders ADD COLUMN billed_at TEXT")
+
+    # menu_items.code / menu (added later): numeric quick codes for item entry
+    # and the menu an item belongs to (e.g. Main, Bar, Breakfast)
+    cur.execute("PRAGMA table_info(menu_items)")
+    menu_cols = [row[1] for row in cur.fetchall()]
+    if 'code' not in menu_cols:
+        cur.execute("ALTER TABLE menu_items ADD COLUMN code INTEGER")
+        cur.execute("UPDATE menu_items SET code = id")
+    if 'menu' not in menu_cols:
+        cur.execute("ALTER TABLE menu_items ADD COLUMN menu TEXT DEFAULT 'Main'")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_menu_items_code ON menu_items(code)")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS menu_items_code AFTER INSERT ON menu_items WHEN NEW.code IS NULL
+    BEGIN UPDATE menu_items SET code = (SELECT COALESCE(MAX(code), 0) + 1 FROM menu_items) WHERE id = NEW.id; END""")
+
+    # Menu version: bumped by any change to menu_items so cached menu
+    # indexes (MenuIndex) know to rebuild
+    cur.execute("CREATE TABLE IF NOT EXISTS pos_meta (key TEXT PRIMARY KEY, value INTEGER)")
+    cur.execute("INSERT OR IGNORE INTO pos_meta(key, value) VALUES ('menu_version', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS menu_items_version_{event.lower()} AFTER {event} ON menu_items
+        BEGIN UPDATE pos_meta SET value = value + 1 WHERE key = 'menu_version'; END""")
+
+    # Station routing: order lines are tagged with the station of their menu
+    # category when inserted. queued_at/preparing_at/done_at record when the
+    # line was entered, started and finished, for ticket-time reporting.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS category_stations (
+        category TEXT PRIMARY KEY,
+        station TEXT NOT NULL
+    )""")
+    cur.execute("SELECT COUNT(*) FROM category_stations")
+    if cur.fetchone()[0] == 0:
+        cur.executemany("INSERT INTO category_stations(category, station) VALUES (?, ?)", DEFAULT_ROUTING.items())
+    cur.execute("PRAGMA table_info(order_items)")
+    item_cols = [row[1] for row in cur.fetchall()]
+    for col in ("station", "queued_at", "preparing_at", "done_at"):
+        if col not in item_cols:
+            cur.execute(f"ALTER TABLE order_items ADD COLUMN {col} TEXT")
+    cur.execute("""
+        UPDATE order_items SET
+            station = COALESCE((SELECT cs.station FROM menu_items m JOIN category_stations cs ON cs.category = m.category
+                                WHERE m.id = order_items.menu_item_id), ?),
+            queued_at = COALESCE(queued_at, (SELECT created_at FROM orders WHERE id = order_items.order_id))
+        WHERE station IS NULL
+    """, (DEFAULT_STATION,))
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_items_station ON order_items(station, status)")
+    now = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS order_items_route AFTER INSERT ON order_items
+    BEGIN
+        UPDATE order_items SET
+            station = COALESCE(NEW.station,
+                               (SELECT cs.station FROM menu_items m JOIN category_stations cs ON cs.category = m.category
+                                WHERE m.id = NEW.menu_item_id),
+                               '{DEFAULT_STATION}'),
+            queued_at = COALESCE(NEW.queued_at, {now})
+        WHERE id = NEW.id;
+    END""")
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS order_items_timing AFTER UPDATE OF status ON order_items
+    WHEN NEW.status IS NOT OLD.status
+    BEGIN
+        UPDATE order_items SET
+            preparing_at = CASE WHEN NEW.status != 'pending' AND preparing_at IS NULL THEN {now} ELSE preparing_at END,
+            done_at = CASE WHEN NEW.status IN ('done', 'served') AND done_at IS NULL THEN {now} ELSE done_at END
+        WHERE id = NEW.id;
+    END""")
+
+    # Change log for the kitchen screen: every insert/update/delete of an
+    # order line (and billing of its order) appends the line id with a new
+    # sequence number, whichever process or connection made the change.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS order_item_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL
+    )""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS order_items_log_insert AFTER INSERT ON order_items
+    BEGIN INSERT INTO order_item_changes(item_id) VALUES (NEW.id); END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS order_items_log_update AFTER UPDATE OF name, qty, rate, total, status ON order_items
+    BEGIN INSERT INTO order_item_changes(item_id) VALUES (NEW.id); END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS order_items_log_delete AFTER DELETE ON order_items
+    BEGIN INSERT INTO order_item_changes(item_id) VALUES (OLD.id); END""")
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS orders_log_status AFTER UPDATE OF status ON orders
+    WHEN NEW.status IS NOT OLD.status
+    BEGIN INSERT INTO order_item_changes(item_id) SELECT id FROM order_items WHERE order_id = NEW.id; END""")
+    cur.execute("DELETE FROM order_item_changes WHERE seq <= (SELECT MAX(seq) FROM order_item_changes) - ?",
+                (CHANGE_LOG_KEEP,))
     con.commit()
 
     # Insert sample menu items if none
@@ -104,6 +239,8 @@ def init_db():
         cur.executemany("INSERT INTO tables(name) VALUES (?)", tables)
         con.commit()
 
+    # replication log for syncing with other terminals (see pos_sync.py)
+    init_sync(con)
     con.close()
 
 def get_tables():
@@ -126,8 +263,8 @@ def create_order(table_id):
     con = sqlite3.connect(DB_FILE)
     cur = con.cursor()
     now = datetime.datetime.now().isoformat()
-    cur.execute("INSERT INTO orders(table_id, created_at, status) VALUES (?, ?, 'open')", (table_id, now))
-    oid = cur.lastrowid
+    oid = next_id(cur, 'orders')
+    cur.execute("INSERT INTO orders(id, table_id, created_at, status) VALUES (?, ?, ?, 'open')", (oid, table_id, now))
     cur.execute("UPDATE tables SET status='Occupied' WHERE id=?", (table_id,))
     con.commit()
     con.close()
@@ -146,9 +283,9 @@ def add_order_item(order_id, menu_item_id, name, qty, rate):
     cur = con.cursor()
     total = float(money(qty * Decimal(rate)))
     cur.execute("""
-        INSERT INTO order_items(order_id, menu_item_id, name, qty, rate, total, status)
-        VALUES (?, ?, ?, ?, ?, ?, 'pending')
-    """, (order_id, menu_item_id, name, float(qty), float(rate), total))
+        INSERT INTO order_items(id, order_id, menu_item_id, name, qty, rate, total, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+    """, (next_id(cur, 'order_items'), order_id, menu_item_id, name, float(qty), float(rate), total))
     con.commit()
     con.close()
 
@@ -168,21 +305,12 @@ def set_order_item_status(item_id, status):
     con.close()
 
 def finalize_bill(order_id, gst_percent=5.0):
-    # calculate totals, set order status billed
+    # calculate totals, set order status billed and free the table in one transaction
     con = sqlite3.connect(DB_FILE)
-    cur = con.cursor()
-    cur.execute("SELECT SUM(total) FROM order_items WHERE order_id=?", (order_id,))
-    subtotal = cur.fetchone()[0] or 0.0
-    gst = float(money(Decimal(subtotal) * Decimal(gst_percent) / Decimal(100)))
-    total = float(money(Decimal(subtotal) + Decimal(gst)))
-    cur.execute("UPDATE orders SET total=?, gst=?, status='billed' WHERE id=?", (total, gst, order_id))
-    # free table
-    cur.execute("SELECT table_id FROM orders WHERE id=?", (order_id,))
-    tid = cur.fetchone()[0]
-    cur.execute("UPDATE tables SET status='Free' WHERE id=?", (tid,))
-    con.commit()
-    con.close()
-    return subtotal, gst, total
+    try:
+        return apply_order_edits(con, order_id, finalize_gst=gst_percent)['bill']
+    finally:
+        con.close()
 
 def save_receipt_path(order_id, path):
     con = sqlite3.connect(DB_FILE)
@@ -191,26 +319,438 @@ def save_receipt_path(order_id, path):
     con.commit()
     con.close()
 
+class OrderAlreadyBilled(RuntimeError):
+    """The order was billed (or does not exist) when the edit was applied."""
+
+
+def apply_order_edits(con, order_id, adds=(), removes=(), statuses=(), finalize_gst=None):
+    """
+    Apply a batch of edits to one order in a single BEGIN IMMEDIATE transaction.
+
+    adds:         (menu_item_id, name, qty, rate) tuples; qty above zero, rate not
+                  below zero (checked before the transaction starts)
+    removes:      item ids; only lines still 'pending' are deleted
+    statuses:     (item_id, status) pairs
+    finalize_gst: when not None, bill the order at this GST % and free its table
+
+    The write lock is taken before the order is checked, so two terminals
+    cannot both edit or bill the same order; if the order is no longer open
+    nothing is written and OrderAlreadyBilled is raised.
+    Returns {'added': [item rows], 'removed': [ids], 'statuses': [(id, status)],
+    'bill': (subtotal, gst, total) or None}.
+    """
+    for _, status in statuses:
+        if status not in ITEM_STATUSES:
+            raise ValueError(f"status must be one of {', '.join(ITEM_STATUSES)}")
+    for _, _, qty, rate in adds:
+        check_line(qty, rate)
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT table_id FROM orders WHERE id=? AND status='open'", (order_id,))
+        r = cur.fetchone()
+        if r is None:
+            raise OrderAlreadyBilled(f"order {order_id} is not open")
+        table_id = r[0]
+        result = {'added': [], 'removed': [], 'statuses': [], 'bill': None}
+        for menu_item_id, name, qty, rate in adds:
+            total = float(money(Decimal(str(qty)) * Decimal(str(rate))))
+            item_id = next_id(cur, 'order_items')
+            cur.execute("""
+                INSERT INTO order_items(id, order_id, menu_item_id, name, qty, rate, total, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+            """, (item_id, order_id, menu_item_id, name, float(qty), float(rate), total))
+            result['added'].append((item_id, name, float(qty), float(rate), total, 'pending'))
+        for item_id in removes:
+            cur.execute("DELETE FROM order_items WHERE id=? AND order_id=? AND status='pending'", (item_id, order_id))
+            if cur.rowcount:
+                result['removed'].append(item_id)
+        for item_id, status in statuses:
+            cur.execute("UPDATE order_items SET status=? WHERE id=? AND order_id=?", (status, item_id, order_id))
+            if cur.rowcount:
+                result['statuses'].append((item_id, status))
+        if finalize_gst is not None:
+            cur.execute("SELECT SUM(total) FROM order_items WHERE order_id=?", (order_id,))
+            subtotal = money(Decimal(str(cur.fetchone()[0] or 0)))
+            gst = float(money(subtotal * Decimal(str(finalize_gst)) / Decimal(100)))
+            total = float(money(subtotal + Decimal(str(gst))))
+            cur.execute("UPDATE orders SET total=?, gst=?, status='billed', billed_at=? WHERE id=? AND status='open'",
+                        (total, gst, datetime.datetime.now().isoformat(), order_id))
+            if cur.rowcount != 1:
+                raise OrderAlreadyBilled(f"order {order_id} is not open")
+            cur.execute("UPDATE tables SET status='Free' WHERE id=?", (table_id,))
+            result['bill'] = (float(subtotal), gst, total)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return result
+
+# kitchen row: item id, table id, table name, item name, qty, rate, total,
+# status, order id, station, order created_at
+_PENDING_ITEMS_SQL = """
+    SELECT oi.id, o.table_id, t.name, oi.name, oi.qty, oi.rate, oi.total, oi.status, o.id,
+           oi.station, o.created_at
+    FROM order_items oi
+    JOIN orders o ON oi.order_id = o.id
+    JOIN tables t ON o.table_id = t.id
+    WHERE o.status='open' AND oi.status IN ('pending','preparing')
+"""
+
 def get_pending_items():
     con = sqlite3.connect(DB_FILE)
     cur = con.cursor()
+    cur.execute(_PENDING_ITEMS_SQL + " ORDER BY o.table_id, oi.id")
+    rows = cur.fetchall()
+    con.close()
+    return rows
+
+def get_station_queue(con, station=None):
+    """Pending/preparing lines for a station (all stations when None), oldest order first."""
+    cur = con.cursor()
+    if station is None:
+        cur.execute(_PENDING_ITEMS_SQL + " ORDER BY o.created_at, o.id, oi.id")
+    else:
+        cur.execute(_PENDING_ITEMS_SQL + " AND oi.station = ? ORDER BY o.created_at, o.id, oi.id", (station,))
+    return cur.fetchall()
+
+def get_stations(con):
+    """Every station: routed ones plus the default, with queue depth and oldest queued line."""
+    cur = con.cursor()
     cur.execute("""
-        SELECT oi.id, o.table_id, t.name, oi.name, oi.qty, oi.rate, oi.total, oi.status, o.id
-        FROM order_items oi
-        JOIN orders o ON oi.order_id = o.id
-        JOIN tables t ON o.table_id = t.id
+        SELECT oi.station, COUNT(*), MIN(o.created_at)
+        FROM order_items oi JOIN orders o ON o.id = oi.order_id
         WHERE o.status='open' AND oi.status IN ('pending','preparing')
-        ORDER BY o.table_id, oi.id
+        GROUP BY oi.station
     """)
-    rows = cur.fetchall()
+    depth = {r[0]: r[1:] for r in cur.fetchall()}
+    cur.execute("SELECT DISTINCT station FROM category_stations")
+    names = sorted({r[0] for r in cur.fetchall()} | {DEFAULT_STATION} | {k for k in depth if k})
+    return [(name,) + depth.get(name, (0, None)) for name in names]
+
+def set_category_station(category, station):
+    con = sqlite3.connect(DB_FILE)
+    con.execute("INSERT OR REPLACE INTO category_stations(category, station) VALUES (?, ?)", (category, station))
+    con.commit()
     con.close()
-    return rows
+
+def get_change_seq(con):
+    r = con.execute("SELECT MAX(seq) FROM order_item_changes").fetchone()
+    return r[0] or 0
+
+def get_item_changes(con, since_seq):
+    """
+    Kitchen rows changed after `since_seq`.
+    Returns (new_seq, rows, removed_ids): rows have the get_pending_items()
+    shape; removed_ids are lines that left the pending/preparing queue.
+    Cost is proportional to the number of changes, not to the backlog.
+    """
+    cur = con.cursor()
+    cur.execute("SELECT seq, item_id FROM order_item_changes WHERE seq > ? ORDER BY seq", (since_seq,))
+    changes = cur.fetchall()
+    if not changes:
+        return since_seq, [], []
+    ids = list({c[1] for c in changes})
+    rows = []
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cur.execute(_PENDING_ITEMS_SQL + f" AND oi.id IN ({','.join('?' * len(chunk))})", chunk)
+        rows.extend(cur.fetchall())
+    live = {r[0] for r in rows}
+    return changes[-1][0], rows, [i for i in ids if i not in live]
 
 # ---------------------
-# Receipt PDF
+# Menu catalog
 # ---------------------
-def generate_receipt_pdf(order_id, receipt_path):
-    # fetch order, items
+class MenuIndex:
+    """
+    Cached menu catalog.
+
+    Built from one scan of menu_items and kept until the menu changes (the
+    pos_meta menu_version counter, bumped by triggers, is compared on
+    refresh_if_stale()). Rows are (id, name, price, category, code, menu).
+    Lookups by id or quick code are dict hits; name search is a bisect over
+    the sorted words of every item name, so any word of a name can be
+    typed as a prefix ("piz" -> "Margherita Pizza").
+    """
+
+    def __init__(self, con):
+        self.con = con
+        self.version = None
+        self.refresh_if_stale()
+
+    def refresh_if_stale(self):
+        """Rebuild if the menu changed since the last build. Returns True if it did."""
+        r = self.con.execute("SELECT value FROM pos_meta WHERE key='menu_version'").fetchone()
+        version = r[0] if r else 0
+        if version == self.version:
+            return False
+        self._build()
+        self.version = version
+        return True
+
+    def _build(self):
+        cur = self.con.cursor()
+        cur.execute("""
+            SELECT id, name, price, category, code, COALESCE(menu, 'Main') FROM menu_items
+            ORDER BY menu, category, name
+        """)
+        self.rows = cur.fetchall()
+        self.by_id = {r[0]: r for r in self.rows}
+        self.by_code = {r[4]: r for r in self.rows if r[4] is not None}
+        self.buckets = OrderedDict()     # (menu, category) -> rows, in display order
+        self.words = []                  # sorted (word, id)
+        for r in self.rows:
+            self.buckets.setdefault((r[5], r[3]), []).append(r)
+            for w in set((r[1] or "").lower().split()):
+                self.words.append((w, r[0]))
+        self.words.sort()
+        self.menus = sorted({r[5] for r in self.rows})
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def lookup_code(self, code):
+        try:
+            return self.by_code.get(int(code))
+        except (TypeError, ValueError):
+            return None
+
+    def categories(self, menu=None):
+        return [cat for (m, cat) in self.buckets if menu is None or m == menu]
+
+    def items(self, menu=None, category=None):
+        return [r for (m, cat), rows in self.buckets.items()
+                if (menu is None or m == menu) and (category is None or cat == category) for r in rows]
+
+    def search(self, text, menu=None, category=None, limit=None):
+        """Items having a name word starting with each word of `text`, in menu order."""
+        terms = text.lower().split()
+        if not terms:
+            return self.items(menu, category)
+        ids = None
+        for term in terms:
+            found = set()
+            i = bisect.bisect_left(self.words, (term,))
+            while i < len(self.words) and self.words[i][0].startswith(term):
+                found.add(self.words[i][1])
+                i += 1
+            ids = found if ids is None else ids & found
+        rows = [r for r in self.items(menu, category) if r[0] in ids]
+        return rows[:limit] if limit else rows
+
+# ---------------------
+# Live order state
+# ---------------------
+class OrderStore:
+    """
+    In-memory table/order state for the POS screen.
+
+    Reads (table list, open order per table, order lines, running subtotal)
+    are served from memory. Every change is written through to SQLite on a
+    single long-lived WAL connection and committed before the in-memory copy
+    is updated, so the database stays the source of truth on restart.
+    """
+
+    def __init__(self, db_file=None):
+        self.con = sqlite3.connect(db_file or DB_FILE)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.reload()
+
+    def reload(self):
+        cur = self.con.cursor()
+        cur.execute("SELECT id, name, status FROM tables ORDER BY id")
+        self.tables = [list(r) for r in cur.fetchall()]
+        self._tables_by_id = {r[0]: r for r in self.tables}
+        cur.execute("SELECT id, table_id, created_at FROM orders WHERE status='open' ORDER BY id")
+        self.open_orders = {}      # table_id -> order_id
+        self.order_table = {}      # order_id -> table_id
+        self.order_created = {}    # order_id -> created_at
+        for oid, tid, created_at in cur.fetchall():
+            self.open_orders[tid] = oid
+            self.order_table[oid] = tid
+            self.order_created[oid] = created_at
+        self.items = {oid: {} for oid in self.order_table}   # order_id -> {item_id: row}
+        self.item_order = {}                                  # item_id -> order_id
+        self.subtotals = {oid: Decimal('0.00') for oid in self.order_table}
+        cur.execute("""
+            SELECT oi.id, oi.order_id, oi.name, oi.qty, oi.rate, oi.total, oi.status
+            FROM order_items oi JOIN orders o ON o.id = oi.order_id
+            WHERE o.status='open'
+            ORDER BY oi.id
+        """)
+        for iid, oid, name, qty, rate, total, status in cur.fetchall():
+            if oid in self.items:
+                self._put_item(oid, (iid, name, qty, rate, total, status))
+
+    def close(self):
+        self.con.close()
+
+    def _put_item(self, order_id, row):
+        self.items[order_id][row[0]] = row
+        self.item_order[row[0]] = order_id
+        self.subtotals[order_id] += money(row[4])
+
+    def _drop_item(self, item_id):
+        order_id = self.item_order.pop(item_id)
+        row = self.items[order_id].pop(item_id)
+        self.subtotals[order_id] -= money(row[4])
+
+    # --- reads ---
+    def get_tables(self):
+        return [tuple(r) for r in self.tables]
+
+    def order_items(self, order_id):
+        return list(self.items.get(order_id, {}).values())
+
+    def subtotal(self, order_id):
+        return self.subtotals.get(order_id, Decimal('0.00'))
+
+    # --- writes ---
+    def create_table(self, name):
+        cur = self.con.cursor()
+        try:
+            cur.execute("INSERT INTO tables(name) VALUES (?)", (name,))
+            self.con.commit()
+        except sqlite3.IntegrityError:
+            self.con.rollback()
+            raise
+        row = [cur.lastrowid, name, 'Free']
+        self.tables.append(row)
+        self._tables_by_id[row[0]] = row
+        return row[0]
+
+    def open_order(self, table_id):
+        """Open order for the table, creating one (and marking it Occupied) if needed."""
+        oid = self.open_orders.get(table_id)
+        if oid:
+            return oid
+        if table_id not in self._tables_by_id:
+            raise KeyError(f"unknown table {table_id}")
+        cur = self.con.cursor()
+        now = datetime.datetime.now().isoformat()
+        oid = next_id(cur, 'orders')
+        cur.execute("INSERT INTO orders(id, table_id, created_at, status) VALUES (?, ?, ?, 'open')", (oid, table_id, now))
+        cur.execute("UPDATE tables SET status='Occupied' WHERE id=?", (table_id,))
+        self.con.commit()
+        self.open_orders[table_id] = oid
+        self.order_table[oid] = table_id
+        self.order_created[oid] = now
+        self.items[oid] = {}
+        self.subtotals[oid] = Decimal('0.00')
+        self._tables_by_id[table_id][2] = 'Occupied'
+        return oid
+
+    def add_item(self, order_id, menu_item_id, name, qty, rate):
+        if order_id not in self.items:
+            raise KeyError(f"order {order_id} is not open")
+        check_line(qty, rate)
+        # str() first: a float qty or rate is taken at its printed value, like check_line does
+        total = float(money(Decimal(str(qty)) * Decimal(str(rate))))
+        cur = self.con.cursor()
+        item_id = next_id(cur, 'order_items')
+        cur.execute("""
+            INSERT INTO order_items(id, order_id, menu_item_id, name, qty, rate, total, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, (item_id, order_id, menu_item_id, name, float(qty), float(rate), total))
+        self.con.commit()
+        row = (item_id, name, float(qty), float(rate), total, 'pending')
+        self._put_item(order_id, row)
+        return row
+
+    def remove_item(self, item_id):
+        """Delete a line that has not reached the kitchen yet. Returns False otherwise."""
+        order_id = self.item_order.get(item_id)
+        if order_id is None or self.items[order_id][item_id][5] in ('preparing', 'done', 'served'):
+            return False
+        self.con.execute("DELETE FROM order_items WHERE id=?", (item_id,))
+        self.con.commit()
+        self._drop_item(item_id)
+        return True
+
+    def set_item_status(self, item_id, status):
+        self.con.execute("UPDATE order_items SET status=? WHERE id=?", (status, item_id))
+        self.con.commit()
+        order_id = self.item_order.get(item_id)
+        if order_id is not None:
+            row = self.items[order_id][item_id]
+            self.items[order_id][item_id] = row[:5] + (status,)
+
+    def send_to_kitchen(self, order_id):
+        self.con.execute("UPDATE order_items SET status='preparing' WHERE order_id=? AND status='pending'", (order_id,))
+        self.con.commit()
+        lines = self.items.get(order_id, {})
+        for iid, row in lines.items():
+            if row[5] == 'pending':
+                lines[iid] = row[:5] + ('preparing',)
+
+    def apply_edits(self, order_id, adds=(), removes=(), statuses=(), finalize_gst=None):
+        """
+        Batched edit (see apply_order_edits); one commit for the whole batch.
+        If another terminal billed the order first, the in-memory state is
+        reloaded from the database and OrderAlreadyBilled is re-raised.
+        """
+        try:
+            result = apply_order_edits(self.con, order_id, adds, removes, statuses, finalize_gst)
+        except OrderAlreadyBilled:
+            self.reload()
+            raise
+        if order_id not in self.items:
+            # opened elsewhere (another terminal)
+            self.reload()
+            return result
+        for row in result['added']:
+            self._put_item(order_id, row)
+        for item_id in result['removed']:
+            self._drop_item(item_id)
+        for item_id, status in result['statuses']:
+            row = self.items[order_id].get(item_id)
+            if row is not None:
+                self.items[order_id][item_id] = row[:5] + (status,)
+        if result['bill'] is not None:
+            self._forget_order(order_id)
+        return result
+
+    def finalize(self, order_id, gst_percent=5.0):
+        """Bill the order, free its table and forget it. Raises OrderAlreadyBilled if billed elsewhere."""
+        return self.apply_edits(order_id, finalize_gst=gst_percent)['bill']
+
+    def _forget_order(self, order_id):
+        table_id = self.order_table[order_id]
+        for iid in self.items.pop(order_id):
+            self.item_order.pop(iid, None)
+        self.subtotals.pop(order_id)
+        self.order_table.pop(order_id)
+        self.order_created.pop(order_id)
+        if self.open_orders.get(table_id) == order_id:
+            del self.open_orders[table_id]
+        self._tables_by_id[table_id][2] = 'Free'
+
+    def snapshot(self, order_id):
+        """Receipt data for an open order (see receipt_snapshot_from_db for the shape)."""
+        return {
+            'order_id': order_id,
+            'table': self._tables_by_id[self.order_table[order_id]][1],
+            'created_at': self.order_created[order_id],
+            'items': [(r[1], r[2], r[3], r[4]) for r in self.order_items(order_id)],
+            'subtotal': float(self.subtotal(order_id)),
+            'gst': None,
+            'total': None,
+        }
+
+    def save_receipt_path(self, order_id, path):
+        self.con.execute("UPDATE orders SET receipt_path=? WHERE id=?", (path, order_id))
+        self.con.commit()
+
+# ---------------------
+# Receipts
+# ---------------------
+def receipt_snapshot_from_db(order_id):
+    """
+    Everything a receipt needs, as a plain dict:
+    order_id, table, created_at, items [(name, qty, rate, total)], subtotal, gst, total.
+    """
     con = sqlite3.connect(DB_FILE)
     cur = con.cursor()
     cur.execute("SELECT o.id, t.name, o.created_at, o.total, o.gst FROM orders o JOIN tables t ON o.table_id=t.id WHERE o.id=?", (order_id,))
@@ -222,21 +762,24 @@ def generate_receipt_pdf(order_id, receipt_path):
     cur.execute("SELECT name, qty, rate, total FROM order_items WHERE order_id=?", (order_id,))
     items = cur.fetchall()
     con.close()
+    subtotal = sum([it[3] for it in items]) if items else 0.0
+    return {'order_id': order_id, 'table': table_name, 'created_at': created_at,
+            'items': items, 'subtotal': subtotal, 'gst': gst, 'total': total}
 
-    # Build PDF
-    os.makedirs("receipts", exist_ok=True)
-    doc = SimpleDocTemplate(receipt_path, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm, topMargin=15*mm, bottomMargin=15*mm)
+def render_receipt_pdf(snap, out):
+    """A4 receipt; `out` is a path or a binary file object."""
+    doc = SimpleDocTemplate(out, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm, topMargin=15*mm, bottomMargin=15*mm)
     styles = getSampleStyleSheet()
     story = []
     story.append(Paragraph("<b>Safari World</b>", styles['Title']))
     story.append(Paragraph("3rd Floor, Safari Mall, Gachibowli, Chennai", styles['Normal']))
     story.append(Spacer(1, 6))
-    story.append(Paragraph(f"Table: {table_name}", styles['Normal']))
-    story.append(Paragraph(f"Order ID: {order_id}  Date: {created_at}", styles['Normal']))
+    story.append(Paragraph(f"Table: {snap['table']}", styles['Normal']))
+    story.append(Paragraph(f"Order ID: {snap['order_id']}  Date: {snap['created_at']}", styles['Normal']))
     story.append(Spacer(1, 8))
 
     data = [["Item", "Qty", "Rate", "Total"]]
-    for it in items:
+    for it in snap['items']:
         data.append([it[0], str(it[1]), f"{money(it[2])}", f"{money(it[3])}"])
 
     tbl = Table(data, colWidths=[90*mm, 20*mm, 30*mm, 30*mm])
@@ -249,7 +792,7 @@ def generate_receipt_pdf(order_id, receipt_path):
     story.append(tbl)
     story.append(Spacer(1, 8))
 
-    subtotal = sum([it[3] for it in items]) if items else 0.0
+    subtotal, gst, total = snap['subtotal'], snap['gst'], snap['total']
     story.append(Paragraph(f"<b>Subtotal:</b> {money(subtotal)}", styles['Normal']))
     story.append(Paragraph(f"<b>GST:</b> {money(gst) if gst else '0.00'}", styles['Normal']))
     story.append(Paragraph(f"<b>Total:</b> {money(total) if total else money(subtotal)}", styles['Heading2']))
@@ -257,6 +800,113 @@ def generate_receipt_pdf(order_id, receipt_path):
     story.append(Paragraph("Thank you! Visit again.", styles['Normal']))
     doc.build(story)
 
+def render_receipt_escpos(snap, width=RECEIPT_WIDTH):
+    """Compact ESC/POS byte stream for an 80mm thermal printer."""
+    ESC, GS = b"\x1b", b"\x1d"
+    def line(text=""):
+        return text.encode('ascii', 'replace') + b"\n"
+    def cols(left, right):
+        return line(f"{left[:width - len(right) - 1]:<{width - len(right)}}{right}")
+    rule = line("-" * width)
+    qty_w, amt_w = 5, 11
+    name_w = width - qty_w - amt_w
+
+    out = [ESC + b"@", ESC + b"a\x01",                  # init, centre
+           GS + b"!\x11" + line("Safari World") + GS + b"!\x00",
+           line("3rd Floor, Safari Mall, Gachibowli, Chennai"),
+           ESC + b"a\x00", rule,                          # left
+           cols(f"Table: {snap['table']}", f"Order #{snap['order_id']}"),
+           line(str(snap['created_at'])[:19].replace("T", " ")), rule,
+           line(f"{'Item':<{name_w}}{'Qty':>{qty_w}}{'Amount':>{amt_w}}")]
+    for name, qty, rate, total in snap['items']:
+        qty_s = f"{Decimal(str(qty)).normalize():f}"
+        out.append(line(f"{name[:name_w - 1]:<{name_w}}{qty_s:>{qty_w}}{money(total):>{amt_w}}"))
+    subtotal, gst, total = snap['subtotal'], snap['gst'], snap['total']
+    out += [rule,
+            cols("Subtotal", f"{money(subtotal)}"),
+            cols("GST", f"{money(gst) if gst else '0.00'}"),
+            ESC + b"E\x01" + cols("TOTAL", f"{money(total) if total else money(subtotal)}") + ESC + b"E\x00",
+            rule, ESC + b"a\x01", line("Thank you! Visit again."),
+            ESC + b"d\x04", GS + b"V\x42\x00"]         # feed 4 lines, partial cut
+    return b"".join(out)
+
+def generate_receipt_pdf(order_id, receipt_path):
+    os.makedirs("receipts", exist_ok=True)
+    render_receipt_pdf(receipt_snapshot_from_db(order_id), receipt_path)
+
+class ReceiptPipeline:
+    """
+    Renders receipts on a background worker so billing never blocks the UI.
+    Rendered bytes of billed orders are cached per order (billed orders don't
+    change), so a reprint just rewrites the cached bytes; receipts of open
+    orders are always rendered fresh.
+    """
+
+    def __init__(self, cache_size=RECEIPT_CACHE_SIZE):
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="receipts")
+        self.cache = OrderedDict()   # (order_id, kind) -> bytes
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def _cached(self, order_id, kind, load_snap, render):
+        key = (order_id, kind)
+        with self.lock:
+            data = self.cache.get(key)
+            if data is not None:
+                self.cache.move_to_end(key)
+                return data
+        snap = load_snap()
+        data = render(snap)
+        # only a billed receipt is final; an open order can still gain items and GST
+        if snap['total'] is not None:
+            with self.lock:
+                self.cache[key] = data
+                while len(self.cache) > self.cache_size * 2:
+                    self.cache.popitem(last=False)
+        return data
+
+    def _render(self, order_id, load_snap, pdf_path, escpos_path):
+        loaded = []
+        def snap():
+            if not loaded:
+                loaded.append(load_snap())
+            return loaded[0]
+        written = {}
+        if pdf_path:
+            def pdf(s):
+                buf = io.BytesIO()
+                render_receipt_pdf(s, buf)
+                return buf.getvalue()
+            data = self._cached(order_id, 'pdf', snap, pdf)
+            with open(pdf_path, 'wb') as fh:
+                fh.write(data)
+            written['pdf'] = pdf_path
+        if escpos_path:
+            data = self._cached(order_id, 'escpos', snap, render_receipt_escpos)
+            with open(escpos_path, 'wb') as fh:
+                fh.write(data)
+            written['escpos'] = escpos_path
+        return written
+
+    def submit(self, snap, pdf_path=None, escpos_path=None):
+        """Queue rendering; returns a Future resolving to {'pdf': path, 'escpos': path}."""
+        # the snapshot being submitted is the authoritative one for the order
+        with self.lock:
+            for kind in ('pdf', 'escpos'):
+                self.cache.pop((snap['order_id'], kind), None)
+        return self.pool.submit(self._render, snap['order_id'], lambda: snap, pdf_path, escpos_path)
+
+    def reprint(self, order_id, pdf_path=None, escpos_path=None):
+        """Reprint from cache; orders not cached are re-read from the database on the worker."""
+        return self.pool.submit(self._render, order_id, lambda: receipt_snapshot_from_db(order_id),
+                                pdf_path, escpos_path)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+def escpos_target(order_id):
+    return PRINTER_DEVICE or os.path.join("receipts", f"receipt_order_{order_id}.escpos")
+
 # ---------------------
 # GUI Application
 # ---------------------
@@ -269,8 +919,10 @@ class POSApp(tk.Tk):
         self.style = ttk.Style(self)
         self.selected_table_id = None
         self.current_order_id = None
-        self.menu_items = []
-        self.order_items = []  # in-memory for UI (but persisted when saved)
+        self.order_items = []  # rows of the current order, served from self.store
+        self.store = OrderStore()
+        self.menu = MenuIndex(self.store.con)
+        self.receipts = ReceiptPipeline()
         self.create_widgets()
         self.refresh_tables()
         self.load_menu()
@@ -302,7 +954,32 @@ class POSApp(tk.Tk):
         menu_frame = ttk.LabelFrame(center, text="Menu")
         menu_frame.pack(fill='both', expand=True, padx=4, pady=4)
 
-        self.menu_tree = ttk.Treeview(menu_frame, columns=("name","price","category"), show='headings', height=12)
+        menu_filter = ttk.Frame(menu_frame)
+        menu_filter.pack(side='top', fill='x', padx=4, pady=(4, 0))
+        ttk.Label(menu_filter, text="Menu:").pack(side='left')
+        self.menu_var = tk.StringVar(value="All")
+        self.menu_combo = ttk.Combobox(menu_filter, textvariable=self.menu_var, state='readonly', width=12)
+        self.menu_combo.pack(side='left', padx=4)
+        self.menu_combo.bind("<<ComboboxSelected>>", lambda e: self.on_menu_select())
+        ttk.Label(menu_filter, text="Category:").pack(side='left')
+        self.category_var = tk.StringVar(value="All")
+        self.category_combo = ttk.Combobox(menu_filter, textvariable=self.category_var, state='readonly', width=14)
+        self.category_combo.pack(side='left', padx=4)
+        self.category_combo.bind("<<ComboboxSelected>>", lambda e: self.load_menu())
+        ttk.Label(menu_filter, text="Search:").pack(side='left')
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(menu_filter, textvariable=self.search_var, width=16)
+        search_entry.pack(side='left', padx=4)
+        search_entry.bind("<KeyRelease>", lambda e: self.load_menu())
+        ttk.Label(menu_filter, text="Code:").pack(side='left')
+        self.code_var = tk.StringVar()
+        code_entry = ttk.Entry(menu_filter, textvariable=self.code_var, width=6)
+        code_entry.pack(side='left', padx=4)
+        code_entry.bind("<Return>", lambda e: self.add_by_code())
+
+        self.menu_tree = ttk.Treeview(menu_frame, columns=("code","name","price","category"), show='headings', height=12)
+        self.menu_tree.heading("code", text="Code")
+        self.menu_tree.column("code", width=60, anchor='center')
         self.menu_tree.heading("name", text="Name")
         self.menu_tree.heading("price", text="Price")
         self.menu_tree.heading("category", text="Category")
@@ -337,6 +1014,7 @@ class POSApp(tk.Tk):
         ttk.Button(buttons, text="Remove Item", command=self.remove_order_item).pack(side='left', padx=4)
         ttk.Button(buttons, text="Send to Kitchen", command=self.send_to_kitchen).pack(side='left', padx=4)
         ttk.Button(buttons, text="Save & Print Bill", command=self.save_and_print_bill).pack(side='left', padx=4)
+        ttk.Button(buttons, text="Reprint Receipt", command=self.reprint_receipt).pack(side='left', padx=4)
 
         # Right: summary & controls
         right = ttk.LabelFrame(top, text="Summary", width=300)
@@ -361,13 +1039,14 @@ class POSApp(tk.Tk):
 
         ttk.Button(right, text="Refresh Tables", command=self.refresh_tables).pack(fill='x', padx=6, pady=(20,4))
         ttk.Button(right, text="Open Kitchen", command=self.open_kitchen_screen).pack(fill='x', padx=6, pady=4)
+        ttk.Button(right, text="End of Day", command=self.end_of_day).pack(fill='x', padx=6, pady=4)
 
     # --------------------
     # UI actions
     # --------------------
     def refresh_tables(self):
         self.tables_list.delete(0, 'end')
-        rows = get_tables()
+        rows = self.store.get_tables()
         for r in rows:
             display = f"{r[1]}  ({r[2]})"
             self.tables_list.insert('end', display)
@@ -379,23 +1058,37 @@ class POSApp(tk.Tk):
         if not sel:
             return
         idx = sel[0]
-        rows = get_tables()
-        row = rows[idx]
+        row = self.store.tables[idx]
         self.selected_table_id = row[0]
         self.table_label.config(text=row[1])
         # find open order or create new
-        order_id = get_open_order_for_table(self.selected_table_id)
-        if not order_id:
-            order_id = create_order(self.selected_table_id)
-        self.current_order_id = order_id
+        self.current_order_id = self.store.open_order(self.selected_table_id)
         self.load_order_items()
         self.update_title()
 
+    def on_menu_select(self):
+        self.category_var.set("All")
+        self.load_menu()
+
     def load_menu(self):
+        # the index is only rebuilt when menu_items changed
+        self.menu.refresh_if_stale()
+        menu = None if self.menu_var.get() == "All" else self.menu_var.get()
+        self.menu_combo['values'] = ["All"] + self.menu.menus
+        self.category_combo['values'] = ["All"] + list(dict.fromkeys(self.menu.categories(menu)))
+        category = None if self.category_var.get() == "All" else self.category_var.get()
         self.menu_tree.delete(*self.menu_tree.get_children())
-        self.menu_items = get_menu_items()
-        for m in self.menu_items:
-            self.menu_tree.insert('', 'end', iid=str(m[0]), values=(m[1], f"{money(m[2])}", m[3]))
+        for m in self.menu.search(self.search_var.get(), menu, category):
+            self.menu_tree.insert('', 'end', iid=str(m[0]), values=(m[4], m[1], f"{money(m[2])}", m[3]))
+
+    def add_by_code(self):
+        self.menu.refresh_if_stale()
+        m = self.menu.lookup_code(self.code_var.get().strip())
+        if not m:
+            messagebox.showwarning("Unknown code", f"No menu item with code {self.code_var.get()!r}.")
+            return
+        self.code_var.set("")
+        self.add_menu_item(m)
 
     def add_selected_menu_item(self):
         if not self.selected_table_id or not self.current_order_id:
@@ -405,21 +1098,26 @@ class POSApp(tk.Tk):
         if not sel:
             messagebox.showwarning("Select Item", "Select a menu item to add.")
             return
-        menu_id = int(sel[0])
-        # find menu entry
-        m = next((x for x in self.menu_items if x[0] == menu_id), None)
+        m = self.menu.get(int(sel[0]))
         if not m:
             return
+        self.add_menu_item(m)
+
+    def add_menu_item(self, m):
+        if not self.selected_table_id or not self.current_order_id:
+            messagebox.showwarning("Select Table", "Please select a table first.")
+            return
+        menu_id = m[0]
         qty = Decimal(self.qty_spin.get())
         name = m[1]
         rate = Decimal(str(m[2]))
-        add_order_item(self.current_order_id, menu_id, name, qty, rate)
+        self.store.add_item(self.current_order_id, menu_id, name, qty, rate)
         # mark UI
         self.load_order_items()
         # refresh kitchen view if open (best-effort)
         try:
             if hasattr(self, "kitchen_window") and self.kitchen_window.winfo_exists():
-                self.kitchen_window.refresh()
+                self.kitchen_window.poll_changes()
         except Exception:
             pass
 
@@ -428,7 +1126,7 @@ class POSApp(tk.Tk):
         self.order_items = []
         if not self.current_order_id:
             return
-        rows = get_order_items(self.current_order_id)
+        rows = self.store.order_items(self.current_order_id)
         for r in rows:
             self.order_items.append(r)
             self.order_tree.insert('', 'end', iid=str(r[0]), values=(r[1], r[2], f"{money(r[3])}", f"{money(r[4])}", r[5]))
@@ -440,40 +1138,27 @@ class POSApp(tk.Tk):
             return
         iid = int(sel[0])
         # only allow remove if not preparing/done
-        for it in self.order_items:
-            if it[0] == iid:
-                if it[4] in ('preparing','done','served'):
-                    messagebox.showwarning("Cannot remove", "Item already preparing/served.")
-                    return
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
-        cur.execute("DELETE FROM order_items WHERE id=?", (iid,))
-        con.commit()
-        con.close()
+        if not self.store.remove_item(iid):
+            messagebox.showwarning("Cannot remove", "Item already preparing/served.")
+            return
         self.load_order_items()
 
     def send_to_kitchen(self):
         # set pending items to preparing
         if not self.current_order_id:
             return
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
-        cur.execute("UPDATE order_items SET status='preparing' WHERE order_id=? AND status='pending'", (self.current_order_id,))
-        con.commit()
-        con.close()
+        self.store.send_to_kitchen(self.current_order_id)
         self.load_order_items()
         # refresh kitchen
         try:
             if hasattr(self, "kitchen_window") and self.kitchen_window.winfo_exists():
-                self.kitchen_window.refresh()
+                self.kitchen_window.poll_changes()
         except Exception:
             pass
         messagebox.showinfo("Sent", "Order sent to kitchen.")
 
     def recalc_summary(self):
-        subtotal = Decimal('0.00')
-        for it in self.order_items:
-            subtotal += money(it[4])
+        subtotal = self.store.subtotal(self.current_order_id)
         gst_percent = Decimal(str(self.gst_percent_var.get()))
         gst_amt = money(subtotal * gst_percent / Decimal(100))
         total = money(subtotal + gst_amt)
@@ -485,32 +1170,30 @@ class POSApp(tk.Tk):
         if not self.current_order_id:
             messagebox.showwarning("No order", "Select a table and create an order first.")
             return
-        # finalize bill (calculates totals & frees table)
+        # finalize bill (calculates totals & frees table); snapshot first, the
+        # store forgets the order once it is billed
+        order_id = self.current_order_id
         gst_percent = float(self.gst_percent_var.get())
-        subtotal, gst_amt, total = finalize_bill(self.current_order_id, gst_percent=gst_percent)
+        snap = self.store.snapshot(order_id)
+        try:
+            subtotal, gst_amt, total = self.store.finalize(order_id, gst_percent=gst_percent)
+        except OrderAlreadyBilled:
+            messagebox.showwarning("Already billed", f"Order {order_id} was already billed on another terminal.")
+            self.selected_table_id = None
+            self.current_order_id = None
+            self.table_label.config(text='-')
+            self.load_order_items()
+            self.refresh_tables()
+            return
+        snap.update(gst=gst_amt, total=total)
         # ask where to save receipt
         os.makedirs("receipts", exist_ok=True)
-        suggested = os.path.join("receipts", f"receipt_order_{self.current_order_id}.pdf")
+        suggested = os.path.join("receipts", f"receipt_order_{order_id}.pdf")
         path = filedialog.asksaveasfilename(defaultextension=".pdf", initialfile=os.path.basename(suggested),
                                             initialdir=os.path.abspath("receipts"), filetypes=[("PDF files","*.pdf")])
-        if not path:
-            # user cancelled: still save order as billed but no receipt file
-            save_receipt_path(self.current_order_id, None)
-            messagebox.showinfo("Billed", f"Order {self.current_order_id} billed (no receipt saved).")
-        else:
-            try:
-                generate_receipt_pdf(self.current_order_id, path)
-                save_receipt_path(self.current_order_id, path)
-                # open the PDF for printing/viewing
-                if sys.platform.startswith('win'):
-                    os.startfile(path)
-                elif sys.platform.startswith('darwin'):
-                    os.system(f"open '{path}'")
-                else:
-                    os.system(f"xdg-open '{path}'")
-                messagebox.showinfo("Billed", f"Order {self.current_order_id} billed and receipt saved:\n{path}")
-            except Exception as e:
-                messagebox.showwarning("Saved but error", f"Order billed but failed to create/open receipt:\n{e}")
+        # rendering happens on the receipt worker; the thermal copy is always produced
+        future = self.receipts.submit(snap, pdf_path=path or None, escpos_path=escpos_target(order_id))
+        self.after(50, self._receipt_done, order_id, future)
         # reset selection & refresh
         self.selected_table_id = None
         self.current_order_id = None
@@ -518,20 +1201,51 @@ class POSApp(tk.Tk):
         self.load_order_items()
         self.refresh_tables()
 
+    def _receipt_done(self, order_id, future, reprint=False):
+        if not future.done():
+            self.after(50, self._receipt_done, order_id, future, reprint)
+            return
+        try:
+            written = future.result()
+        except Exception as e:
+            messagebox.showwarning("Saved but error", f"Order {order_id} billed but failed to create receipt:\n{e}")
+            return
+        path = written.get('pdf')
+        if reprint:
+            messagebox.showinfo("Reprint", f"Receipt for order {order_id} sent to {written.get('escpos')}.")
+            return
+        self.store.save_receipt_path(order_id, path)
+        if not path:
+            messagebox.showinfo("Billed", f"Order {order_id} billed (no PDF saved, thermal copy: {written.get('escpos')}).")
+            return
+        try:
+            # open the PDF for printing/viewing
+            if sys.platform.startswith('win'):
+                os.startfile(path)
+            elif sys.platform.startswith('darwin'):
+                os.system(f"open '{path}'")
+            else:
+                os.system(f"xdg-open '{path}'")
+            messagebox.showinfo("Billed", f"Order {order_id} billed and receipt saved:\n{path}")
+        except Exception as e:
+            messagebox.showwarning("Saved but error", f"Receipt saved but could not be opened:\n{e}")
+
+    def reprint_receipt(self):
+        order_id = simpledialog.askinteger("Reprint", "Order ID to reprint:", parent=self)
+        if not order_id:
+            return
+        future = self.receipts.reprint(order_id, escpos_path=escpos_target(order_id))
+        self.after(50, self._receipt_done, order_id, future, True)
+
     def create_table(self):
         name = simpledialog.askstring("New Table", "Enter table name (e.g. T6):", parent=self)
         if not name:
             return
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
         try:
-            cur.execute("INSERT INTO tables(name) VALUES (?)", (name.strip(),))
-            con.commit()
+            self.store.create_table(name.strip())
             messagebox.showinfo("Created", f"Table {name} created.")
         except sqlite3.IntegrityError:
             messagebox.showerror("Exists", "Table name already exists.")
-        finally:
-            con.close()
         self.refresh_tables()
 
     def open_kitchen_screen(self):
@@ -545,6 +1259,15 @@ class POSApp(tk.Tk):
         self.kitchen_window = KitchenWindow(self)
         self.kitchen_window.refresh()
 
+    def end_of_day(self):
+        day = datetime.date.today().isoformat()
+        if not messagebox.askyesno("End of Day", f"Close sales for {day}?"):
+            return
+        _, orders, subtotal, gst, total, avg_secs = close_day(self.store.con, day)
+        ticket = f"\nAverage ticket time: {avg_secs / 60:.1f} min" if avg_secs else ""
+        messagebox.showinfo("End of Day", f"{day}: {orders} bills\nSubtotal: {money(subtotal)}\n"
+                                          f"GST: {money(gst)}\nTotal: {money(total)}{ticket}")
+
     def update_title(self):
         self.title(f"Restaurant POS - Selected Table: {self.table_label['text']}")
 
@@ -552,17 +1275,35 @@ class POSApp(tk.Tk):
 # Kitchen window
 # ---------------------
 class KitchenWindow(tk.Toplevel):
+    """
+    Pending kitchen lines. After one full load the window follows the
+    order_item_changes log and only touches rows that changed.
+    """
     def __init__(self, master):
         super().__init__(master)
         self.title("Kitchen Screen - Pending Orders")
-        self.geometry("700x500")
+        self.geometry("760x500")
+        self.con = sqlite3.connect(DB_FILE)
+        self.last_seq = 0
+        self.station = None     # None shows every station
+        self.sort_keys = []     # sorted (order created_at, order_id, item_id) of rows shown, mirrors tree order
+        self.row_keys = {}      # item_id -> sort key
+        self._poll_job = None
         self.create_widgets()
+        self.bind("<Destroy>", self._on_destroy)
 
     def create_widgets(self):
+        bar = ttk.Frame(self, padding=(8, 8, 8, 0))
+        bar.pack(fill='x')
+        ttk.Label(bar, text="Station:").pack(side='left')
+        self.station_var = tk.StringVar(value="All")
+        self.station_combo = ttk.Combobox(bar, textvariable=self.station_var, state='readonly', width=14)
+        self.station_combo.pack(side='left', padx=4)
+        self.station_combo.bind("<<ComboboxSelected>>", lambda e: self.select_station(self.station_var.get()))
         top = ttk.Frame(self, padding=8)
         top.pack(fill='both', expand=True)
-        self.tree = ttk.Treeview(top, columns=("item_id","table","name","qty","rate","total","status","order_id"), show='headings')
-        for h,w in (("item_id",60),("table",80),("name",260),("qty",50),("rate",80),("total",80),("status",100),("order_id",80)):
+        self.tree = ttk.Treeview(top, columns=("item_id","table","name","qty","station","status","waiting","order_id"), show='headings')
+        for h,w in (("item_id",60),("table",80),("name",240),("qty",50),("station",90),("status",90),("waiting",80),("order_id",70)):
             self.tree.heading(h, text=h.title())
             self.tree.column(h, width=w, anchor='center')
         self.tree.pack(fill='both', expand=True)
@@ -572,20 +1313,83 @@ class KitchenWindow(tk.Toplevel):
         ttk.Button(btns, text="Mark Done", command=lambda: self.change_status("done")).pack(side='left', padx=6)
         ttk.Button(btns, text="Refresh", command=self.refresh).pack(side='left', padx=6)
 
+    def select_station(self, name):
+        self.station = None if name == "All" else name
+        self.title(f"Kitchen Screen - {name if self.station else 'Pending Orders'}")
+        self.refresh()
+
     def refresh(self):
+        """Full reload, then resume incremental polling from the current log position."""
+        self.station_combo['values'] = ["All"] + [s[0] for s in get_stations(self.con)]
         self.tree.delete(*self.tree.get_children())
-        rows = get_pending_items()
+        self.sort_keys = []
+        self.row_keys = {}
+        self.last_seq = get_change_seq(self.con)
+        for r in get_station_queue(self.con, self.station):
+            self._upsert_row(r)
+        self._schedule_poll()
+
+    def poll_changes(self):
+        self.last_seq, rows, removed = get_item_changes(self.con, self.last_seq)
+        for iid in removed:
+            self._remove_row(iid)
         for r in rows:
-            # r: item.id, table_id, table_name, item_name, qty, rate, total, status, order_id
-            self.tree.insert('', 'end', iid=str(r[0]), values=(r[0], r[2], r[3], r[4], f"{money(r[5])}", f"{money(r[6])}", r[7], r[8]))
+            self._upsert_row(r)
+
+    def _upsert_row(self, r):
+        # r: a _PENDING_ITEMS_SQL row; the queue is ordered by order age (oldest first)
+        if self.station is not None and r[9] != self.station:
+            self._remove_row(r[0])
+            return
+        try:
+            waiting = datetime.datetime.now() - datetime.datetime.fromisoformat(r[10])
+            waiting = f"{int(waiting.total_seconds() // 60)} min"
+        except (TypeError, ValueError):
+            waiting = ""
+        values = (r[0], r[2], r[3], r[4], r[9], r[7], waiting, r[8])
+        iid = str(r[0])
+        if r[0] in self.row_keys:
+            self.tree.item(iid, values=values)
+            return
+        key = (r[10] or "", r[8], r[0])
+        pos = bisect.bisect(self.sort_keys, key)
+        self.sort_keys.insert(pos, key)
+        self.row_keys[r[0]] = key
+        self.tree.insert('', pos, iid=iid, values=values)
+
+    def _remove_row(self, item_id):
+        key = self.row_keys.pop(item_id, None)
+        if key is None:
+            return
+        del self.sort_keys[bisect.bisect_left(self.sort_keys, key)]
+        self.tree.delete(str(item_id))
+
+    def _schedule_poll(self):
+        if self._poll_job:
+            self.after_cancel(self._poll_job)
+        self._poll_job = self.after(KITCHEN_POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        try:
+            self.poll_changes()
+        finally:
+            self._schedule_poll()
+
+    def _on_destroy(self, evt):
+        if evt.widget is self:
+            if self._poll_job:
+                self.after_cancel(self._poll_job)
+                self._poll_job = None
+            self.con.close()
 
     def change_status(self, new_status):
         sel = self.tree.selection()
         if not sel:
             return
         iid = int(sel[0])
-        set_order_item_status(iid, new_status)
-        self.refresh()
+        self.master.store.set_item_status(iid, new_status)
+        self.poll_changes()
 
 # ---------------------
 # Main